@@ -13,4 +13,27 @@ fi
 mkdir -p _output
 cp -r web/* _output/
 
+# Excluir imágenes que nada referencia (PRUNE_ORPHANS=0 para desactivarlo).
+# Va antes de los assets derivados: sus manifests referencian las imágenes de origen.
+if [ "${PRUNE_ORPHANS:-1}" != "0" ] && command -v python3 >/dev/null 2>&1; then
+    echo "🕸️  Pruning unreferenced images..."
+    python3 scripts/find_orphan_assets.py --web-dir _output --prune
+fi
+
+# Assets derivados (piezas jigsaw, placeholders, atlas, recortes) si hay Python con Pillow disponible
+if command -v python3 >/dev/null 2>&1 && python3 -c "import PIL" >/dev/null 2>&1; then
+    echo "🧩 Slicing jigsaw tiles..."
+    python3 scripts/slice_jigsaw.py --web-dir _output
+    echo "🌫️  Generating image placeholders..."
+    python3 scripts/generate_placeholders.py --web-dir _output
+    echo "🧱 Packing avatar atlas..."
+    python3 scripts/build_avatar_atlas.py --web-dir _output
+    if python3 -c "import numpy" >/dev/null 2>&1; then
+        echo "📱 Generating mobile scene crops..."
+        python3 scripts/generate_mobile_crops.py --web-dir _output
+    fi
+else
+    echo "⚠️  Pillow not available - skipping derived image assets (full images only)"
+fi
+
 echo "✅ Build complete - $(find _output -type f | wc -l | xargs) files ready"
@@ -0,0 +1,509 @@
+"""
+Acumuladores de una sola pasada para los eventos de analytics.
+
+Cada acumulador se suscribe a los tipos de evento que le interesan y mantiene
+un estado pequeño (contadores, sumas, mínimos/máximos). EventAggregator
+recorre los eventos una sola vez y reparte cada uno a sus acumuladores; dos
+agregadores se pueden combinar con merge(), de modo que el análisis de
+varios ficheros o trozos se hace por separado y se junta al final.
+
+El estado por sesión (escenas vistas y si llegó a un final) es lo único que
+crece con los datos: crece con el número de sesiones y la longitud de sus
+caminos, no con el número de eventos ni con el tamaño de sus payloads. Las
+sesiones inactivas se pueden cerrar (close_idle): su camino se suma a un
+contador y se descarta su estado.
+
+Todo el estado se puede guardar como JSON con to_state() y recuperar con
+load_state() (ver analytics_checkpoint.py).
+
+Con sketches=True la memoria no crece con el volumen: los set de sesiones
+(únicas y con final) pasan a HyperLogLog, los caminos a un PathTrie con las
+sesiones inactivas cerradas sobre la marcha (como con path_mining) y se
+añade un SketchAccumulator (analytics_sketches.py) con sesiones distintas
+por agente y día y percentiles de tiempos (DDSketch). Los recuentos de
+sesiones pasan a ser estimaciones (±0.8%).
+"""
+
+import sys
+from collections import Counter, defaultdict
+
+from analytics_paths import PATH_SEPARATOR, PathTrie, trie_from_counts
+from analytics_sketches import SESSION_PRECISION, HyperLogLog, SketchAccumulator
+
+
+SESSION_IDLE_MS = 2 * 60 * 60 * 1000  # Una partida dura minutos; 2 h sin eventos = sesión cerrada
+IDLE_CHECK_SESSIONS = 5000  # Con minería de caminos, buscar sesiones inactivas cada N sesiones nuevas
+
+
+def _session_set(exact):
+    """set de ids de sesión, o un HyperLogLog de tamaño fijo con la misma interfaz (add, |=, len)."""
+    return set() if exact else HyperLogLog(SESSION_PRECISION)
+
+
+def _session_set_state(sessions):
+    return sorted(sessions) if isinstance(sessions, set) else sessions.to_state()
+
+
+def _load_session_set(state):
+    return HyperLogLog.from_state(state) if isinstance(state, dict) else set(state)
+
+
+class CountsAccumulator:
+    """Total de eventos, eventos por tipo y sesiones únicas (exactas o HyperLogLog)."""
+
+    event_types = None  # Todos los tipos
+
+    def __init__(self, exact=True):
+        self.total = 0
+        self.by_type = Counter()
+        self.sessions = _session_set(exact)
+
+    def add(self, event):
+        self.total += 1
+        self.by_type[event['eventType']] += 1
+        self.sessions.add(event['sessionId'])
+
+    def merge(self, other):
+        self.total += other.total
+        self.by_type.update(other.by_type)
+        self.sessions |= other.sessions
+
+    def to_state(self):
+        return {'total': self.total, 'by_type': self.by_type, 'sessions': _session_set_state(self.sessions)}
+
+    def load_state(self, state):
+        self.total = state['total']
+        self.by_type = Counter(state['by_type'])
+        self.sessions = _load_session_set(state['sessions'])
+
+
+class ConversionAccumulator:
+    """Sesiones y misiones iniciadas, sesiones con final (exactas o HyperLogLog) y agentes elegidos."""
+
+    event_types = ('session_start', 'mission_start', 'ending_reached')
+
+    def __init__(self, exact=True):
+        self.sessions_started = 0
+        self.missions_started = 0
+        self.ended_sessions = _session_set(exact)
+        self.agents = Counter()
+
+    def add(self, event):
+        event_type = event['eventType']
+        if event_type == 'session_start':
+            self.sessions_started += 1
+            self.agents[event['data'].get('agent', 'unknown')] += 1
+        elif event_type == 'mission_start':
+            self.missions_started += 1
+        else:
+            self.ended_sessions.add(event['sessionId'])
+
+    def merge(self, other):
+        self.sessions_started += other.sessions_started
+        self.missions_started += other.missions_started
+        self.ended_sessions |= other.ended_sessions
+        self.agents.update(other.agents)
+
+    def to_state(self):
+        return {
+            'sessions_started': self.sessions_started,
+            'missions_started': self.missions_started,
+            'ended_sessions': _session_set_state(self.ended_sessions),
+            'agents': self.agents,
+        }
+
+    def load_state(self, state):
+        self.sessions_started = state['sessions_started']
+        self.missions_started = state['missions_started']
+        self.ended_sessions = _load_session_set(state['ended_sessions'])
+        self.agents = Counter(state['agents'])
+
+
+class SceneAccumulator:
+    """Visitas por escena, decisiones (origen → destino) y finales alcanzados."""
+
+    event_types = ('scene_view', 'choice_made', 'ending_reached')
+
+    def __init__(self):
+        self.views = Counter()
+        self.choices = Counter()
+        self.endings = Counter()
+
+    def add(self, event):
+        event_type = event['eventType']
+        data = event['data']
+        if event_type == 'scene_view':
+            self.views[data['sceneId']] += 1
+        elif event_type == 'choice_made':
+            self.choices[f"{data['fromScene']} → {data['toScene']}"] += 1
+        else:
+            self.endings[data['sceneId']] += 1
+
+    def merge(self, other):
+        self.views.update(other.views)
+        self.choices.update(other.choices)
+        self.endings.update(other.endings)
+
+    def to_state(self):
+        return {'views': self.views, 'choices': self.choices, 'endings': self.endings}
+
+    def load_state(self, state):
+        self.views = Counter(state['views'])
+        self.choices = Counter(state['choices'])
+        self.endings = Counter(state['endings'])
+
+
+class TimingAccumulator:
+    """Duración de las sesiones completadas (min/media/max) y tiempo medio por escena."""
+
+    event_types = ('ending_reached', 'scene_time')
+
+    def __init__(self):
+        self.session_count = 0
+        self.session_total_ms = 0
+        self.session_min_ms = None
+        self.session_max_ms = None
+        self.scene_total_ms = defaultdict(int)
+        self.scene_count = defaultdict(int)
+
+    def add(self, event):
+        data = event['data']
+        if event['eventType'] == 'ending_reached':
+            value = data['totalSessionTime']
+            self.session_count += 1
+            self.session_total_ms += value
+            self.session_min_ms = value if self.session_min_ms is None else min(self.session_min_ms, value)
+            self.session_max_ms = value if self.session_max_ms is None else max(self.session_max_ms, value)
+        else:
+            scene_id = data['sceneId']
+            self.scene_total_ms[scene_id] += data['duration']
+            self.scene_count[scene_id] += 1
+
+    def merge(self, other):
+        self.session_count += other.session_count
+        self.session_total_ms += other.session_total_ms
+        for attr, pick in (('session_min_ms', min), ('session_max_ms', max)):
+            values = [v for v in (getattr(self, attr), getattr(other, attr)) if v is not None]
+            setattr(self, attr, pick(values) if values else None)
+        for scene_id, total in other.scene_total_ms.items():
+            self.scene_total_ms[scene_id] += total
+            self.scene_count[scene_id] += other.scene_count[scene_id]
+
+    def to_state(self):
+        return {
+            'session_count': self.session_count,
+            'session_total_ms': self.session_total_ms,
+            'session_min_ms': self.session_min_ms,
+            'session_max_ms': self.session_max_ms,
+            'scene_total_ms': self.scene_total_ms,
+            'scene_count': self.scene_count,
+        }
+
+    def load_state(self, state):
+        self.session_count = state['session_count']
+        self.session_total_ms = state['session_total_ms']
+        self.session_min_ms = state['session_min_ms']
+        self.session_max_ms = state['session_max_ms']
+        self.scene_total_ms = defaultdict(int, state['scene_total_ms'])
+        self.scene_count = defaultdict(int, state['scene_count'])
+
+
+class PuzzleAccumulator:
+    """Intentos y éxitos de puzzles."""
+
+    event_types = ('puzzle_complete',)
+
+    def __init__(self):
+        self.attempts = 0
+        self.successes = 0
+
+    def add(self, event):
+        self.attempts += 1
+        if event['data'].get('success'):
+            self.successes += 1
+
+    def merge(self, other):
+        self.attempts += other.attempts
+        self.successes += other.successes
+
+    def to_state(self):
+        return {'attempts': self.attempts, 'successes': self.successes}
+
+    def load_state(self, state):
+        self.attempts = state['attempts']
+        self.successes = state['successes']
+
+
+class SessionPathAccumulator:
+    """
+    Estado por sesión para abandono y caminos.
+
+    Guarda las visitas (timestamp, escena) de cada sesión abierta, si llegó
+    a un final y su último timestamp. Cada sesión recibe un número de orden
+    con su primer evento de cualquier tipo, así el orden de los informes
+    coincide con el orden de aparición aunque la sesión ya se haya cerrado.
+
+    close_idle() cierra las sesiones sin eventos desde un instante dado: su
+    camino y su punto de abandono se suman a closed_paths/closed_abandonment
+    ({clave: [nº, primer orden]}) y su estado se descarta.
+
+    Con mining=True los caminos cerrados van a un PathTrie (códigos de
+    escena, nodos acotados) en vez de a closed_paths, y las sesiones sin
+    eventos en SESSION_IDLE_MS respecto al evento más reciente se cierran
+    sobre la marcha: la memoria depende de las sesiones activas a la vez y
+    no del total. flush() cierra las que quedan al final.
+    """
+
+    event_types = None  # Todos los tipos (para registrar la sesión)
+
+    def __init__(self, mining=False):
+        self.sessions = {}
+        self.next_seq = 0
+        self.closed_paths = {}
+        self.closed_abandonment = {}
+        self.trie = PathTrie() if mining else None
+        self.newest = None
+
+    def _state(self, session_id):
+        state = self.sessions.get(session_id)
+        if state is None:
+            if self.trie is not None and self.newest is not None and self.next_seq % IDLE_CHECK_SESSIONS == 0:
+                self.close_idle(self.newest - SESSION_IDLE_MS)
+            state = self.sessions[session_id] = {'seq': self.next_seq, 'views': [], 'ended': False, 'last': None}
+            self.next_seq += 1
+        return state
+
+    def add(self, event):
+        state = self._state(event['sessionId'])
+        timestamp = event.get('timestamp')
+        if timestamp is not None and (state['last'] is None or timestamp > state['last']):
+            state['last'] = timestamp
+            if self.newest is None or timestamp > self.newest:
+                self.newest = timestamp
+        event_type = event['eventType']
+        if event_type == 'scene_view':
+            state['views'].append((event['timestamp'], sys.intern(event['data']['sceneId'])))
+        elif event_type == 'ending_reached':
+            state['ended'] = True
+
+    @staticmethod
+    def _fold(table, key, count, seq):
+        entry = table.get(key)
+        if entry is None:
+            table[key] = [count, seq]
+        else:
+            entry[0] += count
+            entry[1] = min(entry[1], seq)
+
+    def enable_mining(self):
+        """Pasa los caminos cerrados (closed_paths) a un PathTrie y sigue en modo minería."""
+        if self.trie is None:
+            self.trie = trie_from_counts({path: count for path, (count, _) in self.closed_paths.items()})
+            self.closed_paths = {}
+
+    def merge(self, other):
+        # Las sesiones nuevas de other van detrás de las de este (orden de fichero)
+        offset = self.next_seq
+        for session_id, other_state in other.sessions.items():
+            state = self.sessions.get(session_id)
+            if state is None:
+                state = self.sessions[session_id] = {
+                    'seq': offset + other_state['seq'], 'views': [], 'ended': False, 'last': None,
+                }
+            state['views'].extend(other_state['views'])
+            state['ended'] = state['ended'] or other_state['ended']
+            lasts = [t for t in (state['last'], other_state['last']) if t is not None]
+            state['last'] = max(lasts) if lasts else None
+        if other.trie is not None:
+            self.enable_mining()
+        if self.trie is not None:
+            if other.trie is not None:
+                self.trie.merge(other.trie)
+            for path, (count, _) in other.closed_paths.items():
+                self.trie.add_path(path.split(PATH_SEPARATOR), count)
+        else:
+            for key, (count, seq) in other.closed_paths.items():
+                self._fold(self.closed_paths, key, count, offset + seq)
+        for key, (count, seq) in other.closed_abandonment.items():
+            self._fold(self.closed_abandonment, key, count, offset + seq)
+        self.next_seq = offset + other.next_seq
+        lasts = [t for t in (self.newest, other.newest) if t is not None]
+        self.newest = max(lasts) if lasts else None
+
+    @staticmethod
+    def _scenes(state):
+        return [scene for _, scene in sorted(state['views'], key=lambda view: view[0])]
+
+    @classmethod
+    def _path(cls, state):
+        return PATH_SEPARATOR.join(cls._scenes(state))
+
+    @staticmethod
+    def _abandonment(state):
+        return max(state['views'], key=lambda view: view[0])[1]
+
+    def _close(self, session_id):
+        state = self.sessions.pop(session_id)
+        if state['views']:
+            if self.trie is not None:
+                self.trie.add_path(self._scenes(state))
+            else:
+                self._fold(self.closed_paths, self._path(state), 1, state['seq'])
+            if not state['ended']:
+                self._fold(self.closed_abandonment, self._abandonment(state), 1, state['seq'])
+
+    def close_idle(self, before):
+        """Cierra las sesiones cuyo último evento es anterior a `before` (ms). Retorna cuántas."""
+        closed = [sid for sid, state in self.sessions.items() if state['last'] is not None and state['last'] < before]
+        for session_id in closed:
+            self._close(session_id)
+        return len(closed)
+
+    def flush(self):
+        """Cierra todas las sesiones abiertas (fin de la ejecución). Retorna cuántas."""
+        closed = list(self.sessions)
+        for session_id in closed:
+            self._close(session_id)
+        return len(closed)
+
+    def path_trie(self):
+        """PathTrie con los caminos cerrados y los de las sesiones abiertas."""
+        if self.trie is None:
+            trie = trie_from_counts({path: count for path, (count, _) in self.closed_paths.items()})
+        elif self.sessions:
+            trie = self.trie.copy()
+        else:
+            return self.trie
+        for state in self.sessions.values():
+            if state['views']:
+                trie.add_path(self._scenes(state))
+        return trie
+
+    def _ordered(self, closed, key_for_state, include):
+        """Counter que junta sesiones cerradas y abiertas, con claves por primer orden."""
+        table = {key: list(entry) for key, entry in closed.items()}
+        for state in self.sessions.values():
+            if include(state):
+                self._fold(table, key_for_state(state), 1, state['seq'])
+        counts = Counter()
+        for key, (count, _) in sorted(table.items(), key=lambda item: item[1][1]):
+            counts[key] = count
+        return counts
+
+    def abandonment_points(self):
+        """Última escena (por timestamp) de cada sesión sin final."""
+        return self._ordered(
+            self.closed_abandonment, self._abandonment, lambda state: not state['ended'] and state['views']
+        )
+
+    def paths(self):
+        """Caminos completos 'a → b → c' de cada sesión, ordenados por timestamp."""
+        if self.trie is not None:
+            return self.path_trie().path_counts()
+        return self._ordered(self.closed_paths, self._path, lambda state: state['views'])
+
+    def to_state(self):
+        state = {
+            'next_seq': self.next_seq,
+            'sessions': self.sessions,
+            'closed_paths': self.closed_paths,
+            'closed_abandonment': self.closed_abandonment,
+        }
+        if self.trie is not None:
+            state['trie'] = self.trie.to_state()
+            state['newest'] = self.newest
+        return state
+
+    def load_state(self, state):
+        self.next_seq = state['next_seq']
+        self.sessions = {
+            session_id: dict(session, views=[(ts, sys.intern(scene)) for ts, scene in session['views']])
+            for session_id, session in state['sessions'].items()
+        }
+        self.closed_paths = state['closed_paths']
+        self.closed_abandonment = state['closed_abandonment']
+        self.trie = PathTrie.from_state(state['trie']) if 'trie' in state else None
+        self.newest = state.get('newest')
+
+
+class EventAggregator:
+    """
+    Reparte cada evento, en una sola pasada, a los acumuladores suscritos a su tipo.
+
+    Uso:
+        aggregator = EventAggregator()
+        aggregator.consume(events)      # cualquier iterable, incluso un generador
+        aggregator.merge(other)         # combinar con otro trozo ya agregado
+    """
+
+    def __init__(self, sketches=False, path_mining=False):
+        self.counts = CountsAccumulator(exact=not sketches)
+        self.conversion = ConversionAccumulator(exact=not sketches)
+        self.scenes = SceneAccumulator()
+        self.timing = TimingAccumulator()
+        self.puzzles = PuzzleAccumulator()
+        self.sessions = SessionPathAccumulator(mining=path_mining or sketches)
+        if sketches:
+            self.sketches = SketchAccumulator()
+            self.names = self.names + ('sketches',)
+
+        self._always = []
+        self._dispatch = defaultdict(list)
+        for accumulator in self.accumulators():
+            if accumulator.event_types is None:
+                self._always.append(accumulator.add)
+            else:
+                for event_type in accumulator.event_types:
+                    self._dispatch[event_type].append(accumulator.add)
+
+    names = ('counts', 'conversion', 'scenes', 'timing', 'puzzles', 'sessions')
+
+    def accumulators(self):
+        """Acumuladores en orden fijo (el mismo en todos los agregadores)."""
+        return [getattr(self, name) for name in self.names]
+
+    @property
+    def percentiles(self):
+        """Percentiles de tiempos de los sketches (None sin sketches)."""
+        sketches = getattr(self, 'sketches', None)
+        return sketches.percentiles() if sketches else None
+
+    def add(self, event):
+        """Procesa un evento."""
+        for handler in self._always:
+            handler(event)
+        for handler in self._dispatch.get(event['eventType'], ()):
+            handler(event)
+
+    def consume(self, events):
+        """Procesa un iterable de eventos y retorna el agregador."""
+        always = self._always
+        dispatch = self._dispatch
+        for event in events:
+            for handler in always:
+                handler(event)
+            handlers = dispatch.get(event['eventType'])
+            if handlers:
+                for handler in handlers:
+                    handler(event)
+        return self
+
+    def merge(self, other):
+        """Combina el estado de otro agregador en este y retorna este."""
+        if self.names != other.names:
+            raise ValueError("No se pueden combinar agregadores con y sin sketches")
+        for mine, theirs in zip(self.accumulators(), other.accumulators()):
+            mine.merge(theirs)
+        return self
+
+    def to_state(self):
+        """Estado completo como dict serializable a JSON."""
+        return {name: getattr(self, name).to_state() for name in self.names}
+
+    @classmethod
+    def from_state(cls, state):
+        """Agregador con el estado guardado por to_state()."""
+        aggregator = cls(sketches='sketches' in state)
+        for name in aggregator.names:
+            getattr(aggregator, name).load_state(state[name])
+        return aggregator
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Caché binaria de eventos de analytics normalizados.
+
+Ingiere exportaciones de cualquier forma conocida (backup de localStorage,
+payloads del worker, filas de D1; JSON, JSONL o gzip), las normaliza con
+normalize_event() y las guarda en un directorio con el almacén columnar:
+
+    analytics_cache/
+        meta.json          filas, tipos de columna y exportaciones ya ingeridas
+        strings.json       tablas de textos (sesiones, tipos, escenas, agentes)
+        columns/*.bin      una columna por fichero, binario little-endian
+        extras.jsonl       tabla dispersa: [campo, fila, valor] por línea
+
+Las columnas se abren con np.memmap, así que cargar la caché no parsea nada
+y solo se leen del disco las páginas que se usan. Las exportaciones nuevas
+se añaden al final (las ya ingeridas se reconocen por su SHA-256 y se
+saltan). meta.json se escribe el último: si una ingesta se interrumpe, los
+bytes de más se ignoran al cargar y se recortan en la siguiente.
+
+Uso:
+    python scripts/analytics_cache.py ingest portal27_analytics_*.json
+    python scripts/analytics_cache.py ingest worker_events.jsonl.gz
+    python scripts/analytics_cache.py info
+    python scripts/analyze_analytics.py analytics_cache/
+"""
+
+import argparse
+import json
+import sys
+from collections.abc import Mapping
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from analytics_columnar import EventStore, EventStoreBuilder, StringTable
+from analytics_io import iter_events, normalize_event
+from image_snapshots import sha256_file
+
+
+DEFAULT_CACHE = "analytics_cache"
+CACHE_VERSION = 1
+
+COLUMN_DTYPES = {
+    'session': '<i4',
+    'event_type': '<i4',
+    'scene': '<i4',
+    'target': '<i4',
+    'agent': '<i4',
+    'timestamp': '<i8',
+    'duration': '<i8',
+    'flags': 'u1',
+}
+
+STRING_TABLES = ('sessions', 'event_types', 'scenes', 'agents')
+
+
+def is_cache(path):
+    """True si el directorio contiene una caché de analytics."""
+    return (Path(path) / 'meta.json').exists()
+
+
+def _write_json_atomic(path, data):
+    """Escribe un JSON en un temporal y lo renombra (nunca queda a medias)."""
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    tmp_path.replace(path)
+
+
+def load_meta(cache_dir):
+    """Lee meta.json o retorna el de una caché vacía."""
+    meta_path = Path(cache_dir) / 'meta.json'
+    if not meta_path.exists():
+        return {
+            'meta': {'version': CACHE_VERSION},
+            'rows': 0,
+            'extras_bytes': 0,
+            'columns': COLUMN_DTYPES,
+            'sources': {},
+        }
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('meta', {}).get('version') != CACHE_VERSION:
+        raise ValueError(f"Versión de caché no soportada en {meta_path}")
+    return meta
+
+
+class LazyExtras(Mapping):
+    """
+    Tabla dispersa que se lee de extras.jsonl la primera vez que se consulta
+    (el informe no la usa, así que cargar la caché no la parsea).
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._fields = None
+
+    def _load(self):
+        if self._fields is None:
+            fields = {}
+            if self.size:
+                with open(self.path, 'rb') as f:
+                    payload = f.read(self.size)
+                for line in payload.decode('utf-8').splitlines():
+                    field, row, value = json.loads(line)
+                    field_rows, values = fields.setdefault(field, ([], []))
+                    field_rows.append(row)
+                    values.append(sys.intern(value) if isinstance(value, str) else value)
+            self._fields = {
+                field: (np.asarray(field_rows, dtype=np.int32), values)
+                for field, (field_rows, values) in fields.items()
+            }
+        return self._fields
+
+    def __getitem__(self, field):
+        return self._load()[field]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+
+def load_cache(cache_dir, mmap=True):
+    """
+    Carga la caché como EventStore.
+
+    Con mmap=True las columnas son np.memmap de solo lectura (carga
+    instantánea); con mmap=False se leen enteras a memoria.
+    """
+    cache_dir = Path(cache_dir)
+    meta = load_meta(cache_dir)
+    rows = meta['rows']
+
+    strings = {}
+    if (cache_dir / 'strings.json').exists():
+        with open(cache_dir / 'strings.json', 'r', encoding='utf-8') as f:
+            strings = json.load(f)
+
+    columns = {}
+    for name, dtype in meta['columns'].items():
+        path = cache_dir / 'columns' / f"{name}.bin"
+        if rows == 0:
+            column = np.empty(0, dtype=dtype)
+        elif mmap:
+            column = np.memmap(path, dtype=dtype, mode='r', shape=(rows,))
+        else:
+            column = np.fromfile(path, dtype=dtype, count=rows)
+        columns[name] = column
+
+    return EventStore(
+        sessions=StringTable(strings.get('sessions', ())),
+        event_types=StringTable(strings.get('event_types', ())),
+        scenes=StringTable(strings.get('scenes', ())),
+        agents=StringTable(strings.get('agents', ())),
+        agent_names={int(code): name for code, name in strings.get('agent_names', {}).items()},
+        columns=columns,
+        extras=LazyExtras(cache_dir / 'extras.jsonl', meta['extras_bytes']),
+    )
+
+
+def append_to_cache(cache_dir, builder, meta):
+    """Añade al final de la caché las filas nuevas de un builder continuado."""
+    cache_dir = Path(cache_dir)
+    (cache_dir / 'columns').mkdir(parents=True, exist_ok=True)
+    new_store = builder.build()
+    rows = meta['rows']
+
+    for name, dtype in meta['columns'].items():
+        path = cache_dir / 'columns' / f"{name}.bin"
+        itemsize = np.dtype(dtype).itemsize
+        with open(path, 'ab') as f:
+            # Recortar lo que hubiera dejado una ingesta interrumpida
+            f.truncate(rows * itemsize)
+            new_store.columns[name].astype(dtype, copy=False).tofile(f)
+
+    extras_path = cache_dir / 'extras.jsonl'
+    with open(extras_path, 'ab') as f:
+        f.truncate(meta['extras_bytes'])
+        lines = []
+        for field, (field_rows, values) in new_store.extras.items():
+            for row, value in zip(field_rows.tolist(), values):
+                lines.append(json.dumps([field, row, value], ensure_ascii=False))
+        if lines:
+            f.write(('\n'.join(lines) + '\n').encode('utf-8'))
+        extras_bytes = f.tell()
+
+    strings = {table: getattr(builder, table).values for table in STRING_TABLES}
+    strings['agent_names'] = {str(code): name for code, name in builder.agent_names.items()}
+    _write_json_atomic(cache_dir / 'strings.json', strings)
+
+    meta['rows'] = rows + len(new_store)
+    meta['extras_bytes'] = extras_bytes
+    _write_json_atomic(cache_dir / 'meta.json', meta)
+
+
+def ingest(paths, cache_dir=DEFAULT_CACHE, force=False):
+    """
+    Normaliza e ingiere exportaciones en la caché.
+
+    Returns:
+        Lista de (ruta, filas añadidas o None si ya estaba ingerida)
+    """
+    cache_dir = Path(cache_dir)
+    meta = load_meta(cache_dir)
+    base = load_cache(cache_dir) if meta['rows'] else None
+    builder = EventStoreBuilder(base)
+
+    results = []
+    for path in paths:
+        digest = sha256_file(path)
+        if digest in meta['sources'] and not force:
+            results.append((path, None))
+            continue
+        before = len(builder.session)
+        builder.consume(map(normalize_event, iter_events(path)))
+        added = len(builder.session) - before
+        meta['sources'][digest] = {
+            'name': Path(path).name,
+            'rows': added,
+            'ingested': datetime.now().isoformat(timespec='seconds'),
+        }
+        results.append((path, added))
+
+    if len(builder.session) or not (cache_dir / 'meta.json').exists():
+        append_to_cache(cache_dir, builder, meta)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Caché binaria de eventos de analytics normalizados",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s ingest portal27_analytics_*.json
+  %(prog)s ingest worker_events.jsonl.gz --cache /tmp/cache
+  %(prog)s info
+        """
+    )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE,
+        help=f"Directorio de la caché (default: {DEFAULT_CACHE})"
+    )
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Añadir exportaciones a la caché")
+    ingest_parser.add_argument("files", nargs='+', help="Exportaciones (JSON, JSONL, opcionalmente .gz)")
+    ingest_parser.add_argument("--force", action="store_true",
+                               help="Ingerir aunque la exportación ya esté en la caché")
+
+    subparsers.add_parser("info", help="Resumen de la caché")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "ingest":
+            for path, added in ingest(args.files, args.cache, args.force):
+                if added is None:
+                    print(f"⏭️  {path}: ya ingerida")
+                else:
+                    print(f"📥 {path}: {added} eventos")
+
+        meta = load_meta(args.cache)
+        store = load_cache(args.cache)
+        size = sum(p.stat().st_size for p in Path(args.cache).rglob('*') if p.is_file()) if is_cache(args.cache) else 0
+        print(f"💾 Caché {args.cache}: {meta['rows']} eventos, {len(store.sessions)} sesiones, "
+              f"{len(meta['sources'])} exportaciones, {size / (1024 * 1024):.2f} MB")
+
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Checkpoint del análisis incremental de analytics.
+
+Guarda en un JSON el estado completo del EventAggregator (contadores,
+tiempos, estado parcial de las sesiones abiertas) junto con la marca de
+agua: el mayor timestamp procesado y los eventos (sesión, tipo) vistos justo
+en ese instante. En la siguiente ejecución solo se agregan los eventos
+posteriores a la marca, así que el informe diario cuesta lo que los datos
+nuevos y no todo el histórico.
+
+Los eventos de un mismo milisegundo (scene_time y scene_view comparten
+timestamp) pueden quedar repartidos entre dos exportaciones; por eso la
+marca guarda también quién ya se procesó en ese milisegundo.
+
+La marca es global: sirve para exportaciones acumulativas o sucesivas (D1,
+el worker, el mismo navegador). Los eventos anteriores a la marca se cuentan
+como ignorados.
+
+Al guardar, las sesiones sin eventos en SESSION_IDLE_MS antes de la marca se
+cierran: su camino pasa a los contadores y su estado se descarta, así el
+checkpoint crece con las sesiones abiertas y no con el histórico de caminos.
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+from analytics_aggregators import SESSION_IDLE_MS, EventAggregator
+
+
+CHECKPOINT_VERSION = 1
+
+
+class Checkpoint:
+    """Agregador + marca de agua, persistible en JSON."""
+
+    def __init__(self, aggregator=None, watermark=None, boundary=()):
+        self.aggregator = aggregator or EventAggregator()
+        self.watermark = watermark
+        self.boundary = set(boundary)
+        self.new_events = 0
+        self.skipped_events = 0
+
+    @classmethod
+    def load(cls, path, sketches=False, path_mining=False):
+        """
+        Carga un checkpoint, o uno vacío si el fichero no existe.
+
+        Con sketches=True el checkpoint tiene que llevar sketches desde el
+        principio (no se pueden rellenar con los eventos ya procesados). Con
+        path_mining=True los caminos ya cerrados pasan al trie.
+        """
+        path = Path(path)
+        if not path.exists():
+            return cls(EventAggregator(sketches, path_mining))
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('meta', {}).get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"Versión de checkpoint no soportada en {path}")
+        if sketches and 'sketches' not in state['aggregator']:
+            raise ValueError(f"El checkpoint {path} no tiene sketches; créalo de nuevo con --sketches")
+        aggregator = EventAggregator.from_state(state['aggregator'])
+        if path_mining:
+            aggregator.sessions.enable_mining()
+        return cls(aggregator, state['watermark'], (tuple(key) for key in state['boundary']))
+
+    def save(self, path, idle_ms=SESSION_IDLE_MS):
+        """
+        Cierra las sesiones inactivas y guarda el checkpoint (escritura atómica).
+
+        Returns:
+            Número de sesiones cerradas
+        """
+        closed = 0
+        if self.watermark is not None:
+            closed = self.aggregator.sessions.close_idle(self.watermark - idle_ms)
+        state = {
+            'meta': {'version': CHECKPOINT_VERSION, 'saved': datetime.now().isoformat(timespec='seconds')},
+            'watermark': self.watermark,
+            'boundary': sorted(self.boundary),
+            'aggregator': self.aggregator.to_state(),
+        }
+        path = Path(path)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        tmp_path.replace(path)
+        return closed
+
+    def new_only(self, events):
+        """
+        Genera solo los eventos posteriores a la marca de agua del checkpoint
+        y va avanzando la marca con los que deja pasar.
+        """
+        start, seen = self.watermark, set(self.boundary)
+        for event in events:
+            timestamp = event.get('timestamp') or 0
+            key = (event['sessionId'], event['eventType'])
+            if start is not None and (timestamp < start or (timestamp == start and key in seen)):
+                self.skipped_events += 1
+                continue
+
+            if self.watermark is None or timestamp > self.watermark:
+                self.watermark = timestamp
+                self.boundary = {key}
+            elif timestamp == self.watermark:
+                self.boundary.add(key)
+            self.new_events += 1
+            yield event
+
+    def consume(self, events):
+        """Agrega los eventos nuevos y retorna el checkpoint."""
+        self.aggregator.consume(self.new_only(events))
+        return self
@@ -0,0 +1,392 @@
+"""
+Almacén columnar de eventos de analytics.
+
+En lugar de un dict por evento (con sessionId, eventType y sceneId repetidos
+en cada uno), los eventos se guardan por columnas:
+
+- Códigos enteros (int32) para sesión, tipo de evento, escena, escena
+  destino y agente; cada código apunta a una tabla de textos (StringTable)
+- Timestamps y duraciones en int64 (MISSING = -1 si el evento no la tiene)
+- Banderas de escena/puzzle empaquetadas en un uint8
+- Una tabla dispersa para los campos poco frecuentes (choiceText,
+  puzzleId, attempts, fromAgent...): por campo, filas y valores
+
+Así un evento ocupa unas decenas de bytes, y conteos, group-bys y
+percentiles son operaciones vectorizadas de NumPy. summary() produce los
+mismos datos que EventAggregator, de modo que print_report() sirve para
+ambos.
+
+Los campos de dispositivo (userAgent, screen, viewport) no se guardan.
+"""
+
+import sys
+from array import array
+from collections import Counter
+
+import numpy as np
+
+
+MISSING = -1
+
+# Bits de la columna flags
+FLAG_IS_ENDING = 1
+FLAG_HAS_CHOICES = 2
+FLAG_HAS_PUZZLE = 4
+FLAG_SUCCESS = 8
+
+FLAG_FIELDS = (
+    ('isEnding', FLAG_IS_ENDING),
+    ('hasChoices', FLAG_HAS_CHOICES),
+    ('hasPuzzle', FLAG_HAS_PUZZLE),
+    ('success', FLAG_SUCCESS),
+)
+
+# Campos de data que van a columnas (el resto va a la tabla dispersa)
+COLUMN_FIELDS = {
+    'sceneId', 'fromScene', 'toScene', 'duration', 'totalSessionTime', 'agent', 'agentId',
+} | {field for field, _ in FLAG_FIELDS}
+
+
+class StringTable:
+    """Tabla de textos internados: texto ↔ código entero por orden de aparición."""
+
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        """Código de un texto, añadiéndolo si es nuevo (None → MISSING)."""
+        if value is None:
+            return MISSING
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, code):
+        """Texto de un código (None para MISSING)."""
+        return None if code == MISSING else self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class EventStoreBuilder:
+    """
+    Construye un EventStore añadiendo eventos uno a uno (acepta generadores).
+
+    Las columnas crecen en array.array, que no guarda un objeto Python por
+    valor; build() las expone como arrays NumPy sin copiarlas.
+
+    Con `base` (un EventStore existente) se continúa con sus tablas de
+    textos y su numeración de filas: las columnas del builder contienen solo
+    los eventos nuevos, con códigos compatibles con los de base.
+    """
+
+    def __init__(self, base=None):
+        self.sessions = StringTable(base.sessions.values if base else ())
+        self.event_types = StringTable(base.event_types.values if base else ())
+        self.scenes = StringTable(base.scenes.values if base else ())
+        self.agents = StringTable(base.agents.values if base else ())
+        self.agent_names = dict(base.agent_names) if base else {}
+        self.row_offset = len(base) if base else 0
+
+        self.session = array('i')
+        self.event_type = array('i')
+        self.scene = array('i')
+        self.target = array('i')
+        self.agent = array('i')
+        self.timestamp = array('q')
+        self.duration = array('q')
+        self.flags = array('B')
+        self.extras = {}
+
+    def add(self, event):
+        """Añade un evento con la forma de la exportación de localStorage."""
+        row = self.row_offset + len(self.session)
+        event_type = event['eventType']
+        data = event.get('data') or {}
+
+        self.session.append(self.sessions.code(event['sessionId']))
+        self.event_type.append(self.event_types.code(event_type))
+        self.timestamp.append(event.get('timestamp') or 0)
+
+        if event_type in ('choice_made', 'back_button'):
+            self.scene.append(self.scenes.code(data.get('fromScene')))
+            self.target.append(self.scenes.code(data.get('toScene')))
+        else:
+            self.scene.append(self.scenes.code(data.get('sceneId')))
+            self.target.append(MISSING)
+
+        duration = data.get('duration', data.get('totalSessionTime'))
+        self.duration.append(MISSING if duration is None else duration)
+
+        agent_id = data.get('agentId') or data.get('agent')
+        agent = self.agents.code(agent_id)
+        self.agent.append(agent)
+        if agent != MISSING and 'agent' in data:
+            self.agent_names[agent] = data['agent']
+
+        flags = 0
+        for field, bit in FLAG_FIELDS:
+            if data.get(field):
+                flags |= bit
+        self.flags.append(flags)
+
+        for field, value in data.items():
+            if field not in COLUMN_FIELDS:
+                rows, values = self.extras.setdefault(field, (array('i'), []))
+                rows.append(row)
+                values.append(sys.intern(value) if isinstance(value, str) else value)
+
+    def consume(self, events):
+        """Añade un iterable de eventos y retorna el builder."""
+        add = self.add
+        for event in events:
+            add(event)
+        return self
+
+    def build(self):
+        """EventStore con las columnas como arrays NumPy."""
+        return EventStore(
+            sessions=self.sessions,
+            event_types=self.event_types,
+            scenes=self.scenes,
+            agents=self.agents,
+            agent_names=self.agent_names,
+            columns={
+                'session': np.frombuffer(self.session, dtype=np.int32),
+                'event_type': np.frombuffer(self.event_type, dtype=np.int32),
+                'scene': np.frombuffer(self.scene, dtype=np.int32),
+                'target': np.frombuffer(self.target, dtype=np.int32),
+                'agent': np.frombuffer(self.agent, dtype=np.int32),
+                'timestamp': np.frombuffer(self.timestamp, dtype=np.int64),
+                'duration': np.frombuffer(self.duration, dtype=np.int64),
+                'flags': np.frombuffer(self.flags, dtype=np.uint8),
+            },
+            extras={
+                field: (np.frombuffer(rows, dtype=np.int32), values)
+                for field, (rows, values) in self.extras.items()
+            },
+        )
+
+
+def _ordered_counts(codes, label):
+    """
+    Counter {etiqueta: nº} de un array de códigos, con las claves en orden
+    de primera aparición (como un Counter alimentado evento a evento, para
+    que most_common() desempate igual).
+    """
+    counts = Counter()
+    if len(codes) == 0:
+        return counts
+    unique, first, totals = np.unique(codes, return_index=True, return_counts=True)
+    for i in np.argsort(first, kind='stable'):
+        counts[label(unique[i])] += int(totals[i])
+    return counts
+
+
+class EventStore:
+    """
+    Eventos en columnas NumPy con tablas de textos.
+
+    Columnas (mismo largo, una fila por evento): session, event_type,
+    scene, target, agent (int32), timestamp, duration (int64) y flags
+    (uint8). scene es el origen en choice_made/back_button y target su
+    destino.
+    """
+
+    def __init__(self, sessions, event_types, scenes, agents, agent_names, columns, extras):
+        self.sessions = sessions
+        self.event_types = event_types
+        self.scenes = scenes
+        self.agents = agents
+        self.agent_names = agent_names
+        self.columns = columns
+        self.extras = extras
+        for name, column in columns.items():
+            setattr(self, name, column)
+
+    @classmethod
+    def from_events(cls, events):
+        """Construye el almacén desde un iterable de eventos."""
+        return EventStoreBuilder().consume(events).build()
+
+    def __len__(self):
+        return len(self.session)
+
+    def nbytes(self):
+        """Bytes de las columnas NumPy (sin tablas de textos ni tabla dispersa)."""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def mask(self, event_type):
+        """Máscara booleana de las filas de un tipo de evento."""
+        code = self.event_types.codes.get(event_type)
+        if code is None:
+            return np.zeros(len(self), dtype=bool)
+        return self.event_type == code
+
+    def extra(self, field):
+        """Campo de la tabla dispersa como (filas, valores); vacío si nadie lo trae."""
+        return self.extras.get(field, (np.empty(0, dtype=np.int32), []))
+
+    def count_by(self, column, mask=None, label=None):
+        """Group-by con conteo: Counter {etiqueta: nº} de una columna de códigos."""
+        codes = self.columns[column] if mask is None else self.columns[column][mask]
+        return _ordered_counts(codes, label or int)
+
+    def percentiles(self, event_type, qs=(50, 90, 99)):
+        """Percentiles de la duración (ms) de un tipo de evento, o None si no hay datos."""
+        values = self.duration[self.mask(event_type) & (self.duration != MISSING)]
+        if len(values) == 0:
+            return None
+        return dict(zip(qs, np.percentile(values, qs).tolist()))
+
+    def agent_label(self, code):
+        """Nombre visible de un agente (el del evento si lo traía, si no su id)."""
+        if code == MISSING:
+            return 'unknown'
+        return self.agent_names.get(code, self.agents.values[code])
+
+    def _session_views(self):
+        """Filas scene_view ordenadas por (sesión, timestamp), estable."""
+        rows = np.flatnonzero(self.mask('scene_view'))
+        order = np.lexsort((self.timestamp[rows], self.session[rows]))
+        return rows[order]
+
+    def summary(self):
+        """Resumen con la misma estructura que EventAggregator (para print_report)."""
+        return ColumnarSummary(self)
+
+
+class _Namespace:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class ColumnarSummary:
+    """
+    Resultados vectorizados con los mismos atributos que EventAggregator:
+    counts, conversion, scenes, timing, puzzles y sessions.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        scene_label = store.scenes.values.__getitem__
+        session_label = store.sessions.values.__getitem__
+
+        start = store.mask('session_start')
+        ending = store.mask('ending_reached')
+        scene_time = store.mask('scene_time') & (store.duration != MISSING)
+        puzzle = store.mask('puzzle_complete')
+        choice = store.mask('choice_made')
+
+        self.counts = _Namespace(
+            total=len(store),
+            by_type=store.count_by('event_type', label=store.event_types.values.__getitem__),
+            sessions=set(store.sessions.values),
+        )
+
+        self.conversion = _Namespace(
+            sessions_started=int(start.sum()),
+            missions_started=int(store.mask('mission_start').sum()),
+            ended_sessions={session_label(code) for code in np.unique(store.session[ending]).tolist()},
+            agents=store.count_by('agent', start, store.agent_label),
+        )
+
+        n_scenes = max(1, len(store.scenes))
+        pairs = store.scene[choice].astype(np.int64) * n_scenes + store.target[choice]
+        self.scenes = _Namespace(
+            views=store.count_by('scene', store.mask('scene_view'), scene_label),
+            choices=_ordered_counts(
+                pairs, lambda pair: f"{scene_label(pair // n_scenes)} → {scene_label(pair % n_scenes)}"
+            ),
+            endings=store.count_by('scene', ending, scene_label),
+        )
+
+        session_times = store.duration[ending]
+        scene_codes = store.scene[scene_time]
+        scene_totals = np.bincount(scene_codes, weights=store.duration[scene_time], minlength=n_scenes)
+        scene_count = store.count_by('scene', scene_time, scene_label)
+        self.timing = _Namespace(
+            session_count=len(session_times),
+            session_total_ms=int(session_times.sum()),
+            session_min_ms=int(session_times.min()) if len(session_times) else None,
+            session_max_ms=int(session_times.max()) if len(session_times) else None,
+            scene_total_ms={scene: float(scene_totals[store.scenes.codes[scene]]) for scene in scene_count},
+            scene_count=scene_count,
+        )
+
+        self.puzzles = _Namespace(
+            attempts=int(puzzle.sum()),
+            successes=int(((store.flags[puzzle] & FLAG_SUCCESS) != 0).sum()),
+        )
+
+        self.sessions = ColumnarSessions(store)
+
+        # {etiqueta: (percentiles en ms, unidad, divisor)} para print_report
+        self.percentiles = {}
+        for label, event_type, unit, scale in (
+            ("Tiempo en escena", 'scene_time', 's', 1000),
+            ("Duración de sesiones completadas", 'ending_reached', 'min', 60000),
+        ):
+            values = store.percentiles(event_type)
+            if values:
+                self.percentiles[label] = (values, unit, scale)
+
+
+class ColumnarSessions:
+    """Abandono y caminos por sesión, calculados sobre las columnas."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def abandonment_points(self):
+        """Última escena (por timestamp) de cada sesión sin final."""
+        store = self.store
+        rows = np.flatnonzero(store.mask('scene_view'))
+        # Ante timestamps iguales gana la primera fila (como max() sobre la lista)
+        order = np.lexsort((-rows, store.timestamp[rows], store.session[rows]))
+        rows = rows[order]
+        sessions = store.session[rows]
+        last = rows[np.append(sessions[1:] != sessions[:-1], True)] if len(rows) else rows
+
+        ended = np.zeros(len(store.sessions), dtype=bool)
+        ended[store.session[store.mask('ending_reached')]] = True
+        last = last[~ended[store.session[last]]]
+        # last sigue en orden de sesión: las claves quedan en ese orden
+        return _ordered_counts(store.scene[last], store.scenes.values.__getitem__)
+
+    def paths(self):
+        """Caminos completos 'a → b → c' de cada sesión, en orden de aparición de la sesión."""
+        store = self.store
+        rows = store._session_views()
+        sessions = store.session[rows]
+        scenes = store.scene[rows].tolist()
+        bounds = np.flatnonzero(np.diff(sessions)) + 1
+        starts = [0] + bounds.tolist()
+        ends = bounds.tolist() + [len(rows)]
+        names = store.scenes.values
+        paths = Counter()
+        for begin, end in zip(starts, ends):
+            if begin < end:
+                paths[' → '.join(names[code] for code in scenes[begin:end])] += 1
+        return paths
+
+    def path_trie(self, **options):
+        """PathTrie con el camino de cada sesión, directamente desde los códigos de escena."""
+        from analytics_paths import PathTrie  # analytics_paths importa StringTable de este módulo
+
+        store = self.store
+        rows = store._session_views()
+        sessions = store.session[rows]
+        codes = store.scene[rows]
+        bounds = np.flatnonzero(np.diff(sessions)) + 1
+        trie = PathTrie(StringTable(store.scenes.values), **options)
+        for begin, end in zip([0] + bounds.tolist(), bounds.tolist() + [len(rows)]):
+            if begin < end:
+                trie.add_codes(tuple(codes[begin:min(end, begin + trie.max_depth)].tolist()))
+        return trie
@@ -0,0 +1,255 @@
+"""
+Lectura incremental de exportaciones de analytics.
+
+Las exportaciones pueden ser un array JSON (`exportAnalytics()` del
+navegador) o JSONL (un evento por línea), opcionalmente comprimidas con
+gzip. En ambos casos los eventos se entregan uno a uno con un generador, de
+modo que la memoria no depende del tamaño del fichero y el agregador empieza
+a trabajar con el primer evento:
+
+    from analytics_io import iter_events
+    aggregator = EventAggregator().consume(iter_events(path))
+
+Los errores de formato se lanzan como json.JSONDecodeError.
+
+normalize_event() lleva los eventos de cualquier forma conocida (backup de
+localStorage, payload enviado al worker o fila de D1) a la forma de
+localStorage, que es la que usan los agregadores.
+"""
+
+import gzip
+import json
+from datetime import datetime
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+# Campos de primer nivel del payload del worker / columnas de D1 → campo de data
+WORKER_FIELDS = (
+    ('agentId', 'agent_id', 'agentId'),
+    ('choiceText', 'choice_text', 'choiceText'),
+    ('targetScene', 'target_scene', 'toScene'),
+    ('puzzleId', 'puzzle_id', 'puzzleId'),
+)
+
+
+def open_export(path):
+    """Abre una exportación como texto, descomprimiendo si empieza por la firma de gzip."""
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        return gzip.open(path, 'rt', encoding='utf-8-sig')
+    return open(path, 'r', encoding='utf-8-sig')
+
+
+class _Reader:
+    """Buffer de texto que se rellena por trozos y descarta lo ya consumido."""
+
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Lee un trozo más; retorna False si el fichero ya se acabó."""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Primer carácter que no es espacio (sin consumirlo), o '' al final."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def error(self, message):
+        return json.JSONDecodeError(message, self.buffer, self.pos)
+
+
+def iter_json_array(stream, chunk_size=CHUNK_SIZE):
+    """
+    Genera los elementos de un array JSON de primer nivel sin cargarlo entero.
+
+    Cada elemento se decodifica con JSONDecoder.raw_decode sobre un buffer
+    que solo contiene el trozo pendiente; si un elemento queda cortado al
+    final del buffer se lee otro trozo y se reintenta.
+    """
+    decoder = json.JSONDecoder()
+    reader = _Reader(stream, chunk_size)
+
+    if reader.peek() != '[':
+        raise reader.error("Se esperaba '[' al inicio del array")
+    reader.pos += 1
+
+    if reader.peek() == ']':
+        reader.pos += 1
+    else:
+        while True:
+            if not reader.peek():
+                raise reader.error("Array sin cerrar")
+            while True:
+                try:
+                    value, end = decoder.raw_decode(reader.buffer, reader.pos)
+                except json.JSONDecodeError:
+                    if reader.fill():
+                        continue
+                    raise
+                # Un número al final del buffer podría seguir en el próximo trozo
+                if end == len(reader.buffer) and reader.fill():
+                    continue
+                break
+            reader.pos = end
+            yield value
+
+            separator = reader.peek()
+            if not separator:
+                raise reader.error("Array sin cerrar")
+            reader.pos += 1
+            if separator == ']':
+                break
+            if separator != ',':
+                reader.pos -= 1
+                raise reader.error("Se esperaba ',' o ']' entre eventos")
+
+    if reader.peek():
+        raise reader.error("Contenido extra después del array")
+
+
+def iter_jsonl(stream):
+    """Genera un objeto por línea no vacía de un fichero JSONL."""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise json.JSONDecodeError(f"Línea {line_number}: {e.msg}", e.doc, e.pos) from None
+
+
+def iter_events(path, chunk_size=CHUNK_SIZE):
+    """
+    Genera los eventos de una exportación (.json, .jsonl, con o sin gzip).
+
+    El formato se detecta por el contenido, no por la extensión: si el primer
+    carácter es '[' es un array JSON; si no, JSONL.
+    """
+    with open_export(path) as stream:
+        first = ''
+        while True:
+            char = stream.read(1)
+            if not char or char not in WHITESPACE:
+                first = char
+                break
+        if not first:
+            return
+        rest = _Prefixed(first, stream)
+        if first == '[':
+            yield from iter_json_array(rest, chunk_size)
+        else:
+            yield from iter_jsonl(rest)
+
+
+class _Prefixed:
+    """Stream de texto con un carácter ya leído devuelto al principio."""
+
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size=-1):
+        prefix, self.prefix = self.prefix, ''
+        if size is not None and size >= 0:
+            return prefix + self.stream.read(max(0, size - len(prefix)))
+        return prefix + self.stream.read()
+
+    def __iter__(self):
+        if self.prefix:
+            prefix, self.prefix = self.prefix, ''
+            yield prefix + self.stream.readline()
+        yield from self.stream
+
+
+def timestamp_ms(value):
+    """Timestamp en ms desde un número, un texto numérico o una fecha ISO 8601."""
+    if value is None or isinstance(value, (int, float)):
+        return int(value or 0)
+    value = str(value).strip()
+    if value.lstrip('-').isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00').replace(' ', 'T'))
+    return int(parsed.timestamp() * 1000)
+
+
+def normalize_event(event):
+    """
+    Lleva un evento a la forma de la exportación de localStorage.
+
+    Formas reconocidas:
+    - localStorage: {sessionId, timestamp, eventType, data, ...} (se retorna tal cual)
+    - Payload del worker: {sessionId, type, timestamp, agentId, sceneId,
+      choiceText, targetScene, puzzleId, endingId, metadata}
+    - Fila de D1 (schema.sql): {session_id, event_type, agent_id, scene_id,
+      ..., timestamp, user_agent, metadata (texto JSON)}
+
+    Los campos de primer nivel solo rellenan los que falten en data, que en
+    el worker es una copia de metadata.
+    """
+    if 'eventType' in event:
+        return event
+
+    if 'type' in event:
+        snake = False
+        event_type = event['type']
+        session_id = event.get('sessionId')
+    elif 'event_type' in event:
+        snake = True
+        event_type = event['event_type']
+        session_id = event.get('session_id')
+    else:
+        raise ValueError(f"Forma de evento desconocida (campos: {', '.join(sorted(event))})")
+
+    metadata = event.get('metadata')
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata) if metadata else {}
+    data = dict(metadata or {})
+
+    for camel, snake_name, field in WORKER_FIELDS:
+        value = event.get(snake_name if snake else camel)
+        if value is not None:
+            data.setdefault(field, value)
+
+    # El worker guarda en sceneId la escena de origen de las decisiones
+    scene_id = event.get('scene_id' if snake else 'sceneId')
+    if scene_id is not None:
+        data.setdefault('fromScene' if event_type in ('choice_made', 'back_button') else 'sceneId', scene_id)
+    ending_id = event.get('ending_id' if snake else 'endingId')
+    if ending_id is not None:
+        data.setdefault('sceneId', ending_id)
+
+    normalized = {
+        'sessionId': session_id,
+        'timestamp': timestamp_ms(event.get('timestamp')),
+        'eventType': event_type,
+        'data': data,
+    }
+    if event.get('sessionDuration') is not None:
+        normalized['sessionDuration'] = event['sessionDuration']
+    user_agent = event.get('user_agent' if snake else 'userAgent')
+    if user_agent is not None:
+        normalized['userAgent'] = user_agent
+    return normalized
@@ -0,0 +1,82 @@
+"""
+Análisis map-reduce de muchas exportaciones de analytics.
+
+Cada fichero (uno por dispositivo o descarga) se agrega en un proceso del
+pool a un EventAggregator parcial; los parciales se combinan con merge() en
+el orden de los ficheros. SessionPathAccumulator combina también el estado
+de las sesiones que aparecen en varios ficheros, así que el resultado es el
+mismo que el de analizar la concatenación de todos ellos.
+
+Las entradas pueden ser ficheros, globs ("exports/*.json") o directorios (se
+toman sus portal27_analytics_*).
+"""
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from analytics_aggregators import EventAggregator
+from analytics_io import iter_events, normalize_event
+
+
+EXPORT_PATTERN = "portal27_analytics_*"
+
+
+def expand_inputs(inputs, pattern=EXPORT_PATTERN):
+    """
+    Lista ordenada y sin duplicados de ficheros a partir de rutas, globs y directorios.
+
+    Raises:
+        FileNotFoundError: si una entrada no corresponde a ningún fichero
+    """
+    paths = []
+    for entry in inputs:
+        path = Path(entry)
+        if path.is_dir():
+            matches = sorted(p for p in path.glob(pattern) if p.is_file())
+        elif path.exists():
+            matches = [path]
+        else:
+            matches = sorted(Path(p) for p in glob.glob(entry) if Path(p).is_file())
+        if not matches:
+            raise FileNotFoundError(f"{entry} no corresponde a ningún fichero de eventos")
+        paths.extend(matches)
+
+    seen = set()
+    unique = []
+    for path in paths:
+        key = path.resolve()
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def aggregate_file(path, sketches=False, path_mining=False):
+    """Map: agregado parcial de un fichero (se ejecuta en un proceso del pool)."""
+    return EventAggregator(sketches, path_mining).consume(map(normalize_event, iter_events(path)))
+
+
+def aggregate_files(paths, workers=None, sketches=False, path_mining=False):
+    """
+    Agrega varios ficheros en paralelo y combina los parciales en orden.
+
+    Los parciales se combinan según llegan (executor.map conserva el orden),
+    así que en memoria solo están el acumulado y los parciales en vuelo.
+
+    Returns:
+        EventAggregator con todos los ficheros
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    total = EventAggregator(sketches, path_mining)
+    if workers == 1:
+        for path in paths:
+            total.merge(aggregate_file(path, sketches, path_mining))
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(partial(aggregate_file, sketches=sketches, path_mining=path_mining), paths):
+            total.merge(result)
+    return total
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Cadena de Markov de escenas a partir de los eventos de analytics.
+
+Cuenta las transiciones escena → escena del almacén columnar con NumPy
+(un bincount por tipo de movimiento) y las alinea con el grafo de
+web/data/story.json:
+
+- choice_made: origen → destino de la decisión
+- back_button: escena → escena anterior
+- puzzle_complete: éxito → successNext del puzzle; fallo → se queda en la escena
+
+Los finales de la historia y el abandono (última escena de una sesión sin
+final) son estados absorbentes. Con Q (transitorios → transitorios) y R
+(transitorios → absorbentes), un solo np.linalg.solve sobre (I - Q) da las
+probabilidades de acabar en cada final y los pasos esperados hasta acabar
+desde cada escena. Además lista las aristas de story.json (decisiones y
+successNext) que nadie ha tomado y las transiciones observadas que la
+historia no declara.
+
+Uso:
+    python scripts/analytics_markov.py portal27_analytics_XXXXX.json
+    python scripts/analytics_markov.py exports/ --story-file web/data/story.json
+    python scripts/analytics_markov.py analytics_cache/
+"""
+
+import argparse
+import json
+import sys
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+
+from analytics_cache import is_cache, load_cache
+from analytics_columnar import FLAG_SUCCESS, MISSING, ColumnarSessions, EventStore, StringTable
+from analytics_io import iter_events, normalize_event
+from analytics_mapreduce import expand_inputs
+
+
+STORY_PATH = Path(__file__).resolve().parent.parent / 'web' / 'data' / 'story.json'
+ABANDON = '(abandono)'
+
+
+def load_json(path):
+    """Carga un archivo JSON."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class StoryGraph:
+    """
+    Escenas y aristas de story.json con índices enteros.
+
+    Las escenas se numeran en el orden del fichero; las que aparezcan en los
+    eventos sin estar en la historia se añaden detrás (scenes.code()).
+    edges es un array (n, 2) de [origen, destino] sin repetidos con las
+    decisiones y los successNext de los puzzles. coverage_edges son las que
+    cuentan para la cobertura: sin las que salen de un final, que son
+    reinicios (la cadena trata los finales como absorbentes).
+    """
+
+    def __init__(self, story):
+        story_scenes = story.get('scenes', {})
+        self.start = story.get('meta', {}).get('start', 'intro')
+        self.scenes = StringTable(story_scenes)
+        self.story_size = len(self.scenes)
+        self.endings = {scene_id for scene_id, scene in story_scenes.items() if scene.get('ending') is True}
+
+        edges = []
+        self.puzzles = {}  # puzzleId → (escena, successNext)
+        for scene_id, scene in story_scenes.items():
+            for choice in scene.get('choices') or []:
+                if choice.get('next'):
+                    edges.append((scene_id, choice['next']))
+            puzzle = scene.get('puzzle')
+            if puzzle:
+                success_next = puzzle.get('successNext')
+                self.puzzles[puzzle.get('id', scene_id)] = (scene_id, success_next)
+                if success_next:
+                    edges.append((scene_id, success_next))
+        self.edges = np.array(
+            [(self.scenes.code(a), self.scenes.code(b)) for a, b in dict.fromkeys(edges)], dtype=np.int64
+        ).reshape(-1, 2)
+        ending_codes = [self.scenes.codes[scene_id] for scene_id in self.endings]
+        self.coverage_edges = self.edges[~np.isin(self.edges[:, 0], ending_codes)]
+
+    @classmethod
+    def load(cls, path=STORY_PATH):
+        return cls(load_json(path))
+
+
+class MarkovChain:
+    """
+    Transiciones observadas sobre las escenas de un StoryGraph.
+
+    forward cuenta decisiones y éxitos de puzzle (los movimientos que
+    declara la historia); back, los del botón atrás; retry, los fallos de
+    puzzle (bucle sobre la misma escena). abandon[i] es el nº de sesiones
+    sin final cuya última escena es i.
+    """
+
+    def __init__(self, graph, forward, back, retry, abandon):
+        self.graph = graph
+        self.forward = forward
+        self.back = back
+        self.retry = retry
+        self.abandon = abandon
+        self.counts = forward + back + retry
+
+    @classmethod
+    def from_store(cls, store, graph):
+        """Cuenta las transiciones de un EventStore (columnar o caché)."""
+        scenes = graph.scenes
+        recode = np.array([scenes.code(value) for value in store.scenes.values], dtype=np.int64)
+
+        def moves(event_type):
+            rows = store.mask(event_type) & (store.scene != MISSING) & (store.target != MISSING)
+            return recode[store.scene[rows]], recode[store.target[rows]]
+
+        choice_from, choice_to = moves('choice_made')
+        back_from, back_to = moves('back_button')
+
+        # puzzleId va en la tabla dispersa; se traduce a (escena, successNext) con la historia
+        rows, values = store.extra('puzzleId')
+        is_complete = store.mask('puzzle_complete')[rows]
+        puzzle_ids = StringTable()
+        puzzle_codes = np.array([puzzle_ids.code(value) for value in values], dtype=np.int64)[is_complete]
+        puzzle_scene = np.array([
+            scenes.code(graph.puzzles[puzzle_id][0]) if puzzle_id in graph.puzzles else MISSING
+            for puzzle_id in puzzle_ids.values
+        ], dtype=np.int64)
+        puzzle_next = np.array([
+            scenes.code(graph.puzzles[puzzle_id][1]) if puzzle_id in graph.puzzles else MISSING
+            for puzzle_id in puzzle_ids.values
+        ], dtype=np.int64)
+        success = (store.flags[rows[is_complete]] & FLAG_SUCCESS) != 0
+        source = puzzle_scene[puzzle_codes] if len(puzzle_codes) else puzzle_codes
+        target = puzzle_next[puzzle_codes] if len(puzzle_codes) else puzzle_codes
+        known = (source != MISSING) & (target != MISSING)
+        solved = known & success
+        failed = known & ~success
+
+        abandoned = ColumnarSessions(store).abandonment_points()
+        abandon_scenes = np.array([scenes.code(scene) for scene in abandoned], dtype=np.int64)
+
+        n = len(scenes)
+
+        def matrix(sources, targets):
+            return np.bincount(sources * n + targets, minlength=n * n).reshape(n, n)
+
+        forward = matrix(np.concatenate([choice_from, source[solved]]),
+                         np.concatenate([choice_to, target[solved]]))
+        back = matrix(back_from, back_to)
+        retry = matrix(source[failed], source[failed])
+        abandon = np.zeros(n, dtype=np.int64)
+        np.add.at(abandon, abandon_scenes, list(abandoned.values()))
+        return cls(graph, forward, back, retry, abandon)
+
+    def _row_scale(self):
+        """1 / nº de salidas observadas de cada escena (0 si no tiene ninguna)."""
+        totals = self.counts.sum(axis=1) + self.abandon
+        return np.divide(1.0, totals, out=np.zeros(len(totals)), where=totals > 0)
+
+    def probabilities(self):
+        """Matriz de transición P (filas normalizadas; la última columna es el abandono)."""
+        return np.column_stack([self.counts, self.abandon]) * self._row_scale()[:, None]
+
+    def absorption(self):
+        """
+        Probabilidades de absorción y pasos esperados desde cada escena.
+
+        Returns:
+            Tuple (absorbentes, B, steps): absorbentes son los ids de final
+            más ABANDON; B[i, j] la probabilidad de acabar en el absorbente j
+            saliendo de la escena i; steps[i] los pasos esperados hasta
+            acabar (NaN en escenas sin transiciones observadas ni finales)
+
+        Raises:
+            ValueError: si los datos tienen ciclos de los que no se sale
+        """
+        names = self.graph.scenes.values
+        n = len(names)
+        scale = self._row_scale()
+        is_ending = np.array([name in self.graph.endings for name in names], dtype=bool)
+        transient = np.flatnonzero(~is_ending)
+        endings = np.flatnonzero(is_ending)
+        transient_scale = scale[transient, None]
+
+        # I - Q construida sobre una sola copia de la submatriz (n² floats)
+        system = self.counts[np.ix_(transient, transient)] * -transient_scale
+        system[np.diag_indices_from(system)] += 1.0
+        # Una sola factorización para todas las columnas: B = N·R y t = N·1
+        rhs = np.column_stack([
+            self.counts[np.ix_(transient, endings)] * transient_scale,
+            self.abandon[transient] * scale[transient],
+            np.ones(len(transient)),
+        ])
+        try:
+            solution = np.linalg.solve(system, rhs)
+        except np.linalg.LinAlgError:
+            raise ValueError("Las transiciones observadas tienen ciclos sin salida a un final ni abandono")
+
+        absorbing = [names[i] for i in endings] + [ABANDON]
+        B = np.zeros((n, len(absorbing)))
+        steps = np.zeros(n)
+        B[transient] = solution[:, :-1]
+        steps[transient] = solution[:, -1]
+        B[endings, np.arange(len(endings))] = 1.0
+        steps[transient[scale[transient] == 0]] = np.nan
+        return absorbing, B, steps
+
+    def untaken_edges(self):
+        """
+        Aristas de story.json sin ningún paso hacia delante, como [(origen, destino, origen visitado)].
+
+        No incluye las que salen de un final (reinicios, ver StoryGraph.coverage_edges).
+        """
+        edges = self.graph.coverage_edges
+        if not len(edges):
+            return []
+        names = self.graph.scenes.values
+        visited = (self.counts.sum(axis=1) + self.abandon + self.counts.sum(axis=0)) > 0
+        untaken = np.unique(edges[self.forward[edges[:, 0], edges[:, 1]] == 0], axis=0)
+        return [(names[a], names[b], bool(visited[a])) for a, b in untaken.tolist()]
+
+    def undeclared_moves(self):
+        """Transiciones hacia delante observadas que story.json no declara: [(origen, destino, nº)]."""
+        declared = np.zeros_like(self.forward, dtype=bool)
+        if len(self.graph.edges):
+            declared[self.graph.edges[:, 0], self.graph.edges[:, 1]] = True
+        sources, targets = np.nonzero((self.forward > 0) & ~declared)
+        names = self.graph.scenes.values
+        moves = [(names[a], names[b], int(self.forward[a, b])) for a, b in zip(sources.tolist(), targets.tolist())]
+        return sorted(moves, key=lambda move: -move[2])
+
+
+def print_markov_report(markov):
+    """Imprime absorción desde el inicio, pasos esperados y cobertura de aristas."""
+    graph = markov.graph
+    absorbing, B, steps = markov.absorption()
+    start = graph.scenes.codes.get(graph.start)
+
+    print("=" * 60)
+    print("🔗 CADENA DE MARKOV DE ESCENAS - OPERACIÓN PORTAL 27")
+    print("=" * 60)
+    print()
+    print(f"📈 Transiciones: {int(markov.forward.sum())} hacia delante, {int(markov.back.sum())} atrás, "
+          f"{int(markov.retry.sum())} reintentos de puzzle, {int(markov.abandon.sum())} abandonos")
+    print(f"   Escenas: {graph.story_size} en story.json, "
+          f"{len(graph.scenes) - graph.story_size} solo en los eventos")
+    print()
+
+    if start is None or np.isnan(steps[start]):
+        print(f"⚠️  No hay transiciones desde la escena inicial ({graph.start})")
+        print()
+    else:
+        print(f"🏁 Probabilidad de acabar en cada final (desde {graph.start}):")
+        for name, probability in sorted(zip(absorbing, B[start]), key=lambda item: -item[1]):
+            if probability > 0:
+                print(f"   {name}: {probability * 100:.1f}%")
+        print()
+        print(f"👣 Pasos esperados hasta acabar: {steps[start]:.1f}")
+        print()
+
+    untaken = markov.untaken_edges()
+    seen = [edge for edge in untaken if edge[2]]
+    print(f"🚧 Aristas de story.json nunca tomadas: {len(untaken)} de {len(graph.coverage_edges)}"
+          f" ({len(untaken) - len(seen)} desde escenas no visitadas)")
+    for source, target, _ in seen[:20]:
+        print(f"   {source} → {target}")
+    print()
+
+    undeclared = markov.undeclared_moves()
+    if undeclared:
+        print("❓ Transiciones observadas que story.json no declara:")
+        for source, target, count in undeclared[:10]:
+            print(f"   {source} → {target}: {count} veces")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cadena de Markov de escenas a partir de los eventos de analytics",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s portal27_analytics_1234567890.json
+  %(prog)s exports/ --story-file web/data/story.json
+  %(prog)s analytics_cache/
+        """
+    )
+    parser.add_argument("files", nargs='+',
+                        help="Exportaciones (JSON, JSONL, .gz), globs o directorios; o un directorio de caché")
+    parser.add_argument("--story-file", default=STORY_PATH,
+                        help="Historia con las escenas y sus aristas (default: web/data/story.json)")
+
+    args = parser.parse_args()
+
+    try:
+        graph = StoryGraph.load(args.story_file)
+        if len(args.files) == 1 and is_cache(args.files[0]):
+            store = load_cache(args.files[0])
+        else:
+            paths = expand_inputs(args.files)
+            events = chain.from_iterable(map(normalize_event, iter_events(path)) for path in paths)
+            store = EventStore.from_events(events)
+
+        if not len(store):
+            print("⚠️  El archivo no contiene eventos")
+            sys.exit(1)
+
+        print_markov_report(MarkovChain.from_store(store, graph))
+
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    except json.JSONDecodeError as e:
+        print(f"❌ Error: Un archivo no es un JSON válido ({e})")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
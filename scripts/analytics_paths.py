@@ -0,0 +1,276 @@
+"""
+Minería compacta de caminos de escenas.
+
+Los caminos de las sesiones se guardan como secuencias de códigos de escena
+(StringTable) en un trie de prefijos: cada nodo lleva cuántos caminos pasan
+por él (count) y cuántos terminan en él (ends). Sobre el trie:
+
+- prefixes(k): prefijos de longitud k más comunes
+- branching(): reparto de los caminos entre los hijos de cada nodo
+- Los caminos completos más comunes salen de un sketch space-saving de
+  capacidad fija (top-k con error acotado, combinable entre ficheros)
+
+La memoria está acotada: los caminos se cortan en max_depth escenas y si el
+trie supera max_nodes se podan los subárboles con menos caminos (su
+recuento queda en el padre, y pruned_floor es el máximo que se pudo perder
+en cualquier prefijo podado).
+
+Los motores lo alimentan sin pasar por caminos en texto: SessionPathAccumulator
+(mining=True) añade cada sesión al cerrarla, y el almacén columnar y SQLite
+tienen path_trie() sobre sus visitas ordenadas. PathTrie se combina con
+merge() y se guarda con to_state()/from_state() como los acumuladores.
+"""
+
+from array import array
+from collections import Counter
+
+from analytics_columnar import StringTable
+
+
+PATH_SEPARATOR = ' → '
+
+
+class SpaceSaving:
+    """
+    Sketch space-saving para los k elementos más frecuentes.
+
+    Guarda como mucho `capacity` claves con [nº, error]; una clave nueva
+    con el sketch lleno sustituye a la de menor nº y hereda ese nº como
+    error. El nº real de cada clave está entre nº - error y nº.
+    """
+
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.entries = {}
+
+    def add(self, key, count=1):
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry[0] += count
+        elif len(self.entries) < self.capacity:
+            self.entries[key] = [count, 0]
+        else:
+            victim = min(self.entries, key=lambda k: self.entries[k][0])
+            floor = self.entries.pop(victim)[0]
+            self.entries[key] = [floor + count, floor]
+
+    def _floor(self):
+        """Máximo nº que puede tener una clave ausente (0 si el sketch no está lleno)."""
+        if len(self.entries) < self.capacity:
+            return 0
+        return min(count for count, _ in self.entries.values())
+
+    def merge(self, other):
+        """
+        Combina otro sketch conservando la cota nº - error ≤ real ≤ nº.
+
+        Una clave que falta en un sketch lleno pudo tener allí hasta su
+        mínimo: se le suma ese mínimo como nº y como error antes de recortar
+        a capacity.
+        """
+        own_floor = self._floor()
+        other_floor = other._floor()
+        merged = {}
+        for key in self.entries.keys() | other.entries.keys():
+            count, error = self.entries.get(key, (own_floor, own_floor))
+            other_count, other_error = other.entries.get(key, (other_floor, other_floor))
+            merged[key] = [count + other_count, error + other_error]
+        top = sorted(merged.items(), key=lambda item: -item[1][0])[:self.capacity]
+        self.entries = dict(top)
+
+    def top(self, n):
+        """[(clave, nº, error)] de las n claves con más recuento."""
+        ranked = sorted(self.entries.items(), key=lambda item: -item[1][0])[:n]
+        return [(key, count, error) for key, (count, error) in ranked]
+
+
+class PathTrie:
+    """
+    Trie de prefijos de caminos sobre códigos de escena.
+
+    Los nodos son índices en arrays paralelos (count, ends, depth, parent,
+    scene) más un dict de hijos {código: nodo} por nodo; el nodo 0 es la
+    raíz (count = nº de caminos).
+    """
+
+    def __init__(self, scenes=None, max_depth=60, max_nodes=50000, top_capacity=200):
+        self.scenes = scenes or StringTable()
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.top_paths = SpaceSaving(top_capacity)
+        self.pruned_floor = 0
+        self._reset_nodes()
+
+    def _reset_nodes(self):
+        self.count = array('q', [0])
+        self.ends = array('q', [0])
+        self.depth = array('i', [0])
+        self.parent = array('i', [-1])
+        self.scene = array('i', [-1])
+        self.children = [{}]
+
+    def __len__(self):
+        return len(self.children)
+
+    def _child(self, node, code):
+        child = self.children[node].get(code)
+        if child is None:
+            child = len(self.children)
+            self.children[node][code] = child
+            self.children.append({})
+            self.count.append(0)
+            self.ends.append(0)
+            self.depth.append(self.depth[node] + 1)
+            self.parent.append(node)
+            self.scene.append(code)
+        return child
+
+    def add_path(self, scene_ids, count=1):
+        """Añade un camino (secuencia de ids de escena) `count` veces."""
+        codes = tuple(self.scenes.code(scene) for scene in scene_ids[:self.max_depth])
+        self.add_codes(codes, count)
+
+    def add_codes(self, codes, count=1):
+        """Añade un camino ya codificado."""
+        node = 0
+        self.count[0] += count
+        for code in codes:
+            node = self._child(node, code)
+            self.count[node] += count
+        self.ends[node] += count
+        self.top_paths.add(codes, count)
+        if len(self.children) > self.max_nodes:
+            self.prune()
+
+    def prune(self, target=0.75):
+        """
+        Poda los subárboles con menos caminos hasta quedar por debajo de
+        target * max_nodes nodos.
+        """
+        counts = sorted(self.count[1:])
+        keep = int(self.max_nodes * target)
+        if len(counts) <= keep:
+            return
+        floor = counts[len(counts) - keep - 1]
+        self.pruned_floor = max(self.pruned_floor, floor)
+
+        old_count, old_ends, old_children = self.count, self.ends, self.children
+        self._reset_nodes()
+        self.count[0], self.ends[0] = old_count[0], old_ends[0]
+        stack = [(0, 0)]
+        while stack:
+            old_node, new_node = stack.pop()
+            for code, old_child in old_children[old_node].items():
+                if old_count[old_child] > floor:
+                    new_child = self._child(new_node, code)
+                    self.count[new_child] = old_count[old_child]
+                    self.ends[new_child] = old_ends[old_child]
+                    stack.append((old_child, new_child))
+
+    def path_of(self, node):
+        """Ids de escena desde la raíz hasta el nodo."""
+        codes = []
+        while node > 0:
+            codes.append(self.scene[node])
+            node = self.parent[node]
+        return [self.scenes.values[code] for code in reversed(codes)]
+
+    def prefixes(self, k, n=10):
+        """[(prefijo, nº de caminos)] de los n prefijos de longitud k más comunes."""
+        nodes = [node for node in range(1, len(self.children)) if self.depth[node] == k]
+        nodes.sort(key=lambda node: -self.count[node])
+        return [(self.path_of(node), self.count[node]) for node in nodes[:n]]
+
+    def branching(self, n=10, min_children=2):
+        """
+        Nodos con más caminos y al menos min_children hijos, con el reparto
+        entre hijos: [(prefijo, nº, [(escena o None si termina, proporción)])].
+        """
+        nodes = [node for node in range(len(self.children)) if len(self.children[node]) >= min_children]
+        nodes.sort(key=lambda node: -self.count[node])
+        result = []
+        for node in nodes[:n]:
+            total = self.count[node]
+            split = [
+                (self.scenes.values[code], self.count[child] / total)
+                for code, child in self.children[node].items()
+            ]
+            if self.ends[node]:
+                split.append((None, self.ends[node] / total))
+            split.sort(key=lambda item: -item[1])
+            result.append((self.path_of(node), total, split))
+        return result
+
+    def path_counts(self):
+        """Counter {'a → b → c': nº} de los caminos que terminan en algún nodo del trie."""
+        counts = Counter()
+        for node in range(1, len(self.children)):
+            if self.ends[node]:
+                counts[PATH_SEPARATOR.join(self.path_of(node))] = self.ends[node]
+        return counts
+
+    def top(self, n=5):
+        """[(camino, nº, error)] de los caminos completos más comunes (space-saving)."""
+        return [([self.scenes.values[code] for code in codes], count, error)
+                for codes, count, error in self.top_paths.top(n)]
+
+    def copy(self):
+        """Trie independiente con el mismo contenido."""
+        return PathTrie.from_state(self.to_state())
+
+    def to_state(self):
+        return {
+            'max_depth': self.max_depth,
+            'max_nodes': self.max_nodes,
+            'top_capacity': self.top_paths.capacity,
+            'pruned_floor': self.pruned_floor,
+            'scenes': self.scenes.values,
+            # Nodo i > 0: [padre, código de escena, count, ends]
+            'nodes': [[self.parent[i], self.scene[i], self.count[i], self.ends[i]] for i in range(1, len(self))],
+            'root': [self.count[0], self.ends[0]],
+            'top_paths': [[list(codes), count, error] for codes, (count, error) in self.top_paths.entries.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        trie = cls(StringTable(state['scenes']), state['max_depth'], state['max_nodes'], state['top_capacity'])
+        trie.pruned_floor = state['pruned_floor']
+        trie.count[0], trie.ends[0] = state['root']
+        # Los padres siempre tienen índice menor que sus hijos
+        for parent, code, count, ends in state['nodes']:
+            node = trie._child(parent, code)
+            trie.count[node] = count
+            trie.ends[node] = ends
+        trie.top_paths.entries = {tuple(codes): [count, error] for codes, count, error in state['top_paths']}
+        return trie
+
+    def merge(self, other):
+        """Combina otro trie (recodificando sus escenas a las tablas de este)."""
+        recode = [self.scenes.code(scene) for scene in other.scenes.values]
+        stack = [(0, 0)]
+        self.count[0] += other.count[0]
+        self.ends[0] += other.ends[0]
+        while stack:
+            other_node, node = stack.pop()
+            for code, other_child in other.children[other_node].items():
+                child = self._child(node, recode[code])
+                self.count[child] += other.count[other_child]
+                self.ends[child] += other.ends[other_child]
+                stack.append((other_child, child))
+        other_top = SpaceSaving(other.top_paths.capacity)
+        other_top.entries = {
+            tuple(recode[code] for code in codes): entry for codes, entry in other.top_paths.entries.items()
+        }
+        self.top_paths.merge(other_top)
+        self.pruned_floor = max(self.pruned_floor, other.pruned_floor)
+        if len(self.children) > self.max_nodes:
+            self.prune()
+        return self
+
+
+def trie_from_counts(path_counts, **options):
+    """Trie desde un Counter {'a → b → c': nº} (caminos ya unidos en texto)."""
+    trie = PathTrie(**options)
+    for path, count in path_counts.items():
+        trie.add_path(path.split(PATH_SEPARATOR), count)
+    return trie
@@ -0,0 +1,245 @@
+"""
+Sketches probabilísticos para los agregados de analytics.
+
+Resúmenes de tamaño fijo, combinables entre ficheros y ejecuciones (merge y
+to_state/load_state como el resto de acumuladores):
+
+- HyperLogLog: sesiones distintas en total, con final y por agente y día,
+  con 2^p registros de un byte (error típico 1.04 / sqrt(2^p)); len() da
+  la estimación, así que sustituye a los set de sesiones del agregador
+- DDSketch: cuantiles con error relativo acotado (1% por defecto) sobre
+  cubos logarítmicos; sirve para scene_time.duration y totalSessionTime
+
+La memoria no depende del número de eventos: el HLL total ocupa 16 KB, cada
+par agente/día 2 KB y cada DDSketch unos cientos de cubos.
+"""
+
+import base64
+import math
+from datetime import datetime, timezone
+from hashlib import blake2b
+
+
+SESSION_PRECISION = 14  # 16 KB, ±0.8%
+AGENT_DAY_PRECISION = 11  # 2 KB, ±2.3%
+RELATIVE_ACCURACY = 0.01
+MAX_BINS = 2048
+QUANTILES = (50, 90, 99)
+
+
+def _hash64(value):
+    """Hash de 64 bits estable entre procesos (hash() cambia con PYTHONHASHSEED)."""
+    return int.from_bytes(blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """Cardinalidad aproximada con 2^precision registros."""
+
+    def __init__(self, precision=SESSION_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        h = _hash64(value)
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("No se pueden combinar HyperLogLog de distinta precisión")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def __ior__(self, other):
+        self.merge(other)
+        return self
+
+    def __len__(self):
+        return self.estimate()
+
+    def estimate(self):
+        """Nº estimado de valores distintos."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))  # Linear counting en rango bajo
+        return round(raw)
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def to_state(self):
+        return {'precision': self.precision, 'registers': base64.b64encode(self.registers).decode('ascii')}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['precision'])
+        sketch.registers = bytearray(base64.b64decode(state['registers']))
+        return sketch
+
+
+class DDSketch:
+    """
+    Cuantiles con error relativo `relative_accuracy` sobre cubos logarítmicos.
+
+    Cada valor positivo x va al cubo ceil(log_gamma(x)); los valores ≤ 0 van
+    a un contador aparte. Si hay más de max_bins cubos se juntan los más
+    bajos (se pierde precisión en la cola inferior, no en p90/p99).
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, max_bins=MAX_BINS):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        self.count += count
+        if value <= 0:
+            self.zero_count += count
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self.bins)
+        excess = keys[:len(keys) - self.max_bins + 1]
+        self.bins[keys[len(excess)]] += sum(self.bins.pop(key) for key in excess)
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("No se pueden combinar DDSketch de distinta precisión")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q):
+        """Valor aproximado del percentil q (0-100), o None si está vacío."""
+        if not self.count:
+            return None
+        rank = q / 100 * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def quantiles(self, qs=QUANTILES):
+        return {q: self.quantile(q) for q in qs}
+
+    def to_state(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'max_bins': self.max_bins,
+            'bins': {str(key): count for key, count in self.bins.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['relative_accuracy'], state['max_bins'])
+        sketch.bins = {int(key): count for key, count in state['bins'].items()}
+        sketch.zero_count = state['zero_count']
+        sketch.count = state['count']
+        return sketch
+
+
+def event_day(timestamp):
+    """Día UTC (AAAA-MM-DD) de un timestamp en ms."""
+    return datetime.fromtimestamp((timestamp or 0) / 1000, timezone.utc).date().isoformat()
+
+
+class SketchAccumulator:
+    """
+    Sesiones distintas por agente/día y cuantiles de tiempos con sketches de
+    tamaño fijo (las sesiones distintas totales y con final van en los
+    HyperLogLog de CountsAccumulator y ConversionAccumulator).
+
+    Una sesión cuenta para un agente el día de su session_start y el de cada
+    agent_switch hacia ese agente. Ambos se agrupan por id de agente
+    (session_start trae en 'agent' el nombre visible y en 'agentId' el id,
+    que es lo que lleva toAgent).
+    """
+
+    event_types = ('scene_time', 'ending_reached', 'session_start', 'agent_switch')
+
+    def __init__(self):
+        self.agent_days = {}
+        self.scene_time = DDSketch()
+        self.session_time = DDSketch()
+
+    def _agent_day(self, agent, day):
+        key = (agent, day)
+        sketch = self.agent_days.get(key)
+        if sketch is None:
+            sketch = self.agent_days[key] = HyperLogLog(AGENT_DAY_PRECISION)
+        return sketch
+
+    def add(self, event):
+        session_id = event['sessionId']
+        event_type = event['eventType']
+        data = event['data']
+        if event_type == 'scene_time':
+            duration = data.get('duration')
+            if duration is not None:
+                self.scene_time.add(duration)
+        elif event_type == 'ending_reached':
+            total = data.get('totalSessionTime')
+            if total is not None:
+                self.session_time.add(total)
+        elif event_type == 'session_start':
+            agent = data.get('agentId') or data.get('agent') or 'unknown'
+            self._agent_day(agent, event_day(event.get('timestamp'))).add(session_id)
+        elif event_type == 'agent_switch' and data.get('toAgent'):
+            self._agent_day(data['toAgent'], event_day(event.get('timestamp'))).add(session_id)
+
+    def merge(self, other):
+        for (agent, day), sketch in other.agent_days.items():
+            self._agent_day(agent, day).merge(sketch)
+        self.scene_time.merge(other.scene_time)
+        self.session_time.merge(other.session_time)
+
+    def distinct_by_agent_day(self):
+        """{(agente, día): sesiones distintas estimadas}, por día y agente."""
+        return {key: self.agent_days[key].estimate() for key in sorted(self.agent_days, key=lambda key: key[::-1])}
+
+    def percentiles(self):
+        """{etiqueta: (percentiles en ms, unidad, divisor)}, como ColumnarSummary."""
+        result = {}
+        for label, sketch, unit, scale in (
+            ("Tiempo en escena", self.scene_time, 's', 1000),
+            ("Duración de sesiones completadas", self.session_time, 'min', 60000),
+        ):
+            if sketch.count:
+                result[label] = (sketch.quantiles(), unit, scale)
+        return result
+
+    def to_state(self):
+        return {
+            'agent_days': [[agent, day, sketch.to_state()] for (agent, day), sketch in self.agent_days.items()],
+            'scene_time': self.scene_time.to_state(),
+            'session_time': self.session_time.to_state(),
+        }
+
+    def load_state(self, state):
+        self.agent_days = {
+            (agent, day): HyperLogLog.from_state(sketch) for agent, day, sketch in state['agent_days']
+        }
+        self.scene_time = DDSketch.from_state(state['scene_time'])
+        self.session_time = DDSketch.from_state(state['session_time'])
@@ -0,0 +1,266 @@
+"""
+Base de datos SQLite local con el mismo esquema que D1.
+
+Carga las exportaciones en una base SQLite creada con
+workers/analytics/schema.sql (la tabla analytics_events y sus índices, tal
+cual) y calcula el informe con agregados SQL. Las filas se construyen igual
+que el INSERT del worker (workers/analytics/src/index.js), así que la base
+local es un sustituto fiel de D1 para probar consultas.
+
+- La carga va por lotes de executemany, cada lote en su transacción, con
+  journal en modo WAL
+- Un evento que ya está en la base (misma sesión, tipo y timestamp) no se
+  vuelve a insertar, así que cargar dos veces la misma exportación (o
+  backups de localStorage que se solapan) no duplica nada
+- Las consultas del informe filtran por event_type y agrupan por sesión,
+  cubiertas por los índices del esquema
+
+SqliteSummary expone los mismos atributos que EventAggregator para que
+print_report() sirva igual.
+"""
+
+import json
+import sqlite3
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from types import SimpleNamespace
+
+from analytics_paths import PathTrie
+
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / 'workers' / 'analytics' / 'schema.sql'
+BATCH_SIZE = 5000
+CACHE_KIB = 64 * 1024  # Caché de páginas: los 6 índices no caben en los 2 MB por defecto
+SQLITE_MAGIC = b'SQLite format 3\x00'
+
+INSERT_SQL = """
+    INSERT INTO analytics_events (
+        session_id, event_type, agent_id, scene_id, choice_text,
+        target_scene, puzzle_id, ending_id, timestamp, user_agent,
+        referrer, metadata
+    )
+    SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?11, ?12
+    WHERE NOT EXISTS (
+        SELECT 1 FROM analytics_events
+        WHERE session_id = ?1 AND event_type = ?2 AND timestamp = ?9
+    )
+"""
+
+
+def is_sqlite(path):
+    """True si el fichero es una base SQLite (por su cabecera)."""
+    path = Path(path)
+    if not path.is_file():
+        return False
+    with open(path, 'rb') as f:
+        return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+
+
+def connect(db_path, schema_path=SCHEMA_PATH):
+    """Abre (o crea) la base en modo WAL y aplica schema.sql."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_KIB}")
+    with open(schema_path, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    return conn
+
+
+def event_row(event):
+    """
+    Fila de analytics_events para un evento normalizado, con los mismos
+    campos que rellena el worker al recibir el payload.
+    """
+    data = event.get('data') or {}
+    event_type = event['eventType']
+    return (
+        event['sessionId'],
+        event_type,
+        data.get('agentId') or data.get('agent') or None,
+        data.get('sceneId') or data.get('fromScene') or None,
+        data.get('choiceText') or None,
+        data.get('toScene') or data.get('nextSceneId') or None,
+        data.get('puzzleId') or None,
+        data.get('sceneId') if event_type == 'ending_reached' else None,
+        event.get('timestamp') or 0,
+        event.get('userAgent'),
+        None,
+        json.dumps(data, ensure_ascii=False),
+    )
+
+
+def load_events(conn, events, batch_size=BATCH_SIZE):
+    """
+    Inserta eventos normalizados por lotes (un executemany por transacción).
+
+    Returns:
+        Tuple (eventos leídos, filas insertadas)
+    """
+    read = inserted = 0
+    batch = []
+
+    def flush():
+        before = conn.total_changes
+        with conn:
+            conn.executemany(INSERT_SQL, batch)
+        batch.clear()
+        return conn.total_changes - before
+
+    for event in events:
+        batch.append(event_row(event))
+        read += 1
+        if len(batch) >= batch_size:
+            inserted += flush()
+    if batch:
+        inserted += flush()
+    return read, inserted
+
+
+def _ordered_counter(rows):
+    """Counter desde filas (clave, nº) ya ordenadas por primera aparición."""
+    counts = Counter()
+    for key, count in rows:
+        counts[key] += count
+    return counts
+
+
+class SqliteSummary:
+    """
+    Informe calculado con agregados SQL, con los mismos atributos que
+    EventAggregator: counts, conversion, scenes, timing, puzzles y sessions.
+
+    Los GROUP BY se ordenan por MIN(id) para que las claves queden en orden
+    de primera aparición y most_common() desempate como en una pasada.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        query = lambda sql, *params: conn.execute(sql, params).fetchall()
+
+        self.counts = SimpleNamespace(
+            total=query("SELECT COUNT(*) FROM analytics_events")[0][0],
+            by_type=_ordered_counter(query("""
+                SELECT event_type, COUNT(*) FROM analytics_events
+                GROUP BY event_type ORDER BY MIN(id)
+            """)),
+            sessions={row[0] for row in query("SELECT DISTINCT session_id FROM analytics_events")},
+        )
+
+        def count_type(event_type):
+            return query("SELECT COUNT(*) FROM analytics_events WHERE event_type = ?", event_type)[0][0]
+
+        self.conversion = SimpleNamespace(
+            sessions_started=count_type('session_start'),
+            missions_started=count_type('mission_start'),
+            ended_sessions={row[0] for row in query("""
+                SELECT DISTINCT session_id FROM analytics_events WHERE event_type = 'ending_reached'
+            """)},
+            agents=_ordered_counter(query("""
+                SELECT COALESCE(json_extract(metadata, '$.agent'), 'unknown'), COUNT(*)
+                FROM analytics_events WHERE event_type = 'session_start'
+                GROUP BY 1 ORDER BY MIN(id)
+            """)),
+        )
+
+        self.scenes = SimpleNamespace(
+            views=_ordered_counter(query("""
+                SELECT scene_id, COUNT(*) FROM analytics_events WHERE event_type = 'scene_view'
+                GROUP BY scene_id ORDER BY MIN(id)
+            """)),
+            choices=_ordered_counter(query("""
+                SELECT scene_id || ' → ' || target_scene, COUNT(*) FROM analytics_events
+                WHERE event_type = 'choice_made'
+                GROUP BY scene_id, target_scene ORDER BY MIN(id)
+            """)),
+            endings=_ordered_counter(query("""
+                SELECT ending_id, COUNT(*) FROM analytics_events WHERE event_type = 'ending_reached'
+                GROUP BY ending_id ORDER BY MIN(id)
+            """)),
+        )
+
+        count, total, minimum, maximum = query("""
+            SELECT COUNT(t), SUM(t), MIN(t), MAX(t) FROM (
+                SELECT json_extract(metadata, '$.totalSessionTime') AS t
+                FROM analytics_events WHERE event_type = 'ending_reached'
+            )
+        """)[0]
+        scene_rows = query("""
+            SELECT scene_id, SUM(json_extract(metadata, '$.duration')), COUNT(*)
+            FROM analytics_events WHERE event_type = 'scene_time'
+            GROUP BY scene_id ORDER BY MIN(id)
+        """)
+        self.timing = SimpleNamespace(
+            session_count=count,
+            session_total_ms=total or 0,
+            session_min_ms=minimum,
+            session_max_ms=maximum,
+            scene_total_ms={scene: total for scene, total, _ in scene_rows},
+            scene_count={scene: n for scene, _, n in scene_rows},
+        )
+
+        attempts, successes = query("""
+            SELECT COUNT(*), COALESCE(SUM(json_extract(metadata, '$.success') = 1), 0)
+            FROM analytics_events WHERE event_type = 'puzzle_complete'
+        """)[0]
+        self.puzzles = SimpleNamespace(attempts=attempts, successes=successes)
+
+        self.sessions = SqliteSessions(conn)
+
+
+class SqliteSessions:
+    """Abandono y caminos por sesión con funciones de ventana."""
+
+    # Primera aparición de la sesión (cualquier evento), por idx_session_id
+    FIRST_SEEN = "(SELECT MIN(e.id) FROM analytics_events e WHERE e.session_id = {alias}.session_id)"
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def abandonment_points(self):
+        """Última escena (por timestamp) de cada sesión sin final."""
+        return _ordered_counter(self.conn.execute(f"""
+            WITH last_view AS (
+                SELECT session_id, scene_id,
+                       ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY timestamp DESC, id) AS rn
+                FROM analytics_events WHERE event_type = 'scene_view'
+            ), abandoned AS (
+                SELECT session_id, scene_id FROM last_view
+                WHERE rn = 1 AND session_id NOT IN (
+                    SELECT session_id FROM analytics_events WHERE event_type = 'ending_reached'
+                )
+            )
+            SELECT scene_id, COUNT(*) FROM abandoned
+            GROUP BY scene_id ORDER BY MIN({self.FIRST_SEEN.format(alias='abandoned')})
+        """).fetchall())
+
+    def paths(self):
+        """Caminos completos 'a → b → c' de cada sesión, ordenados por timestamp."""
+        # group_concat acumulado por ventana: la última fila de cada sesión tiene el camino entero
+        return _ordered_counter(self.conn.execute(f"""
+            WITH views AS (
+                SELECT session_id,
+                       group_concat(scene_id, ' → ') OVER w AS path,
+                       ROW_NUMBER() OVER w AS rn,
+                       COUNT(*) OVER (PARTITION BY session_id) AS n
+                FROM analytics_events WHERE event_type = 'scene_view'
+                WINDOW w AS (PARTITION BY session_id ORDER BY timestamp, id ROWS UNBOUNDED PRECEDING)
+            ), session_paths AS (
+                SELECT session_id, path FROM views WHERE rn = n
+            )
+            SELECT path, COUNT(*) FROM session_paths
+            GROUP BY path ORDER BY MIN({self.FIRST_SEEN.format(alias='session_paths')})
+        """).fetchall())
+
+    def path_trie(self, **options):
+        """PathTrie con el camino de cada sesión, leyendo las visitas en orden (una sesión en memoria)."""
+        trie = PathTrie(**options)
+        rows = self.conn.execute("""
+            SELECT session_id, scene_id FROM analytics_events WHERE event_type = 'scene_view'
+            ORDER BY session_id, timestamp, id
+        """)
+        for _, views in groupby(rows, key=itemgetter(0)):
+            trie.add_path([scene for _, scene in views])
+        return trie
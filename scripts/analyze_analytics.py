@@ -2,30 +2,90 @@
 """
 Script para analizar los datos de analytics exportados del juego.
 
+Acepta la exportación como array JSON o JSONL, con o sin gzip. Los eventos
+se leen de forma incremental y se agregan según llegan, así que la memoria
+no depende del tamaño del fichero.
+
+Con --columnar los eventos se cargan en un almacén columnar (códigos
+enteros y arrays NumPy) y el informe se calcula con operaciones
+vectorizadas; añade percentiles de tiempos. Si el argumento es un directorio
+de caché (scripts/analytics_cache.py) se carga con memmap, sin parsear nada.
+
+Con --sqlite DB los eventos se cargan en una base SQLite con el esquema de
+D1 (workers/analytics/schema.sql) y el informe se calcula con SQL; sin
+fichero de eventos, se informa de lo que ya haya en la base.
+
+Con --checkpoint FILE el estado de los agregados se guarda entre
+ejecuciones y cada ejecución solo procesa los eventos posteriores a la marca
+de agua (ver scripts/analytics_checkpoint.py).
+
+Se pueden pasar varios ficheros, globs o directorios (toma sus
+portal27_analytics_*): cada fichero se agrega en un proceso y los parciales
+se combinan, incluidas las sesiones repartidas entre ficheros.
+
+Con --sketches la memoria no depende del volumen de eventos: las sesiones
+únicas y con final se estiman con HyperLogLog en vez de guardar sus ids, los
+caminos van a un trie con las sesiones inactivas cerradas sobre la marcha, y
+se añaden sesiones distintas por agente y día y percentiles de tiempos
+(DDSketch) (scripts/analytics_sketches.py). Todo es combinable.
+
+Con --path-prefix K se añade la minería de caminos (scripts/analytics_paths.py):
+caminos más comunes, prefijos de K escenas y bifurcaciones.
+
+Los eventos del payload del worker y las filas de D1 se normalizan a la
+forma de localStorage antes de analizarlos.
+
 Uso:
     python scripts/analyze_analytics.py portal27_analytics_XXXXX.json
+    python scripts/analyze_analytics.py portal27_analytics_XXXXX.jsonl.gz
+    python scripts/analyze_analytics.py exports/ --workers 8
+    python scripts/analyze_analytics.py portal27_analytics_XXXXX.json --columnar
+    python scripts/analyze_analytics.py analytics_cache/
+    python scripts/analyze_analytics.py portal27_analytics_XXXXX.json --sqlite analytics.db
+    python scripts/analyze_analytics.py --sqlite analytics.db
+    python scripts/analyze_analytics.py eventos_hoy.jsonl --checkpoint analytics_checkpoint.json
+    python scripts/analyze_analytics.py exports/ --sketches
 """
 
+import argparse
 import json
+import os
 import sys
-from pathlib import Path
-from collections import Counter, defaultdict
 from datetime import datetime
+from pathlib import Path
+from analytics_aggregators import EventAggregator
+from analytics_cache import is_cache, load_cache
+from analytics_checkpoint import Checkpoint
+from analytics_columnar import EventStore
+from analytics_io import iter_events, normalize_event
+from analytics_mapreduce import aggregate_files, expand_inputs
+from analytics_paths import PATH_SEPARATOR
+from analytics_sqlite import SqliteSummary, connect, is_sqlite, load_events as load_sqlite
 
 
 def load_events(filepath):
-    """Carga eventos desde un archivo JSON."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Carga todos los eventos normalizados en una lista (JSON, JSONL o gzip)."""
+    return [normalize_event(event) for event in iter_events(filepath)]
 
 
 def analyze_events(events):
-    """Analiza los eventos y genera estadísticas."""
+    """Analiza los eventos en una sola pasada y genera estadísticas."""
+    print_report(EventAggregator().consume(events))
+
+
+def print_report(aggregator):
+    """Imprime el informe a partir de un agregador ya alimentado (o un ColumnarSummary)."""
+    counts = aggregator.counts
+    conversion = aggregator.conversion
+    scenes = aggregator.scenes
+    timing = aggregator.timing
+    puzzles = aggregator.puzzles
 
     # Métricas básicas
-    total_events = len(events)
-    unique_sessions = len(set(e['sessionId'] for e in events))
-    event_types = Counter(e['eventType'] for e in events)
+    total_events = counts.total
+    unique_sessions = len(counts.sessions)
+    event_types = counts.by_type
+    approx = "" if isinstance(counts.sessions, set) else "~"  # HyperLogLog con --sketches
 
     print("=" * 60)
     print("📊 ANÁLISIS DE ANALYTICS - OPERACIÓN PORTAL 27")
@@ -34,7 +94,7 @@ def analyze_events(events):
 
     print(f"📈 Métricas generales:")
     print(f"   Total de eventos: {total_events}")
-    print(f"   Sesiones únicas: {unique_sessions}")
+    print(f"   Sesiones únicas: {approx}{unique_sessions}")
     print(f"   Eventos por sesión: {total_events / unique_sessions:.1f}")
     print()
 
@@ -44,68 +104,57 @@ def analyze_events(events):
     print()
 
     # Analizar sesiones
-    sessions_started = len([e for e in events if e['eventType'] == 'session_start'])
-    missions_started = len([e for e in events if e['eventType'] == 'mission_start'])
-    endings_reached = len(set(e['sessionId'] for e in events if e['eventType'] == 'ending_reached'))
+    sessions_started = conversion.sessions_started
+    missions_started = conversion.missions_started
+    endings_reached = len(conversion.ended_sessions)
 
     conversion_rate = (endings_reached / sessions_started * 100) if sessions_started > 0 else 0
 
     print(f"🎯 Conversión:")
     print(f"   Sesiones iniciadas: {sessions_started}")
     print(f"   Misiones iniciadas: {missions_started}")
-    print(f"   Sesiones con final: {endings_reached}")
+    print(f"   Sesiones con final: {approx}{endings_reached}")
     print(f"   Tasa de completación: {conversion_rate:.1f}%")
     print()
 
     # Analizar agentes
-    agent_events = [e for e in events if e['eventType'] == 'session_start']
-    agents = Counter(e['data'].get('agent', 'unknown') for e in agent_events)
+    agents = conversion.agents
 
     if agents:
         print(f"👥 Agentes más elegidos:")
         for agent, count in agents.most_common(10):
-            print(f"   {agent}: {count} ({count/len(agent_events)*100:.1f}%)")
+            print(f"   {agent}: {count} ({count/sessions_started*100:.1f}%)")
         print()
 
     # Analizar escenas
-    scene_events = [e for e in events if e['eventType'] == 'scene_view']
-    scenes = Counter(e['data']['sceneId'] for e in scene_events)
-
-    if scenes:
+    if scenes.views:
         print(f"🎬 Escenas más visitadas:")
-        for scene, count in scenes.most_common(10):
+        for scene, count in scenes.views.most_common(10):
             print(f"   {scene}: {count} visitas")
         print()
 
     # Analizar decisiones
-    choice_events = [e for e in events if e['eventType'] == 'choice_made']
-    choices = Counter(
-        f"{e['data']['fromScene']} → {e['data']['toScene']}"
-        for e in choice_events
-    )
-
-    if choices:
+    if scenes.choices:
         print(f"🔀 Decisiones más tomadas:")
-        for choice, count in choices.most_common(10):
+        for choice, count in scenes.choices.most_common(10):
             print(f"   {choice}: {count} veces")
         print()
 
     # Analizar finales
-    ending_events = [e for e in events if e['eventType'] == 'ending_reached']
-    endings = Counter(e['data']['sceneId'] for e in ending_events)
+    endings = scenes.endings
+    total_endings = sum(endings.values())
 
     if endings:
         print(f"🏁 Finales alcanzados:")
         for ending, count in endings.most_common():
-            print(f"   {ending}: {count} veces ({count/len(ending_events)*100:.1f}%)")
+            print(f"   {ending}: {count} veces ({count/total_endings*100:.1f}%)")
         print()
 
     # Analizar tiempos
-    if ending_events:
-        times = [e['data']['totalSessionTime'] / 1000 / 60 for e in ending_events]  # minutos
-        avg_time = sum(times) / len(times)
-        min_time = min(times)
-        max_time = max(times)
+    if timing.session_count:
+        avg_time = timing.session_total_ms / timing.session_count / 1000 / 60  # minutos
+        min_time = timing.session_min_ms / 1000 / 60
+        max_time = timing.session_max_ms / 1000 / 60
 
         print(f"⏱️  Tiempos de juego (sesiones completadas):")
         print(f"   Tiempo promedio: {avg_time:.1f} minutos")
@@ -113,69 +162,61 @@ def analyze_events(events):
         print(f"   Tiempo máximo: {max_time:.1f} minutos")
         print()
 
-    # Analizar tiempo por escena
-    scene_times = defaultdict(list)
-    for event in [e for e in events if e['eventType'] == 'scene_time']:
-        scene_id = event['data']['sceneId']
-        duration = event['data']['duration'] / 1000  # segundos
-        scene_times[scene_id].append(duration)
+    # Percentiles (exactos con el almacén columnar, aproximados con --sketches)
+    percentiles = getattr(aggregator, 'percentiles', None)
+    if percentiles:
+        print(f"📐 Percentiles de tiempos (p50 / p90 / p99):")
+        for label, (values, unit, scale) in percentiles.items():
+            print(f"   {label}: " + " / ".join(f"{v / scale:.1f}" for v in values.values()) + f" {unit}")
+        print()
+
+    # Sesiones distintas estimadas (solo con --sketches)
+    sketches = getattr(aggregator, 'sketches', None)
+    if sketches:
+        error = counts.sessions.relative_error() * 100
+        print(f"🧮 Sesiones distintas (HyperLogLog, ±{error:.1f}%): ~{unique_sessions}")
+        by_agent_day = sketches.distinct_by_agent_day()
+        if by_agent_day:
+            print(f"   Por agente y día (últimos {min(len(by_agent_day), 10)}):")
+            for (agent, day), estimate in list(by_agent_day.items())[-10:]:
+                print(f"   {day} {agent}: ~{estimate}")
+        print()
 
-    if scene_times:
+    # Analizar tiempo por escena
+    if timing.scene_count:
         print(f"📍 Tiempo promedio por escena (top 10):")
         avg_scene_times = {
-            scene: sum(times) / len(times)
-            for scene, times in scene_times.items()
+            scene: timing.scene_total_ms[scene] / 1000 / count
+            for scene, count in timing.scene_count.items()
         }
         for scene, avg_time in sorted(avg_scene_times.items(), key=lambda x: x[1], reverse=True)[:10]:
             print(f"   {scene}: {avg_time:.1f}s")
         print()
 
     # Analizar puzzles
-    puzzle_events = [e for e in events if e['eventType'] == 'puzzle_complete']
-    if puzzle_events:
-        puzzles_success = len([e for e in puzzle_events if e['data'].get('success')])
-        puzzles_fail = len(puzzle_events) - puzzles_success
-        success_rate = (puzzles_success / len(puzzle_events) * 100) if puzzle_events else 0
+    if puzzles.attempts:
+        puzzles_success = puzzles.successes
+        puzzles_fail = puzzles.attempts - puzzles_success
+        success_rate = puzzles_success / puzzles.attempts * 100
 
         print(f"🧩 Puzzles:")
-        print(f"   Total de intentos: {len(puzzle_events)}")
+        print(f"   Total de intentos: {puzzles.attempts}")
         print(f"   Completados: {puzzles_success}")
         print(f"   Fallados: {puzzles_fail}")
         print(f"   Tasa de éxito: {success_rate:.1f}%")
         print()
 
     # Analizar uso de funciones
-    back_button_uses = len([e for e in events if e['eventType'] == 'back_button'])
-    resets = len([e for e in events if e['eventType'] == 'mission_reset'])
-    agent_switches = len([e for e in events if e['eventType'] == 'agent_switch'])
-
     print(f"🎮 Uso de funcionalidades:")
-    print(f"   Botón 'Atrás': {back_button_uses} veces")
-    print(f"   Reinicio de misión: {resets} veces")
-    print(f"   Cambio de agente: {agent_switches} veces")
+    print(f"   Botón 'Atrás': {event_types['back_button']} veces")
+    print(f"   Reinicio de misión: {event_types['mission_reset']} veces")
+    print(f"   Cambio de agente: {event_types['agent_switch']} veces")
     print()
 
     # Analizar abandono
-    sessions_by_id = defaultdict(list)
-    for event in events:
-        sessions_by_id[event['sessionId']].append(event)
-
-    incomplete_sessions = [
-        session_events for session_id, session_events in sessions_by_id.items()
-        if not any(e['eventType'] == 'ending_reached' for e in session_events)
-    ]
-
-    if incomplete_sessions:
-        last_scenes = []
-        for session_events in incomplete_sessions:
-            scene_views = [e for e in session_events if e['eventType'] == 'scene_view']
-            if scene_views:
-                # Ordenar por timestamp y tomar la última
-                last_scene = max(scene_views, key=lambda x: x['timestamp'])
-                last_scenes.append(last_scene['data']['sceneId'])
-
-        abandonment_points = Counter(last_scenes)
+    abandonment_points = aggregator.sessions.abandonment_points()
 
+    if len(conversion.ended_sessions) < unique_sessions:
         print(f"🚪 Puntos de abandono (escenas donde más usuarios dejan el juego):")
         for scene, count in abandonment_points.most_common(10):
             print(f"   {scene}: {count} abandonos")
@@ -183,17 +224,7 @@ def analyze_events(events):
 
     # Análisis de caminos completos
     print(f"🗺️  Análisis de caminos:")
-    paths = []
-    for session_events in sessions_by_id.values():
-        scene_views = sorted(
-            [e for e in session_events if e['eventType'] == 'scene_view'],
-            key=lambda x: x['timestamp']
-        )
-        if scene_views:
-            path = ' → '.join(e['data']['sceneId'] for e in scene_views)
-            paths.append(path)
-
-    path_counts = Counter(paths)
+    path_counts = aggregator.sessions.paths()
     if path_counts:
         print(f"   Caminos únicos: {len(path_counts)}")
         print(f"   Top 5 caminos más comunes:")
@@ -207,29 +238,140 @@ def analyze_events(events):
     print("=" * 60)
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Uso: python scripts/analyze_analytics.py <archivo.json>")
-        print("Ejemplo: python scripts/analyze_analytics.py portal27_analytics_1234567890.json")
-        sys.exit(1)
+def print_path_mining(trie, k):
+    """Imprime top de caminos, prefijos de longitud k y bifurcaciones del trie."""
+    print("=" * 60)
+    print("🌳 MINERÍA DE CAMINOS")
+    print("=" * 60)
+    print()
+    print(f"   Nodos del trie: {len(trie)} ({trie.count[0]} caminos)")
+    if trie.pruned_floor:
+        print(f"   Poda: prefijos con ≤{trie.pruned_floor} caminos descartados")
+    print()
 
-    filepath = Path(sys.argv[1])
+    print("🏆 Caminos completos más comunes (space-saving):")
+    for i, (path, count, error) in enumerate(trie.top(5), 1):
+        bound = f" ±{error}" if error else ""
+        print(f"   {i}. ({count}{bound} veces) {PATH_SEPARATOR.join(path)[:100]}")
+    print()
 
-    if not filepath.exists():
-        print(f"❌ Error: El archivo {filepath} no existe")
-        sys.exit(1)
+    print(f"🔡 Prefijos de {k} escenas más comunes:")
+    for prefix, count in trie.prefixes(k, 5):
+        print(f"   {count:6} {PATH_SEPARATOR.join(prefix)[:100]}")
+    print()
 
-    try:
-        events = load_events(filepath)
+    print("🔀 Bifurcaciones con más tráfico:")
+    for prefix, total, split in trie.branching(5):
+        shares = ", ".join(f"{scene or 'fin'} {share * 100:.0f}%" for scene, share in split[:4])
+        print(f"   {prefix[-1] if prefix else '(inicio)'} (prof. {len(prefix)}, {total} caminos): {shares}")
+    print()
 
-        if not events:
+
+def iter_all_events(paths):
+    """Eventos normalizados de varios ficheros, uno detrás de otro."""
+    for path in paths:
+        yield from map(normalize_event, iter_events(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Analiza exportaciones de analytics del juego",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s portal27_analytics_1234567890.json
+  %(prog)s eventos.jsonl.gz
+  %(prog)s exports/                        # todos sus portal27_analytics_*
+  %(prog)s "exports/*.json" --workers 8
+  %(prog)s portal27_analytics_1234567890.json --columnar
+  %(prog)s analytics_cache/
+  %(prog)s portal27_analytics_1234567890.json --sqlite analytics.db
+  %(prog)s --sqlite analytics.db
+  %(prog)s eventos_hoy.jsonl --checkpoint analytics_checkpoint.json
+  %(prog)s portal27_analytics_1234567890.json --path-prefix 4
+  %(prog)s exports/ --sketches
+        """
+    )
+
+    parser.add_argument("files", nargs='*',
+                        help="Exportaciones (JSON, JSONL, .gz), globs o directorios; "
+                             "o un directorio de caché o una base SQLite")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Cargar en el almacén columnar y calcular con NumPy (añade percentiles)")
+    parser.add_argument("--sqlite", default=None, metavar="DB",
+                        help="Cargar los eventos en esta base SQLite (esquema de D1) y calcular con SQL")
+    parser.add_argument("--checkpoint", default=None, metavar="FILE",
+                        help="Continuar desde este checkpoint, procesar solo eventos nuevos y guardarlo")
+    parser.add_argument("--sketches", action="store_true",
+                        help="Memoria constante: sesiones estimadas con HyperLogLog (en vez de exactas), "
+                             "sesiones por agente/día y percentiles aproximados")
+    parser.add_argument("--path-prefix", type=int, default=None, metavar="K",
+                        help="Añadir minería de caminos (trie): top caminos, prefijos de K escenas y bifurcaciones")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Procesos para agregar varios ficheros en paralelo (default: nº de CPUs)")
+
+    args = parser.parse_args()
+
+    if not args.files and args.sqlite is None:
+        parser.error("indica un fichero de eventos o --sqlite DB")
+    if args.checkpoint and (args.sqlite or args.columnar):
+        parser.error("--checkpoint solo funciona con el agregador de una pasada")
+    if args.sketches and (args.sqlite or args.columnar):
+        parser.error("--sketches solo funciona con el agregador de una pasada")
+
+    single = Path(args.files[0]) if len(args.files) == 1 else None
+    path_mining = args.path_prefix is not None
+
+    try:
+        if single is not None and is_sqlite(single):
+            aggregator = SqliteSummary(connect(single))
+        elif single is not None and single.is_dir() and is_cache(single):
+            aggregator = load_cache(single).summary()
+        else:
+            paths = expand_inputs(args.files)
+            if len(paths) > 1:
+                print(f"🗂️  {len(paths)} ficheros de eventos")
+
+            if args.sqlite:
+                conn = connect(args.sqlite)
+                if paths:
+                    read, inserted = load_sqlite(conn, iter_all_events(paths))
+                    print(f"🗄️  {read} eventos leídos, {inserted} nuevos en {args.sqlite}")
+                aggregator = SqliteSummary(conn)
+            elif args.columnar:
+                aggregator = EventStore.from_events(iter_all_events(paths)).summary()
+            elif args.checkpoint:
+                checkpoint = Checkpoint.load(args.checkpoint, args.sketches, path_mining).consume(iter_all_events(paths))
+                closed = checkpoint.save(args.checkpoint)
+                aggregator = checkpoint.aggregator
+                watermark = checkpoint.watermark
+                if watermark is not None:
+                    watermark = datetime.fromtimestamp(watermark / 1000).isoformat(timespec='seconds')
+                print(f"🔖 Checkpoint {args.checkpoint}: {checkpoint.new_events} eventos nuevos, "
+                      f"{checkpoint.skipped_events} ya procesados, {closed} sesiones cerradas, marca {watermark}")
+            elif len(paths) > 1:
+                aggregator = aggregate_files(paths, args.workers, args.sketches, path_mining)
+            else:
+                aggregator = EventAggregator(args.sketches, path_mining).consume(iter_all_events(paths))
+
+            if isinstance(aggregator, EventAggregator) and aggregator.sessions.trie is not None:
+                # Fin de la ejecución: las sesiones abiertas pasan al trie (el checkpoint ya está guardado)
+                aggregator.sessions.flush()
+
+        if not aggregator.counts.total:
             print("⚠️  El archivo no contiene eventos")
             sys.exit(1)
 
-        analyze_events(events)
+        print_report(aggregator)
 
-    except json.JSONDecodeError:
-        print(f"❌ Error: El archivo {filepath} no es un JSON válido")
+        if path_mining:
+            print_path_mining(aggregator.sessions.path_trie(), args.path_prefix)
+
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    except json.JSONDecodeError as e:
+        print(f"❌ Error: Un archivo no es un JSON válido ({e})")
         sys.exit(1)
     except Exception as e:
         print(f"❌ Error: {str(e)}")
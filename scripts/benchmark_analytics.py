@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Benchmark del análisis de analytics con eventos sintéticos.
+
+Genera sesiones deterministas recorriendo el grafo real de story.json (con
+puzzles, botón atrás, abandonos y finales) con la misma forma que la
+exportación de localStorage, y mide el agregador de una pasada a varios
+tamaños: tiempo por evento (debe ser constante: coste lineal) y pico de
+memoria de Python (tracemalloc), que crece con las sesiones y no con los
+eventos. El coste del generador sintético se descuenta del tiempo.
+
+Uso:
+    python scripts/benchmark_analytics.py
+    python scripts/benchmark_analytics.py --sizes 10000 100000 1000000
+    python scripts/benchmark_analytics.py --engine columnar
+    python scripts/benchmark_analytics.py --write-sample portal27_analytics_sample.json --sessions 500
+"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from analytics_aggregators import EventAggregator
+from analytics_columnar import EventStore
+
+
+# 2026-12-27 11:20 (hora de inicio de la historia) en ms
+SYNTHETIC_START_MS = 1798366800000
+
+USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Synthetic"
+
+
+def load_json(path):
+    """Carga un archivo JSON."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def synthetic_events(story, agents, n_sessions, seed=27, abandon_rate=0.04, back_rate=0.05):
+    """
+    Genera eventos sintéticos sesión a sesión (generador, sin listas intermedias).
+
+    Cada sesión empieza en meta.start y elige opciones al azar hasta llegar a
+    un final o abandonar. Los puzzles se resuelven con probabilidad 0.7 y se
+    reintentan si fallan.
+    """
+    rng = random.Random(seed)
+    scenes = story['scenes']
+    start = story.get('meta', {}).get('start', 'intro')
+    agent_items = list(agents.items())
+
+    for n in range(n_sessions):
+        session_start = SYNTHETIC_START_MS + n * 45000 + rng.randrange(30000)
+        session_id = f"{session_start}-{n:09x}"
+        clock = [session_start]
+
+        def event(event_type, data):
+            return {
+                'sessionId': session_id,
+                'timestamp': clock[0],
+                'sessionDuration': clock[0] - session_start,
+                'eventType': event_type,
+                'data': data,
+                'userAgent': USER_AGENT,
+                'screen': {'width': 390, 'height': 844},
+                'viewport': {'width': 390, 'height': 664},
+            }
+
+        agent_id, agent = agent_items[rng.randrange(len(agent_items))]
+        yield event('session_start', {'agent': agent.get('name', agent_id), 'agentId': agent_id})
+        clock[0] += rng.randrange(2000, 15000)
+        yield event('mission_start', {})
+
+        history = []
+        scene_id = start
+        previous = None
+        for _ in range(60):
+            scene = scenes.get(scene_id, {})
+            if previous is not None:
+                yield event('scene_time', {'sceneId': previous, 'duration': clock[0] - previous_at})
+            yield event('scene_view', {
+                'sceneId': scene_id,
+                'isEnding': scene.get('ending') is True,
+                'hasChoices': bool(scene.get('choices')),
+                'hasPuzzle': bool(scene.get('puzzle')),
+            })
+            previous, previous_at = scene_id, clock[0]
+            history.append(scene_id)
+            clock[0] += rng.randrange(4000, 90000)
+
+            if scene.get('ending') is True:
+                yield event('ending_reached', {'sceneId': scene_id, 'totalSessionTime': clock[0] - session_start})
+                break
+            if rng.random() < abandon_rate:
+                break
+
+            puzzle = scene.get('puzzle')
+            if puzzle:
+                puzzle_id = puzzle.get('id', scene_id)
+                yield event('puzzle_start', {'puzzleId': puzzle_id, 'puzzleType': puzzle.get('type')})
+                attempts = 1
+                while rng.random() > 0.7 and attempts < 4:
+                    clock[0] += rng.randrange(5000, 30000)
+                    yield event('puzzle_complete', {'puzzleId': puzzle_id, 'success': False, 'attempts': attempts})
+                    attempts += 1
+                clock[0] += rng.randrange(5000, 30000)
+                yield event('puzzle_complete', {'puzzleId': puzzle_id, 'success': True, 'attempts': attempts})
+                scene_id = puzzle.get('successNext') or scene_id
+                continue
+
+            if len(history) > 1 and rng.random() < back_rate:
+                history.pop()
+                target = history.pop()
+                yield event('back_button', {'fromScene': scene_id, 'toScene': target})
+                scene_id = target
+                continue
+
+            choices = scene.get('choices') or []
+            if not choices:
+                break
+            choice = choices[rng.randrange(len(choices))]
+            yield event('choice_made', {'fromScene': scene_id, 'choiceText': choice.get('text'), 'toScene': choice['next']})
+            scene_id = choice['next']
+
+        if rng.random() < 0.03:
+            yield event('mission_reset', {'totalSessionTime': clock[0] - session_start})
+        if rng.random() < 0.02:
+            other_id = agent_items[rng.randrange(len(agent_items))][0]
+            yield event('agent_switch', {'fromAgent': agent_id, 'toAgent': other_id})
+
+
+def events_for_size(story, agents, n_events, seed=27):
+    """Primeros n_events eventos sintéticos (sesiones de sobra, cortadas al llegar)."""
+    # Una sesión media tiene ~20 eventos; se piden de más y se corta
+    generator = synthetic_events(story, agents, n_events // 5 + 10, seed)
+    for i, event in enumerate(generator):
+        if i >= n_events:
+            return
+        yield event
+
+
+def measure(run, trace_memory=False):
+    """Ejecuta run() y retorna (resultado, segundos, pico MB de tracemalloc o None)."""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - start
+    peak_mb = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / (1024 * 1024)
+    return result, elapsed, peak_mb
+
+
+def run_engine(engine, events):
+    """Calcula todo lo que necesita el informe con el motor indicado."""
+    if engine == 'columnar':
+        result = EventStore.from_events(events).summary()
+    else:
+        result = EventAggregator().consume(events)
+    result.sessions.abandonment_points()
+    result.sessions.paths()
+    return result
+
+
+def benchmark_size(story, agents, size, seed, engine='aggregator'):
+    """
+    Mide un motor de análisis ('aggregator' o 'columnar') con `size` eventos.
+
+    El tiempo del generador sintético se mide aparte y se descuenta; la
+    memoria se mide en una tercera pasada con tracemalloc (que ralentiza).
+
+    Returns:
+        Dict con eventos, sesiones, segundos del agregador y pico MB
+    """
+    def drain():
+        for _ in events_for_size(story, agents, size, seed):
+            pass
+
+    _, generate_s, _ = measure(drain)
+    result, total_s, _ = measure(lambda: run_engine(engine, events_for_size(story, agents, size, seed)))
+    _, _, peak_mb = measure(lambda: run_engine(engine, events_for_size(story, agents, size, seed)), trace_memory=True)
+    return {
+        'events': size,
+        'sessions': len(result.counts.sessions),
+        'seconds': max(0.0, total_s - generate_s),
+        'peak_mb': peak_mb,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark del agregador de analytics con eventos sintéticos",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s
+  %(prog)s --sizes 10000 100000 1000000
+  %(prog)s --engine columnar
+  %(prog)s --write-sample portal27_analytics_sample.json --sessions 500
+        """
+    )
+
+    parser.add_argument("--story-file", default="web/data/story.json",
+                        help="Historia con el grafo de escenas (default: web/data/story.json)")
+    parser.add_argument("--agents-file", default="web/data/agents.json",
+                        help="Archivo JSON con los agentes (default: web/data/agents.json)")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10000, 100000, 300000],
+                        help="Número de eventos de cada medida (default: 10000 100000 300000)")
+    parser.add_argument("--engine", choices=['aggregator', 'columnar'], default='aggregator',
+                        help="Motor a medir: agregador de una pasada o almacén columnar (default: aggregator)")
+    parser.add_argument("--seed", type=int, default=27, help="Semilla (default: 27)")
+    parser.add_argument("--write-sample", default=None,
+                        help="En lugar de medir, escribir una exportación sintética en este fichero")
+    parser.add_argument("--sessions", type=int, default=200,
+                        help="Sesiones de la exportación sintética (default: 200)")
+
+    args = parser.parse_args()
+
+    story = load_json(args.story_file)
+    agents = load_json(args.agents_file)
+    agents = agents.get('agents', agents)
+
+    if args.write_sample:
+        events = list(synthetic_events(story, agents, args.sessions, args.seed))
+        with open(args.write_sample, 'w', encoding='utf-8') as f:
+            json.dump(events, f, indent=2, ensure_ascii=False)
+        print(f"📄 {len(events)} eventos de {args.sessions} sesiones en {args.write_sample}")
+        return
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DE ANALYTICS - OPERACIÓN PORTAL 27")
+    print("=" * 60)
+    print()
+    print(f"⚙️  Motor: {args.engine}")
+    print(f"  {'eventos':>10} {'sesiones':>9} {'segundos':>9} {'µs/evento':>10} {'pico MB':>8} {'bytes/sesión':>13}")
+
+    for size in args.sizes:
+        row = benchmark_size(story, agents, size, args.seed, args.engine)
+        print(f"  {row['events']:10} {row['sessions']:9} {row['seconds']:9.2f} "
+              f"{row['seconds'] / size * 1e6:10.2f} {row['peak_mb']:8.1f} "
+              f"{row['peak_mb'] * 1024 * 1024 / max(1, row['sessions']):13.0f}")
+    print()
+    print("💡 µs/evento constante = tiempo lineal; el pico crece con las sesiones, no con el tamaño de los eventos")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
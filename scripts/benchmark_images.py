@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Benchmark del pipeline de imágenes sobre un corpus fijo de web/img.
+
+Ejecuta optimize_image() con sus modos (PNG, paleta, búsqueda sin pérdida,
+JPEG, baja memoria) y los codificadores directos (JPEG, WebP, PNG) sobre una
+muestra determinista de escenas, agentes, pósters y puzzles jigsaw, y
+reporta por caso:
+- Throughput de codificación (MP/s de entrada) y decodificación (MP/s de salida)
+- Bytes de salida
+- SSIM frente a la imagen de referencia al mismo tamaño
+- Pico de memoria residente por codificación (cada caso corre en un proceso nuevo)
+
+Los resultados se guardan como baseline JSON y --compare marca regresiones
+de velocidad o tamaño por encima de una tolerancia (sale con código 1).
+
+Uso:
+    python scripts/benchmark_images.py
+    python scripts/benchmark_images.py --save benchmarks/images_baseline.json
+    python scripts/benchmark_images.py --compare benchmarks/images_baseline.json
+    python scripts/benchmark_images.py --cases jpeg-q85 webp-q80 --per-category 1
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from optimize_images import get_peak_rss_mb, optimize_image, reset_peak_rss
+
+
+# Carpetas del corpus (relativas a web/img) y patrón de ficheros de cada una
+CORPUS_CATEGORIES = {
+    'scenarios': ('scenarios', '*.png'),
+    'agents': ('agents', '*_fullbody.png'),
+    'posters': ('posters', '*.png'),
+    'jigsaw': ('puzzles/jigsaw', '*.png'),
+}
+
+# Casos de optimize_image(): (nombre, formato de salida, calidad, kwargs)
+PIPELINE_CASES = [
+    ('optimize-png', 'png', None, {}),
+    ('optimize-palette', 'png', None, {'palette': True}),
+    ('optimize-palette-dither', 'png', None, {'palette': True, 'dither': True}),
+    ('optimize-lossless-search', 'png', None, {'lossless_search': True}),
+    ('optimize-jpeg-q85', 'jpeg', 85, {'convert_to_jpeg': True}),
+    ('optimize-jpeg-q85-low-memory', 'jpeg', 85, {'convert_to_jpeg': True, 'low_memory': True}),
+]
+
+# Codificadores directos sobre la imagen ya decodificada: (nombre, formato PIL, calidad, kwargs de save)
+ENCODER_CASES = [
+    ('jpeg-q70', 'JPEG', 70, {'optimize': True}),
+    ('jpeg-q85', 'JPEG', 85, {'optimize': True}),
+    ('jpeg-q95', 'JPEG', 95, {'optimize': True}),
+    ('webp-q80', 'WEBP', 80, {'method': 4}),
+    ('webp-q90', 'WEBP', 90, {'method': 4}),
+    ('webp-lossless', 'WEBP', None, {'lossless': True, 'method': 4}),
+    ('png-optimize', 'PNG', None, {'optimize': True}),
+]
+
+DEFAULT_THROUGHPUT_TOLERANCE = 0.15
+DEFAULT_SIZE_TOLERANCE = 0.02
+DEFAULT_SSIM_TOLERANCE = 0.005
+
+
+def sha256_file(path):
+    """Calcula el SHA-256 de un fichero."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def sample_corpus(img_dir, per_category=2):
+    """
+    Selecciona una muestra determinista de cada categoría.
+
+    Toma ficheros repartidos uniformemente en el listado ordenado, de modo
+    que la muestra solo cambia si cambian los ficheros de la carpeta.
+
+    Returns:
+        Lista de (categoría, ruta)
+    """
+    corpus = []
+    for category, (subdir, pattern) in CORPUS_CATEGORIES.items():
+        files = sorted((Path(img_dir) / subdir).glob(pattern))
+        if not files:
+            continue
+        count = min(per_category, len(files))
+        step = len(files) / count
+        corpus += [(category, files[int(i * step)]) for i in range(count)]
+    return corpus
+
+
+def get_rss_mb():
+    """Memoria residente actual del proceso en MB (0 si no hay /proc)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _luma(img):
+    """Luminancia en float64, componiendo la transparencia sobre blanco."""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        rgba = img.convert('RGBA')
+        background = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, rgba)
+    return np.asarray(img.convert('L'), dtype=np.float64)
+
+
+def _box_mean(values, window):
+    """Media en ventanas window×window (solo posiciones completas) con imagen integral."""
+    integral = np.pad(values.cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+    sums = (
+        integral[window:, window:] - integral[:-window, window:]
+        - integral[window:, :-window] + integral[:-window, :-window]
+    )
+    return sums / (window * window)
+
+
+def ssim(reference, candidate, window=7):
+    """
+    SSIM medio en luminancia (Wang et al. 2004) con ventana uniforme de 7×7.
+
+    Ambas imágenes deben tener el mismo tamaño.
+    """
+    x, y = _luma(reference), _luma(candidate)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mu_x, mu_y = _box_mean(x, window), _box_mean(y, window)
+    # Varianzas muestrales, como la implementación de referencia
+    norm = window * window / (window * window - 1)
+    var_x = (_box_mean(x * x, window) - mu_x * mu_x) * norm
+    var_y = (_box_mean(y * y, window) - mu_y * mu_y) * norm
+    cov = (_box_mean(x * y, window) - mu_x * mu_y) * norm
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))
+    return float(ssim_map.mean())
+
+
+def reference_at(source_path, size):
+    """Imagen original redimensionada con LANCZOS al tamaño de la salida."""
+    with Image.open(source_path) as img:
+        img.load()
+        if img.size != size:
+            return img.resize(size, Image.Resampling.LANCZOS)
+        return img.copy()
+
+
+def time_decode(data, repeat):
+    """Mejor tiempo de decodificación completa de unos bytes de imagen."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(encode, repeat):
+    """
+    Ejecuta encode() `repeat` veces y retorna (bytes, mejor tiempo, pico MB).
+
+    El pico es la memoria residente máxima por encima de la de partida de
+    cada llamada; sin /proc (macOS, Windows) queda a 0.
+    """
+    best = float('inf')
+    peak = 0.0
+    data = None
+    for _ in range(repeat):
+        if reset_peak_rss():
+            before = get_rss_mb()
+            start = time.perf_counter()
+            data = encode()
+            best = min(best, time.perf_counter() - start)
+            peak = max(peak, get_peak_rss_mb() - before)
+        else:
+            start = time.perf_counter()
+            data = encode()
+            best = min(best, time.perf_counter() - start)
+    return data, best, peak
+
+
+def run_pipeline_case(case, corpus, max_width, max_height, repeat, work_dir):
+    """Mide optimize_image() con un juego de opciones sobre todo el corpus."""
+    name, fmt, quality, kwargs = case
+    rows = []
+    for category, source_path in corpus:
+        with Image.open(source_path) as img:
+            input_mp = img.width * img.height / 1e6
+
+        output_path = Path(work_dir) / f"{name}_{source_path.name}"
+
+        def encode():
+            optimize_image(source_path, output_path, max_width=max_width, max_height=max_height,
+                           quality=quality or 85, **kwargs)
+            final_path = output_path.with_suffix('.jpg') if kwargs.get('convert_to_jpeg') else output_path
+            return final_path.read_bytes()
+
+        data, encode_s, peak_mb = measure(encode, repeat)
+        rows.append(_row(category, source_path, input_mp, data, encode_s, peak_mb, repeat))
+    return _summarize(name, fmt, quality, rows)
+
+
+def run_encoder_case(case, corpus, max_width, max_height, repeat):
+    """Mide un codificador directo sobre las imágenes ya decodificadas y redimensionadas."""
+    name, fmt, quality, save_kwargs = case
+    rows = []
+    for category, source_path in corpus:
+        with Image.open(source_path) as img:
+            img = img.convert('RGB')
+        img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+        input_mp = img.width * img.height / 1e6
+        if quality is not None:
+            save_kwargs = {**save_kwargs, 'quality': quality}
+
+        def encode():
+            buffer = io.BytesIO()
+            img.save(buffer, fmt, **save_kwargs)
+            return buffer.getvalue()
+
+        data, encode_s, peak_mb = measure(encode, repeat)
+        rows.append(_row(category, source_path, input_mp, data, encode_s, peak_mb, repeat))
+    return _summarize(name, fmt.lower(), quality, rows)
+
+
+def _row(category, source_path, input_mp, data, encode_s, peak_mb, repeat):
+    """Métricas de una imagen: decodifica la salida y calcula SSIM."""
+    decode_s = time_decode(data, repeat)
+    with Image.open(io.BytesIO(data)) as decoded:
+        decoded.load()
+        output_mp = decoded.width * decoded.height / 1e6
+        score = ssim(reference_at(source_path, decoded.size), decoded)
+    return {
+        'category': category,
+        'file': source_path.name,
+        'input_mp': input_mp,
+        'output_mp': output_mp,
+        'bytes': len(data),
+        'encode_s': encode_s,
+        'decode_s': decode_s,
+        'ssim': score,
+        'peak_mb': peak_mb,
+    }
+
+
+def _summarize(name, fmt, quality, rows):
+    """Agrega las filas de un caso: throughput sobre el total, SSIM medio y pico máximo."""
+    encode_s = sum(r['encode_s'] for r in rows)
+    decode_s = sum(r['decode_s'] for r in rows)
+    return {
+        'name': name,
+        'format': fmt,
+        'quality': quality,
+        'images': len(rows),
+        'bytes': sum(r['bytes'] for r in rows),
+        'encode_mps': round(sum(r['input_mp'] for r in rows) / encode_s, 3) if encode_s else 0.0,
+        'decode_mps': round(sum(r['output_mp'] for r in rows) / decode_s, 3) if decode_s else 0.0,
+        'ssim': round(sum(r['ssim'] for r in rows) / len(rows), 5) if rows else 0.0,
+        'min_ssim': round(min((r['ssim'] for r in rows), default=0.0), 5),
+        'peak_mb': round(max((r['peak_mb'] for r in rows), default=0.0), 1),
+        'per_image': [
+            {**r, 'encode_s': round(r['encode_s'], 4), 'decode_s': round(r['decode_s'], 4),
+             'ssim': round(r['ssim'], 5), 'peak_mb': round(r['peak_mb'], 1),
+             'input_mp': round(r['input_mp'], 3), 'output_mp': round(r['output_mp'], 3)}
+            for r in rows
+        ],
+    }
+
+
+def run_case(name, corpus, max_width, max_height, repeat):
+    """
+    Ejecuta un caso completo.
+
+    Se llama en un proceso nuevo por caso: así el pico de memoria no depende
+    de lo que los casos anteriores dejaron reservado en el allocator.
+    """
+    pipeline = {case[0]: case for case in PIPELINE_CASES}
+    if name in pipeline:
+        with tempfile.TemporaryDirectory() as work_dir:
+            summary = run_pipeline_case(pipeline[name], corpus, max_width, max_height, repeat, work_dir)
+    else:
+        encoder = {case[0]: case for case in ENCODER_CASES}[name]
+        summary = run_encoder_case(encoder, corpus, max_width, max_height, repeat)
+    return summary
+
+
+def compare_results(results, baseline, throughput_tolerance, size_tolerance, ssim_tolerance):
+    """
+    Compara los resultados con un baseline.
+
+    Returns:
+        Lista de mensajes de regresión (vacía si todo está dentro de tolerancia)
+    """
+    regressions = []
+    if baseline.get('meta', {}).get('corpus') != results['meta']['corpus']:
+        regressions.append("el corpus ha cambiado respecto al baseline (regenera el baseline con --save)")
+        return regressions
+
+    for name, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(name)
+        if previous is None:
+            continue
+        for metric in ('encode_mps', 'decode_mps'):
+            if previous[metric] and current[metric] < previous[metric] * (1 - throughput_tolerance):
+                change = (current[metric] / previous[metric] - 1) * 100
+                regressions.append(f"{name}: {metric} {previous[metric]:.2f} → {current[metric]:.2f} MP/s ({change:+.1f}%)")
+        if previous['bytes'] and current['bytes'] > previous['bytes'] * (1 + size_tolerance):
+            change = (current['bytes'] / previous['bytes'] - 1) * 100
+            regressions.append(f"{name}: bytes {previous['bytes']} → {current['bytes']} ({change:+.1f}%)")
+        if current['ssim'] < previous['ssim'] - ssim_tolerance:
+            regressions.append(f"{name}: SSIM {previous['ssim']:.4f} → {current['ssim']:.4f}")
+    return regressions
+
+
+def print_table(results):
+    """Imprime un caso por línea."""
+    print(f"  {'caso':30} {'KB':>9} {'enc MP/s':>9} {'dec MP/s':>9} {'SSIM':>7} {'pico MB':>8}")
+    for case in results['cases'].values():
+        print(f"  {case['name']:30} {case['bytes'] / 1024:9.0f} {case['encode_mps']:9.2f} "
+              f"{case['decode_mps']:9.2f} {case['ssim']:7.4f} {case['peak_mb']:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark de optimize_image() y de los codificadores sobre un corpus fijo",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s
+  %(prog)s --save benchmarks/images_baseline.json
+  %(prog)s --compare benchmarks/images_baseline.json --tolerance 0.2
+  %(prog)s --cases jpeg-q85 webp-q80 --per-category 1
+        """
+    )
+
+    parser.add_argument("--img-dir", default="web/img", help="Directorio de imágenes (default: web/img)")
+    parser.add_argument("--per-category", type=int, default=2,
+                        help="Imágenes por categoría en el corpus (default: 2)")
+    parser.add_argument("--max-width", type=int, default=1920, help="Ancho máximo (default: 1920)")
+    parser.add_argument("--max-height", type=int, default=1080, help="Alto máximo (default: 1080)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Repeticiones por medida; se toma el mejor tiempo (default: 3)")
+    parser.add_argument("--cases", nargs='+', default=None, help="Ejecutar solo estos casos")
+    parser.add_argument("--save", default=None, help="Guardar los resultados como baseline JSON")
+    parser.add_argument("--compare", default=None, help="Comparar con un baseline JSON y fallar si hay regresiones")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_THROUGHPUT_TOLERANCE,
+                        help=f"Caída de throughput tolerada (default: {DEFAULT_THROUGHPUT_TOLERANCE})")
+    parser.add_argument("--size-tolerance", type=float, default=DEFAULT_SIZE_TOLERANCE,
+                        help=f"Crecimiento de bytes tolerado (default: {DEFAULT_SIZE_TOLERANCE})")
+    parser.add_argument("--ssim-tolerance", type=float, default=DEFAULT_SSIM_TOLERANCE,
+                        help=f"Caída de SSIM tolerada (default: {DEFAULT_SSIM_TOLERANCE})")
+
+    args = parser.parse_args()
+
+    corpus = sample_corpus(args.img_dir, args.per_category)
+    if not corpus:
+        print(f"❌ Error: No hay imágenes de corpus en {args.img_dir}")
+        return 1
+
+    known = [case[0] for case in PIPELINE_CASES + ENCODER_CASES]
+    selected = args.cases or known
+    unknown = sorted(set(selected) - set(known))
+    if unknown:
+        print(f"❌ Error: Casos desconocidos: {', '.join(unknown)} (disponibles: {', '.join(known)})")
+        return 1
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DEL PIPELINE DE IMÁGENES - OPERACIÓN PORTAL 27")
+    print("=" * 60)
+    print()
+    print(f"🖼️  Corpus: {len(corpus)} imágenes")
+    for category, path in corpus:
+        print(f"   - {category:9} {path.name}")
+    print()
+
+    results = {
+        'meta': {
+            'version': 1,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'machine': platform.machine(),
+            'repeat': args.repeat,
+            'max_size': [args.max_width, args.max_height],
+            'corpus': {f"{category}/{path.name}": sha256_file(path) for category, path in corpus},
+        },
+        'cases': {},
+    }
+
+    for name in known:
+        if name not in selected:
+            continue
+        print(f"  ▶ {name}...")
+        # Un proceso por caso, uno detrás de otro, para no mezclar memoria ni tiempos
+        with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+            results['cases'][name] = executor.submit(
+                run_case, name, corpus, args.max_width, args.max_height, args.repeat
+            ).result()
+
+    print()
+    print_table(results)
+    print()
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"📄 Baseline guardado en: {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance, args.size_tolerance, args.ssim_tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regresiones respecto a {args.compare}:")
+            for message in regressions:
+                print(f"   - {message}")
+            print("=" * 60)
+            return 1
+        print(f"✅ Sin regresiones respecto a {args.compare}")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Empaqueta los avatares de los agentes en uno o varios atlas (sprites).
+
+El selector de agentes pedía un PNG por agente (y el modal del agente, otro
+más). Este script:
+- Lee los avatares de web/data/agents.json (y cualquier img/agents/*_avatar.png)
+- Los recorta a cuadrado y los reduce al tamaño de visualización
+- Los coloca en atlas WebP con un empaquetado por estanterías (shelf packing)
+- Escribe web/data/avatar_atlas.json con las coordenadas de cada agente y,
+  opcionalmente, una hoja CSS con una clase por agente
+
+Uso:
+    python scripts/build_avatar_atlas.py
+    python scripts/build_avatar_atlas.py --size 160 --max-atlas 1024
+    python scripts/build_avatar_atlas.py --css web/css/avatar_atlas.css
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+
+def load_json(path):
+    """Carga un archivo JSON."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def collect_avatars(web_dir):
+    """Retorna {agent_id: ruta_avatar} para los avatares que existen en disco."""
+    agents = load_json(web_dir / 'data' / 'agents.json')
+    agents = agents.get('agents', agents)
+
+    avatars = {}
+    for agent_id, agent in agents.items():
+        ref = agent.get('avatar') or f"img/agents/{agent_id}_avatar.png"
+        if (web_dir / ref).exists():
+            avatars[agent_id] = web_dir / ref
+    for path in sorted((web_dir / 'img' / 'agents').glob('*_avatar.png')):
+        avatars.setdefault(path.name[:-len('_avatar.png')], path)
+    return avatars
+
+
+def pack_shelves(sizes, max_width, max_height, padding=2):
+    """
+    Empaqueta rectángulos en atlas por estanterías.
+
+    Los rectángulos se ordenan por altura descendente y se colocan de
+    izquierda a derecha; cuando no caben en la fila se abre otra, y cuando no
+    caben en el atlas se abre un atlas nuevo.
+
+    Args:
+        sizes: Dict {clave: (ancho, alto)}
+        max_width: Ancho máximo de cada atlas
+        max_height: Alto máximo de cada atlas
+        padding: Separación en píxeles entre rectángulos (evita sangrado al escalar)
+
+    Returns:
+        Tuple (placements {clave: (atlas, x, y)}, lista de tamaños (ancho, alto) de cada atlas)
+    """
+    placements = {}
+    atlases = []
+    atlas = x = y = shelf_height = used_width = 0
+
+    for key, (w, h) in sorted(sizes.items(), key=lambda item: (-item[1][1], item[0])):
+        if w > max_width or h > max_height:
+            raise ValueError(f"{key} ({w}x{h}) no cabe en un atlas de {max_width}x{max_height}")
+        if x + w > max_width:
+            x, y, shelf_height = 0, y + shelf_height + padding, 0
+        if y + h > max_height:
+            atlases.append((used_width, y - padding))
+            atlas, x, y, shelf_height, used_width = atlas + 1, 0, 0, 0, 0
+        placements[key] = (atlas, x, y)
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+        used_width = max(used_width, x - padding)
+
+    if placements:
+        atlases.append((used_width, y + shelf_height))
+    return placements, atlases
+
+
+def build_atlases(avatars, size, max_atlas, output_dir, web_dir, quality=85):
+    """
+    Genera los atlas y retorna el manifest con las coordenadas de cada avatar.
+    """
+    tiles = {}
+    for agent_id, path in avatars.items():
+        with Image.open(path) as img:
+            tiles[agent_id] = ImageOps.fit(img.convert('RGBA'), (size, size), Image.Resampling.LANCZOS)
+
+    placements, atlas_sizes = pack_shelves(
+        {agent_id: tile.size for agent_id, tile in tiles.items()}, max_atlas, max_atlas
+    )
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    canvases = [Image.new('RGBA', atlas_size, (0, 0, 0, 0)) for atlas_size in atlas_sizes]
+    for agent_id, (atlas, x, y) in placements.items():
+        canvases[atlas].paste(tiles[agent_id], (x, y))
+
+    atlases = []
+    for i, canvas in enumerate(canvases):
+        atlas_path = output_dir / f"avatars_atlas_{i}.webp"
+        canvas.save(atlas_path, 'WEBP', quality=quality, method=6)
+        atlases.append({
+            'image': atlas_path.relative_to(web_dir).as_posix(),
+            'width': canvas.width,
+            'height': canvas.height,
+        })
+
+    return {
+        'meta': {'version': 1, 'size': size},
+        'atlases': atlases,
+        'avatars': {
+            agent_id: {'atlas': atlas, 'x': x, 'y': y, 'w': tiles[agent_id].width, 'h': tiles[agent_id].height}
+            for agent_id, (atlas, x, y) in sorted(placements.items())
+        },
+    }
+
+
+def sprite_style(entry, atlas):
+    """
+    Propiedades CSS de fondo para mostrar un sprite a cualquier tamaño de caja.
+
+    Usa porcentajes para que la misma regla valga con el avatar a 42, 70 u 80px.
+    """
+    w, h = entry['w'], entry['h']
+    width, height = atlas['width'], atlas['height']
+    pos_x = entry['x'] / (width - w) * 100 if width > w else 0
+    pos_y = entry['y'] / (height - h) * 100 if height > h else 0
+    return {
+        'background-size': f"{width / w * 100:.4f}% {height / h * 100:.4f}%",
+        'background-position': f"{pos_x:.4f}% {pos_y:.4f}%",
+    }
+
+
+def write_css(manifest, css_path, web_dir):
+    """Escribe una hoja CSS con una clase .avatar-sprite--{agente} por avatar."""
+    css_path = Path(css_path)
+    lines = [
+        "/* Generado por scripts/build_avatar_atlas.py - no editar a mano */",
+        ".avatar-sprite { background-repeat: no-repeat; }",
+    ]
+    for agent_id, entry in manifest['avatars'].items():
+        atlas = manifest['atlases'][entry['atlas']]
+        # url() relativa a la hoja CSS
+        atlas_url = Path(*(['..'] * len(css_path.parent.relative_to(web_dir).parts)), atlas['image']).as_posix()
+        props = sprite_style(entry, atlas)
+        lines.append(
+            f".avatar-sprite--{agent_id} {{ background-image: url({atlas_url}); "
+            f"background-size: {props['background-size']}; "
+            f"background-position: {props['background-position']}; }}"
+        )
+    css_path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Empaqueta los avatares de los agentes en atlas con manifest de coordenadas",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s
+  %(prog)s --size 160 --max-atlas 1024
+  %(prog)s --css web/css/avatar_atlas.css
+        """
+    )
+
+    parser.add_argument(
+        "--web-dir",
+        default="web",
+        help="Directorio publicado (default: web)"
+    )
+
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=160,
+        help="Lado de cada avatar en el atlas: 80px del selector x2 (default: 160)"
+    )
+
+    parser.add_argument(
+        "--max-atlas",
+        type=int,
+        default=1024,
+        help="Lado máximo de cada atlas en píxeles (default: 1024)"
+    )
+
+    parser.add_argument(
+        "--quality",
+        type=int,
+        default=85,
+        help="Calidad WebP 1-100 (default: 85)"
+    )
+
+    parser.add_argument(
+        "--css",
+        default=None,
+        help="Escribir también una hoja CSS con una clase por agente"
+    )
+
+    args = parser.parse_args()
+
+    web_dir = Path(args.web_dir)
+    manifest_file = web_dir / 'data' / 'avatar_atlas.json'
+
+    print("=" * 60)
+    print("🧱 ATLAS DE AVATARES - OPERACIÓN PORTAL 27")
+    print("=" * 60)
+    print()
+
+    avatars = collect_avatars(web_dir)
+    if not avatars:
+        print("⚠️  No se encontraron avatares")
+        return
+
+    manifest = build_atlases(avatars, args.size, args.max_atlas, web_dir / 'img' / 'agents', web_dir, args.quality)
+
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+    original_kb = sum(path.stat().st_size for path in avatars.values()) / 1024
+    atlas_kb = sum((web_dir / atlas['image']).stat().st_size for atlas in manifest['atlases']) / 1024
+
+    for atlas in manifest['atlases']:
+        print(f"  ✅ {atlas['image']} ({atlas['width']}x{atlas['height']}px)")
+    print()
+    print(f"👥 Avatares empaquetados: {len(manifest['avatars'])}")
+    print(f"📦 {len(avatars)} peticiones ({original_kb:.0f} KB) → "
+          f"{len(manifest['atlases'])} ({atlas_kb:.0f} KB)")
+    print(f"📄 Manifest: {manifest_file}")
+
+    if args.css:
+        write_css(manifest, args.css, web_dir)
+        print(f"🎨 CSS: {args.css}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Compone las tarjetas de agentes en hojas listas para imprimir (PNG o PDF).
+
+Sustituye a imprimir web/print-cards.html desde el navegador: cada tarjeta
+lleva el póster del agente (o su imagen de cuerpo entero), nombre y tag de
+agents.json y su código QR, con el mismo diseño que la página HTML, y se
+coloca en hojas A4 a los DPI indicados.
+
+- Tamaño de carta por defecto 63x88 mm (trading card): 9 por hoja A4
+- Las páginas se renderizan en paralelo en procesos separados
+- Cada proceso decodifica cada imagen una sola vez (caché de imágenes ya
+  redimensionadas y de tarjetas completas, útil con --copies)
+
+Uso:
+    python scripts/compose_print_cards.py
+    python scripts/compose_print_cards.py --format png --dpi 600
+    python scripts/compose_print_cards.py --qr-dir web/img/qr --cut-marks --copies 2
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont, ImageOps
+
+
+PAGE_SIZES = {
+    'A4': (210, 297),
+    'A3': (297, 420),
+    'Letter': (215.9, 279.4),
+}
+
+RED = (229, 9, 20)
+WHITE = (255, 255, 255)
+
+# Fuentes en orden de preferencia (Pillow las busca en los directorios del sistema)
+FONT_CANDIDATES = {
+    'black': ["Arial Black.ttf", "ariblk.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf"],
+    'bold': ["Arial Bold.ttf", "arialbd.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf"],
+    'italic': ["Arial Italic.ttf", "ariali.ttf", "DejaVuSans-Oblique.ttf", "DejaVuSans.ttf",
+               "LiberationSans-Italic.ttf"],
+}
+
+# Configuración del proceso de trabajo (se fija en _init_worker)
+_config = None
+
+
+def load_json(path):
+    """Carga un archivo JSON."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def mm_to_px(mm, dpi):
+    """Convierte milímetros a píxeles a una resolución dada."""
+    return round(mm / 25.4 * dpi)
+
+
+def parse_size(value):
+    """Convierte '63x88' en (63.0, 88.0) mm."""
+    width, height = value.lower().split('x')
+    return float(width), float(height)
+
+
+def collect_cards(web_dir, agents_file, qr_dir, background='poster', only=None, copies=1):
+    """
+    Reúne los datos de cada tarjeta a partir de agents.json.
+
+    Args:
+        background: 'poster' (img/posters/ona_{id}.png, con el cuerpo entero de
+            respaldo) o 'fullbody'
+
+    Returns:
+        Lista de dicts {id, name, tag, background, qr} (con las copias repetidas)
+    """
+    web_dir = Path(web_dir)
+    agents = load_json(agents_file)
+    agents = agents.get('agents', agents)
+
+    cards = []
+    for agent_id, agent in agents.items():
+        if only and agent_id not in only:
+            continue
+        fullbody = web_dir / (agent.get('fullbody') or f"img/agents/{agent_id}_fullbody.png")
+        poster = web_dir / 'img' / 'posters' / f"ona_{agent_id}.png"
+        image = poster if background == 'poster' and poster.exists() else fullbody
+        qr = Path(qr_dir) / f"qr_{agent_id}.png"
+        cards.append({
+            'id': agent_id,
+            'name': agent.get('name', agent_id),
+            'tag': agent.get('tag', ''),
+            'background': str(image) if image.exists() else None,
+            'qr': str(qr) if qr.exists() else None,
+        })
+    return [card for card in cards for _ in range(copies)]
+
+
+def page_grid(page_mm, card_mm, margin_mm, gap_mm):
+    """Columnas y filas de tarjetas que caben en la página."""
+    usable_w = page_mm[0] - 2 * margin_mm + gap_mm
+    usable_h = page_mm[1] - 2 * margin_mm + gap_mm
+    cols = int(usable_w // (card_mm[0] + gap_mm))
+    rows = int(usable_h // (card_mm[1] + gap_mm))
+    if cols < 1 or rows < 1:
+        raise ValueError(f"Una tarjeta de {card_mm[0]}x{card_mm[1]} mm no cabe en la página")
+    return cols, rows
+
+
+@lru_cache(maxsize=None)
+def _font(kind, size):
+    """Fuente TrueType del tipo indicado o la fuente por defecto de Pillow."""
+    for name in FONT_CANDIDATES[kind]:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=64)
+def _fitted_image(path, size):
+    """Imagen decodificada y recortada a `size` (centrada arriba, como object-position)."""
+    with Image.open(path) as img:
+        img.draft('RGB', size)
+        return ImageOps.fit(img.convert('RGB'), size, Image.Resampling.LANCZOS, centering=(0.5, 0.0))
+
+
+@lru_cache(maxsize=64)
+def _qr_image(path, size):
+    """
+    QR escalado a `size` píxeles de lado.
+
+    Al ampliar se usa un factor entero con NEAREST para mantener los módulos
+    nítidos; al reducir, LANCZOS conserva las esquinas redondeadas del estilo.
+    """
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+    if size >= img.width:
+        factor = size // img.width
+        img = img.resize((img.width * factor, img.height * factor), Image.Resampling.NEAREST)
+        canvas = Image.new('RGB', (size, size), WHITE)
+        canvas.paste(img, ((size - img.width) // 2, (size - img.height) // 2))
+        return canvas
+    return img.resize((size, size), Image.Resampling.LANCZOS)
+
+
+@lru_cache(maxsize=4)
+def _gradient_mask(size):
+    """Máscara del degradado oscuro (0.3 arriba, 0.5 en medio, 0.9 abajo)."""
+    width, height = size
+    column = Image.new('L', (1, height))
+    for y in range(height):
+        t = y / max(1, height - 1)
+        alpha = 0.3 + 0.4 * t if t < 0.5 else 0.5 + 0.8 * (t - 0.5)
+        column.putpixel((0, y), round(alpha * 255))
+    return column.resize(size)
+
+
+def _draw_spaced(draw, xy, text, font, fill, spacing):
+    """Dibuja texto con espaciado entre letras y retorna su ancho."""
+    x, y = xy
+    for char in text:
+        draw.text((x, y), char, font=font, fill=fill)
+        x += draw.textlength(char, font=font) + spacing
+    return x - xy[0] - spacing
+
+
+def _spaced_width(draw, text, font, spacing):
+    """Ancho de un texto dibujado con _draw_spaced."""
+    return sum(draw.textlength(char, font=font) for char in text) + spacing * (len(text) - 1)
+
+
+def _glow_text(card, center_x, y, text, font, spacing, radius):
+    """Texto rojo con resplandor (text-shadow) centrado en center_x."""
+    layer = Image.new('L', card.size, 0)
+    draw = ImageDraw.Draw(layer)
+    width = _spaced_width(draw, text, font, spacing)
+    _draw_spaced(draw, (center_x - width / 2, y), text, font, 255, spacing)
+    glow = layer.filter(ImageFilter.GaussianBlur(radius))
+    card.paste(Image.new('RGB', card.size, RED), mask=glow)
+    card.paste(Image.new('RGB', card.size, RED), mask=layer)
+
+
+@lru_cache(maxsize=None)
+def render_card(card_key):
+    """
+    Renderiza una tarjeta (cacheada por proceso: las copias no se redibujan).
+
+    Reproduce el diseño de print-cards.html: imagen de fondo, degradado,
+    título, nombre con resplandor, tag, QR en recuadro blanco y texto final.
+    """
+    card = dict(card_key)
+    dpi = _config['dpi']
+    size = (mm_to_px(_config['card_mm'][0], dpi), mm_to_px(_config['card_mm'][1], dpi))
+    width, height = size
+    px = lambda mm: mm_to_px(mm, dpi)  # noqa: E731
+
+    if card['background']:
+        image = _fitted_image(card['background'], size)
+    else:
+        image = Image.new('RGB', size, (0, 0, 0))
+    image = Image.composite(Image.new('RGB', size, (0, 0, 0)), image, _gradient_mask(size))
+    draw = ImageDraw.Draw(image)
+
+    padding = px(3)
+    center_x = width / 2
+
+    # Cabecera: título, nombre y tag
+    y = padding
+    title_font = _font('bold', px(2.2))
+    title = "OPERACIÓN PORTAL 27"
+    title_spacing = px(0.6)
+    _draw_spaced(draw, (center_x - _spaced_width(draw, title, title_font, title_spacing) / 2, y),
+                 title, title_font, RED, title_spacing)
+    y += px(3.6)
+
+    name = card['name'].upper()
+    name_size = px(7)
+    name_spacing = px(0.5)
+    while name_size > px(3) and _spaced_width(draw, name, _font('black', name_size), name_spacing) > width - 2 * padding:
+        name_size -= 1
+    _glow_text(image, center_x, y, name, _font('black', name_size), name_spacing, px(1))
+    draw = ImageDraw.Draw(image)
+    y += name_size + px(1.2)
+
+    tag_font = _font('italic', px(2.6))
+    draw.text((center_x, y), card['tag'], font=tag_font, fill=WHITE, anchor='ma')
+
+    # Pie: QR en recuadro blanco y "Escanea para jugar"
+    scan_font = _font('bold', px(2))
+    scan_text = "ESCANEA PARA JUGAR"
+    scan_spacing = px(0.25)
+    scan_y = height - padding - px(2)
+    _draw_spaced(draw, (center_x - _spaced_width(draw, scan_text, scan_font, scan_spacing) / 2, scan_y),
+                 scan_text, scan_font, WHITE, scan_spacing)
+
+    if card['qr']:
+        qr_size = px(_config['qr_mm'])
+        box_padding = px(1.5)
+        box_size = qr_size + 2 * box_padding
+        box_x = round(center_x - box_size / 2)
+        box_y = scan_y - px(1.5) - box_size
+        draw.rounded_rectangle((box_x, box_y, box_x + box_size, box_y + box_size), radius=px(1), fill=WHITE)
+        image.paste(_qr_image(card['qr'], qr_size), (box_x + box_padding, box_y + box_padding))
+
+    # Borde rojo
+    draw.rectangle((0, 0, width - 1, height - 1), outline=RED, width=max(1, px(0.8)))
+    return image
+
+
+def _init_worker(config):
+    """Fija la configuración del proceso de trabajo."""
+    global _config
+    _config = config
+
+
+def render_page(job):
+    """Renderiza una página y la guarda como PNG; retorna la ruta."""
+    page_index, cards, output_path = job
+    dpi = _config['dpi']
+    page_w, page_h = (mm_to_px(v, dpi) for v in _config['page_mm'])
+    card_w, card_h = (mm_to_px(v, dpi) for v in _config['card_mm'])
+    cols, rows = _config['grid']
+    gap = mm_to_px(_config['gap_mm'], dpi)
+
+    # Rejilla centrada en la página
+    grid_w = cols * card_w + (cols - 1) * gap
+    grid_h = rows * card_h + (rows - 1) * gap
+    left = (page_w - grid_w) // 2
+    top = (page_h - grid_h) // 2
+
+    page = Image.new('RGB', (page_w, page_h), WHITE)
+    for i, card in enumerate(cards):
+        col, row = i % cols, i // cols
+        x = left + col * (card_w + gap)
+        y = top + row * (card_h + gap)
+        page.paste(render_card(tuple(sorted(card.items()))), (x, y))
+
+    if _config['cut_marks']:
+        draw = ImageDraw.Draw(page)
+        mark = mm_to_px(4, dpi)
+        offset = mm_to_px(1, dpi)
+        line = max(1, mm_to_px(0.15, dpi))
+        xs = sorted({left + c * (card_w + gap) for c in range(cols)} | {left + c * (card_w + gap) + card_w for c in range(cols)})
+        ys = sorted({top + r * (card_h + gap) for r in range(rows)} | {top + r * (card_h + gap) + card_h for r in range(rows)})
+        # Marcas de corte fuera de la rejilla, alineadas con cada borde
+        for x in xs:
+            draw.line((x, top - offset - mark, x, top - offset), fill=(0, 0, 0), width=line)
+            draw.line((x, top + grid_h + offset, x, top + grid_h + offset + mark), fill=(0, 0, 0), width=line)
+        for y in ys:
+            draw.line((left - offset - mark, y, left - offset, y), fill=(0, 0, 0), width=line)
+            draw.line((left + grid_w + offset, y, left + grid_w + offset + mark, y), fill=(0, 0, 0), width=line)
+
+    page.save(output_path, 'PNG', dpi=(dpi, dpi))
+    return page_index, output_path
+
+
+def compose_sheets(cards, page_dir, config, workers):
+    """
+    Reparte las tarjetas en páginas y las renderiza en paralelo.
+
+    Las páginas se asignan a los procesos en bloques contiguos para que las
+    copias de una misma tarjeta caigan en el mismo proceso y reutilicen su caché.
+
+    Returns:
+        Lista de rutas PNG de las páginas en orden
+    """
+    per_page = config['grid'][0] * config['grid'][1]
+    jobs = [
+        (i, cards[start:start + per_page], str(Path(page_dir) / f"cards_page_{i + 1:02d}.png"))
+        for i, start in enumerate(range(0, len(cards), per_page))
+    ]
+    workers = max(1, min(workers, len(jobs)))
+    chunksize = max(1, -(-len(jobs) // workers))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config,)) as executor:
+        results = sorted(executor.map(render_page, jobs, chunksize=chunksize))
+    return [Path(path) for _, path in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compone tarjetas de agentes en hojas PNG/PDF listas para imprimir",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s
+  %(prog)s --format png --dpi 600
+  %(prog)s --qr-dir web/img/qr --cut-marks --copies 2
+  %(prog)s --card-size 95x135 --background fullbody
+        """
+    )
+
+    parser.add_argument("--web-dir", default="web", help="Directorio publicado (default: web)")
+    parser.add_argument("--agents-file", default="web/data/agents.json",
+                        help="Archivo JSON con los agentes (default: web/data/agents.json)")
+    parser.add_argument("--qr-dir", default="web/img/qr_styled",
+                        help="Directorio con los qr_{id}.png (default: web/img/qr_styled)")
+    parser.add_argument("--background", choices=['poster', 'fullbody'], default='poster',
+                        help="Fondo de la tarjeta: póster (si existe) o cuerpo entero (default: poster)")
+    parser.add_argument("--format", choices=['pdf', 'png'], default='pdf',
+                        help="PDF multipágina o un PNG por página (default: pdf)")
+    parser.add_argument("--output", default="print_cards",
+                        help="Directorio de salida (default: print_cards)")
+    parser.add_argument("--dpi", type=int, default=300, help="Resolución de impresión (default: 300)")
+    parser.add_argument("--card-size", default="63x88", help="Tamaño de tarjeta en mm (default: 63x88)")
+    parser.add_argument("--page-size", default="A4",
+                        help=f"Página: {', '.join(PAGE_SIZES)} o ANCHOxALTO en mm (default: A4)")
+    parser.add_argument("--margin", type=float, default=10, help="Margen mínimo de página en mm (default: 10)")
+    parser.add_argument("--gap", type=float, default=0, help="Separación entre tarjetas en mm (default: 0)")
+    parser.add_argument("--qr-size", type=float, default=20, help="Lado del QR en mm (default: 20)")
+    parser.add_argument("--cut-marks", action="store_true", help="Añadir marcas de corte en los márgenes")
+    parser.add_argument("--agents", nargs='+', default=None, help="Solo estos agentes (ids)")
+    parser.add_argument("--copies", type=int, default=1, help="Copias de cada tarjeta (default: 1)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Procesos en paralelo (default: número de CPUs)")
+
+    args = parser.parse_args()
+
+    agents_file = Path(args.agents_file)
+    if not agents_file.exists():
+        print(f"❌ Error: No se encuentra el archivo {agents_file}")
+        return 1
+
+    page_mm = PAGE_SIZES.get(args.page_size) or parse_size(args.page_size)
+    card_mm = parse_size(args.card_size)
+    try:
+        grid = page_grid(page_mm, card_mm, args.margin, args.gap)
+    except ValueError as e:
+        print(f"❌ Error: {str(e)}")
+        return 1
+
+    cards = collect_cards(args.web_dir, agents_file, args.qr_dir, args.background, args.agents, max(1, args.copies))
+    if not cards:
+        print("⚠️  No hay tarjetas que componer")
+        return
+
+    config = {
+        'dpi': args.dpi,
+        'page_mm': page_mm,
+        'card_mm': card_mm,
+        'grid': grid,
+        'gap_mm': args.gap,
+        'qr_mm': args.qr_size,
+        'cut_marks': args.cut_marks,
+    }
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print("=" * 60)
+    print("🎴 COMPOSITOR DE TARJETAS - OPERACIÓN PORTAL 27")
+    print("=" * 60)
+    print()
+    print(f"👥 Tarjetas: {len(cards)} ({card_mm[0]:g}x{card_mm[1]:g} mm)")
+    print(f"📄 Página: {page_mm[0]:g}x{page_mm[1]:g} mm a {args.dpi} ppp, {grid[0]}x{grid[1]} por hoja")
+    for card in cards[::max(1, args.copies)]:
+        missing = [label for label, key in (('fondo', 'background'), ('QR', 'qr')) if not card[key]]
+        if missing:
+            print(f"  ⚠️  {card['id']}: sin {' ni '.join(missing)}")
+    print()
+
+    if args.format == 'png':
+        pages = compose_sheets(cards, output_dir, config, args.workers)
+        for page in pages:
+            print(f"  ✅ {page}")
+    else:
+        with tempfile.TemporaryDirectory() as page_dir:
+            pages = compose_sheets(cards, page_dir, config, args.workers)
+            pdf_path = output_dir / "cards.pdf"
+            images = [Image.open(page) for page in pages]
+            images[0].save(pdf_path, 'PDF', save_all=True, append_images=images[1:], resolution=args.dpi)
+            for img in images:
+                img.close()
+        print(f"  ✅ {pdf_path} ({len(pages)} páginas, {pdf_path.stat().st_size / (1024 * 1024):.1f} MB)")
+
+    print()
+    print("=" * 60)
+    print(f"✅ {len(pages)} páginas compuestas")
+    print("💡 Imprime al 100% (sin 'ajustar a la página') para conservar el tamaño real")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Detecta imágenes duplicadas en web/img y unifica sus referencias.
+
+Construye un índice con el SHA-256 y dos hashes perceptuales (dHash y pHash)
+de cada imagen, y busca qué ficheros JSON/HTML/JS/CSS de web/ las referencian:
+- Duplicados exactos: mismo SHA-256 (bytes idénticos)
+- Casi duplicados: distancia de Hamming pequeña entre hashes perceptuales
+
+Con --rewrite, las referencias a duplicados exactos se reescriben para
+apuntar a una única copia canónica (la más referenciada). Los ficheros
+sobrantes no se borran: quedan sin referencias y los detecta el build.
+
+Uso:
+    python scripts/dedupe_assets.py
+    python scripts/dedupe_assets.py --threshold 4 --json-out dedupe_report.json
+    python scripts/dedupe_assets.py --rewrite
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp'}
+TEXT_EXTENSIONS = {'.json', '.html', '.js', '.css'}
+
+
+def sha256_file(path):
+    """Calcula el SHA-256 de un fichero leyendo por bloques."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Nº de bits a 1 de cada byte (np.bitwise_count solo existe desde NumPy 2.0)
+_BYTE_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1, dtype=np.uint8)
+
+
+def _popcount64(values):
+    """Bits a 1 de cada elemento de un array uint64 (distancia de Hamming tras un XOR)."""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    per_byte = _BYTE_POPCOUNT[values.view(np.uint8)].reshape(values.shape + (8,))
+    return per_byte.sum(axis=-1, dtype=np.uint8)
+
+
+def _bits_to_int(bits):
+    """Empaqueta un array booleano de 64 posiciones en un entero."""
+    return int(np.packbits(bits.astype(np.uint8)).view('>u8')[0])
+
+
+def dhash(img, size=8):
+    """Difference hash: compara píxeles adyacentes de una miniatura en grises."""
+    small = img.convert('L').resize((size + 1, size), Image.Resampling.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    return _bits_to_int((pixels[:, 1:] > pixels[:, :-1]).ravel())
+
+
+def _dct_matrix(n):
+    """Matriz de la DCT-II ortonormal de tamaño n×n."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def phash(img):
+    """Perceptual hash: signo de las frecuencias bajas de la DCT respecto a su mediana."""
+    small = img.convert('L').resize((32, 32), Image.Resampling.LANCZOS)
+    pixels = np.asarray(small, dtype=np.float64)
+    coefficients = _DCT32 @ pixels @ _DCT32.T
+    low = coefficients[:8, :8].ravel()
+    return _bits_to_int(low > np.median(low[1:]))
+
+
+def find_images(img_dir):
+    """Lista todas las imágenes bajo img_dir, ordenadas."""
+    return sorted(
+        p for p in Path(img_dir).rglob('*')
+        if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+def load_text_sources(web_dir):
+    """Carga el contenido de los ficheros JSON/HTML/JS/CSS publicados en web/."""
+    sources = {}
+    for path in sorted(Path(web_dir).rglob('*')):
+        if path.is_file() and path.suffix.lower() in TEXT_EXTENSIONS:
+            sources[path] = path.read_text(encoding='utf-8')
+    return sources
+
+
+def reference_forms(image_path, source_path, web_dir):
+    """
+    Retorna las cadenas con las que source_path puede referenciar image_path.
+
+    Se consideran la ruta relativa a web/ (``img/agents/x.png``) y, si el
+    fichero fuente está en otra carpeta, la ruta relativa a esa carpeta
+    (p. ej. ``qr_ada.png`` dentro de ``img/qr/index.html``).
+    """
+    web_dir = Path(web_dir)
+    forms = [image_path.relative_to(web_dir).as_posix()]
+    if source_path.parent != web_dir:
+        forms.append(Path(os.path.relpath(image_path, source_path.parent)).as_posix())
+    return forms
+
+
+def reference_pattern(forms):
+    """Regex que encuentra cualquiera de las rutas como ruta completa, no como sufijo de otra."""
+    alternatives = '|'.join(re.escape(form) for form in sorted(forms, key=len, reverse=True))
+    return re.compile(rf'(?<![\w./-])({alternatives})(?![\w.-])')
+
+
+def find_references(image_path, sources, web_dir):
+    """Retorna {fichero_fuente: [formas referenciadas]} para una imagen."""
+    found = {}
+    for source_path, text in sources.items():
+        forms = reference_forms(image_path, source_path, web_dir)
+        matched = sorted(set(reference_pattern(forms).findall(text)))
+        if matched:
+            found[source_path] = matched
+    return found
+
+
+def build_index(web_dir, img_dir):
+    """
+    Construye el índice de hashes y referencias de todas las imágenes.
+
+    Returns:
+        Dict {ruta_imagen: {sha256, size, dhash, phash, references}}
+    """
+    sources = load_text_sources(web_dir)
+    index = {}
+    for image_path in find_images(img_dir):
+        with Image.open(image_path) as img:
+            img.draft('RGB', (64, 64))
+            entry = {
+                'sha256': sha256_file(image_path),
+                'size': image_path.stat().st_size,
+                'dhash': dhash(img),
+                'phash': phash(img),
+            }
+        entry['references'] = find_references(image_path, sources, web_dir)
+        index[image_path] = entry
+    return index
+
+
+def exact_duplicate_groups(index):
+    """Agrupa las imágenes con el mismo SHA-256 (solo grupos de 2 o más)."""
+    by_hash = defaultdict(list)
+    for path, entry in index.items():
+        by_hash[entry['sha256']].append(path)
+    return [sorted(paths) for paths in by_hash.values() if len(paths) > 1]
+
+
+def near_duplicate_groups(index, threshold=6):
+    """
+    Agrupa imágenes perceptualmente casi idénticas pero con bytes distintos.
+
+    Dos imágenes son casi duplicadas si tanto su dHash como su pHash están a
+    una distancia de Hamming ≤ threshold. Los grupos se forman por cierre
+    transitivo (union-find).
+    """
+    paths = list(index)
+    if len(paths) < 2:
+        return []
+
+    dhashes = np.array([index[p]['dhash'] for p in paths], dtype=np.uint64)
+    phashes = np.array([index[p]['phash'] for p in paths], dtype=np.uint64)
+    d_dist = _popcount64(dhashes[:, None] ^ dhashes[None, :])
+    p_dist = _popcount64(phashes[:, None] ^ phashes[None, :])
+    close = (np.maximum(d_dist, p_dist) <= threshold)
+
+    parent = list(range(len(paths)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(*np.nonzero(np.triu(close, k=1))):
+        if index[paths[i]]['sha256'] != index[paths[j]]['sha256']:
+            parent[find(i)] = find(j)
+
+    groups = defaultdict(list)
+    for i in range(len(paths)):
+        groups[find(i)].append(paths[i])
+    return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def choose_canonical(paths, index):
+    """Elige la copia canónica: la más referenciada y, a igualdad, la de ruta más corta."""
+    return min(paths, key=lambda p: (-len(index[p]['references']), len(p.as_posix()), p.as_posix()))
+
+
+def rewrite_references(groups, index, web_dir):
+    """
+    Reescribe las referencias a duplicados exactos para que apunten a la copia canónica.
+
+    Returns:
+        Número de sustituciones realizadas
+    """
+    pending = defaultdict(dict)
+    for group in groups:
+        canonical = choose_canonical(group, index)
+        for duplicate in group:
+            if duplicate == canonical:
+                continue
+            for source_path in index[duplicate]['references']:
+                # Cada forma se sustituye por su equivalente (relativa a web/ o a la carpeta del fichero)
+                old_forms = reference_forms(duplicate, source_path, web_dir)
+                new_forms = reference_forms(canonical, source_path, web_dir)
+                pending[source_path].update(zip(old_forms, new_forms))
+
+    replacements = 0
+    for source_path, mapping in pending.items():
+        text = source_path.read_text(encoding='utf-8')
+        text, count = reference_pattern(mapping).subn(lambda m: mapping[m.group(1)], text)
+        replacements += count
+        source_path.write_text(text, encoding='utf-8')
+    return replacements
+
+
+def format_references(entry, web_dir):
+    """Formatea las referencias de una imagen para el informe."""
+    if not entry['references']:
+        return "sin referencias literales"
+    return ", ".join(str(p.relative_to(web_dir)) for p in entry['references'])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Detecta imágenes duplicadas y unifica sus referencias",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s
+  %(prog)s --threshold 4 --json-out dedupe_report.json
+  %(prog)s --rewrite
+        """
+    )
+
+    parser.add_argument(
+        "--web-dir",
+        default="web",
+        help="Directorio publicado con los JSON/HTML/JS/CSS (default: web)"
+    )
+
+    parser.add_argument(
+        "--img-dir",
+        default="web/img",
+        help="Directorio de imágenes a indexar (default: web/img)"
+    )
+
+    parser.add_argument(
+        "--threshold",
+        type=int,
+        default=6,
+        help="Distancia de Hamming máxima (0-64) para casi duplicados (default: 6)"
+    )
+
+    parser.add_argument(
+        "--json-out",
+        default=None,
+        help="Guardar el índice y los grupos de duplicados en un JSON"
+    )
+
+    parser.add_argument(
+        "--rewrite",
+        action="store_true",
+        help="Reescribir las referencias de duplicados exactos a la copia canónica"
+    )
+
+    args = parser.parse_args()
+
+    web_dir = Path(args.web_dir)
+    img_dir = Path(args.img_dir)
+    if not img_dir.exists():
+        print(f"❌ Error: El directorio {img_dir} no existe")
+        return 1
+
+    print("=" * 60)
+    print("🧬 DETECTOR DE IMÁGENES DUPLICADAS - OPERACIÓN PORTAL 27")
+    print("=" * 60)
+    print()
+
+    index = build_index(web_dir, img_dir)
+    exact_groups = exact_duplicate_groups(index)
+    near_groups = near_duplicate_groups(index, args.threshold)
+
+    print(f"🖼️  Imágenes indexadas: {len(index)}")
+    print()
+
+    wasted = 0
+    if exact_groups:
+        print(f"🟰 Duplicados exactos ({len(exact_groups)} grupos):")
+        for group in exact_groups:
+            canonical = choose_canonical(group, index)
+            wasted += index[canonical]['size'] * (len(group) - 1)
+            print(f"   SHA-256 {index[canonical]['sha256'][:12]}…")
+            for path in group:
+                marker = "⭐" if path == canonical else "  "
+                print(f"   {marker} {path.relative_to(web_dir)} ← {format_references(index[path], web_dir)}")
+        print(f"   Bytes duplicados: {wasted / (1024 * 1024):.2f} MB")
+        print()
+    else:
+        print("✅ No hay duplicados exactos")
+        print()
+
+    if near_groups:
+        print(f"≈  Casi duplicados ({len(near_groups)} grupos, umbral {args.threshold}):")
+        for group in near_groups:
+            print("   ---")
+            for path in group:
+                print(f"   {path.relative_to(web_dir)} ← {format_references(index[path], web_dir)}")
+        print()
+
+    if args.json_out:
+        report = {
+            'images': {
+                str(path.relative_to(web_dir)): {
+                    'sha256': entry['sha256'],
+                    'size': entry['size'],
+                    'dhash': f"{entry['dhash']:016x}",
+                    'phash': f"{entry['phash']:016x}",
+                    'references': [str(p.relative_to(web_dir)) for p in entry['references']],
+                }
+                for path, entry in index.items()
+            },
+            'exact_duplicates': [
+                {
+                    'canonical': str(choose_canonical(group, index).relative_to(web_dir)),
+                    'files': [str(p.relative_to(web_dir)) for p in group],
+                }
+                for group in exact_groups
+            ],
+            'near_duplicates': [[str(p.relative_to(web_dir)) for p in group] for group in near_groups],
+        }
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"📄 Informe guardado en: {args.json_out}")
+
+    if args.rewrite and exact_groups:
+        replacements = rewrite_references(exact_groups, index, web_dir)
+        print(f"✏️  Referencias reescritas: {replacements}")
+        print("💡 Las copias no canónicas ya no se referencian; revisa las rutas calculadas en JS antes de borrarlas")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
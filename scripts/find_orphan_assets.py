@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Detecta imágenes de web/ que ya no referencia ningún JSON, JS, HTML o CSS.
+
+Construye el grafo de referencias a partir de:
+- web/data/*.json, web/js/*.js, los HTML publicados y web/css/*.css
+- Rutas literales ("img/agents/zoe_fullbody.png", url(...), src="...")
+- Rutas calculadas en plantillas JS (`img/agents/${agentId}_fullbody.png`,
+  `${qrPath}/qr_${id}.png`), expandidas sobre los ids de agentes, escenas y
+  puzzles y sobre los literales asignados a esa variable en el mismo fichero
+
+Con --prune borra las imágenes huérfanas del directorio indicado; está
+pensado para ejecutarse sobre la salida del build (_output/), nunca sobre web/.
+
+Uso:
+    python scripts/find_orphan_assets.py
+    python scripts/find_orphan_assets.py --json-out orphans.json
+    python scripts/find_orphan_assets.py --web-dir _output --prune
+"""
+
+import argparse
+import itertools
+import json
+import re
+from pathlib import Path
+
+
+ASSET_EXTENSIONS = ('png', 'jpg', 'jpeg', 'webp', 'gif', 'svg')
+ASSET_REF_RE = re.compile(
+    r"(?:\$\{[^}]*\}|[\w./-])+\.(?:%s)\b" % '|'.join(ASSET_EXTENSIONS), re.IGNORECASE
+)
+PLACEHOLDER_RE = re.compile(r"\$\{([^}]*)\}")
+STRING_LITERAL_RE = re.compile(r"""['"]([^'"\n]*)['"]""")
+
+
+def load_json(path):
+    """Carga un archivo JSON."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def source_files(web_dir):
+    """Ficheros que pueden referenciar imágenes: JSON de datos, JS, HTML y CSS publicados."""
+    web_dir = Path(web_dir)
+    sources = []
+    sources += sorted((web_dir / 'data').glob('*.json'))
+    sources += sorted((web_dir / 'js').glob('*.js'))
+    sources += sorted((web_dir / 'css').glob('*.css'))
+    sources += sorted(web_dir.rglob('*.html'))
+    return sources
+
+
+def asset_files(web_dir):
+    """Imágenes publicadas bajo web/img."""
+    return sorted(
+        p for p in (Path(web_dir) / 'img').rglob('*')
+        if p.is_file() and p.suffix.lower().lstrip('.') in ASSET_EXTENSIONS
+    )
+
+
+def known_ids(web_dir):
+    """Ids con los que se construyen rutas en JS: agentes, escenas y puzzles."""
+    data_dir = Path(web_dir) / 'data'
+    ids = set()
+    if (data_dir / 'agents.json').exists():
+        agents = load_json(data_dir / 'agents.json')
+        ids |= set(agents.get('agents', agents))
+    if (data_dir / 'story.json').exists():
+        ids |= set(load_json(data_dir / 'story.json').get('scenes', {}))
+    if (data_dir / 'puzzles.json').exists():
+        ids |= set(load_json(data_dir / 'puzzles.json').get('puzzles', {}))
+    return ids
+
+
+def variable_literals(text, name):
+    """Literales de texto asignados a una variable en el fichero (const x = a ? 'b' : 'c')."""
+    values = set()
+    for match in re.finditer(rf"\b{re.escape(name)}\s*=(?!=)([^;\n]*)", text):
+        values |= set(STRING_LITERAL_RE.findall(match.group(1)))
+    return values
+
+
+def expand_template(template, text, ids):
+    """
+    Expande una ruta con ${...} a todas sus combinaciones posibles.
+
+    Cada ${expr} se sustituye por los ids conocidos y por los literales
+    asignados a la variable de la expresión en el mismo fichero.
+    """
+    parts = PLACEHOLDER_RE.split(template)
+    literals, expressions = parts[0::2], parts[1::2]
+    choices = []
+    for expression in expressions:
+        name = expression.strip().split('.')[-1].split('(')[0]
+        choices.append(sorted(ids | variable_literals(text, name)))
+
+    expanded = set()
+    for combination in itertools.product(*choices):
+        path = literals[0]
+        for value, literal in zip(combination, literals[1:]):
+            path += value + literal
+        expanded.add(path)
+    return expanded
+
+
+def resolve_reference(ref, source_path, web_dir):
+    """Rutas candidatas de una referencia: relativa al fichero, a web/ y a web/img/."""
+    ref = ref.split('?')[0].split('#')[0].lstrip('/')
+    if ref.startswith('./'):
+        ref = ref[2:]
+    bases = [source_path.parent, web_dir, web_dir / 'img']
+    return {(base / ref).resolve() for base in bases}
+
+
+def build_reference_graph(web_dir):
+    """
+    Construye el grafo {imagen: {ficheros que la referencian}}.
+
+    Returns:
+        Tuple (grafo, plantillas encontradas [(fichero, plantilla, nº expansiones)])
+    """
+    web_dir = Path(web_dir).resolve()
+    ids = known_ids(web_dir)
+    assets = {p.resolve() for p in asset_files(web_dir)}
+    graph = {asset: set() for asset in assets}
+    templates = []
+
+    for source_path in source_files(web_dir):
+        text = source_path.read_text(encoding='utf-8')
+        for ref in set(ASSET_REF_RE.findall(text)):
+            if ref.startswith(('http:', 'https:', 'data:')):
+                continue
+            if '${' in ref:
+                candidates = expand_template(ref, text, ids)
+                templates.append((source_path, ref, len(candidates)))
+            else:
+                candidates = {ref}
+            for candidate in candidates:
+                for resolved in resolve_reference(candidate, source_path.resolve(), web_dir):
+                    if resolved in graph:
+                        graph[resolved].add(source_path.resolve())
+
+    return graph, templates
+
+
+def find_orphans(web_dir):
+    """Imágenes sin ninguna referencia, ordenadas por ruta."""
+    graph, _ = build_reference_graph(web_dir)
+    return sorted(asset for asset, refs in graph.items() if not refs)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Detecta imágenes no referenciadas y opcionalmente las excluye del build",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s
+  %(prog)s --json-out orphans.json
+  %(prog)s --web-dir _output --prune
+        """
+    )
+
+    parser.add_argument(
+        "--web-dir",
+        default="web",
+        help="Directorio publicado o salida del build (default: web)"
+    )
+
+    parser.add_argument(
+        "--json-out",
+        default=None,
+        help="Guardar la lista de huérfanos y el grafo de referencias en un JSON"
+    )
+
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Borrar las imágenes huérfanas (usar solo sobre la salida del build)"
+    )
+
+    args = parser.parse_args()
+
+    web_dir = Path(args.web_dir).resolve()
+    if not (web_dir / 'img').exists():
+        print(f"❌ Error: No existe {web_dir / 'img'}")
+        return 1
+
+    if args.prune and web_dir == (Path.cwd() / 'web').resolve():
+        print("❌ Error: --prune no se puede usar sobre web/; ejecútalo sobre _output/")
+        return 1
+
+    graph, templates = build_reference_graph(web_dir)
+    orphans = sorted(asset for asset, refs in graph.items() if not refs)
+    orphan_bytes = sum(p.stat().st_size for p in orphans)
+    total_bytes = sum(p.stat().st_size for p in graph)
+
+    print("=" * 60)
+    print("🕸️  IMÁGENES HUÉRFANAS - OPERACIÓN PORTAL 27")
+    print("=" * 60)
+    print()
+    print(f"🖼️  Imágenes publicadas: {len(graph)} ({total_bytes / (1024 * 1024):.2f} MB)")
+    print("🧮 Rutas calculadas expandidas:")
+    for source_path, template, count in sorted(templates):
+        print(f"   {source_path.relative_to(web_dir)}: {template} ({count} combinaciones)")
+    print()
+
+    if orphans:
+        print(f"🗑️  Sin referencias: {len(orphans)} ({orphan_bytes / (1024 * 1024):.2f} MB)")
+        for path in orphans:
+            print(f"   {path.relative_to(web_dir)} ({path.stat().st_size / 1024:.0f} KB)")
+    else:
+        print("✅ Todas las imágenes están referenciadas")
+    print()
+
+    if args.json_out:
+        report = {
+            'orphans': [str(p.relative_to(web_dir)) for p in orphans],
+            'orphan_bytes': orphan_bytes,
+            'references': {
+                str(asset.relative_to(web_dir)): sorted(str(s.relative_to(web_dir)) for s in refs)
+                for asset, refs in sorted(graph.items())
+            },
+        }
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"📄 Informe guardado en: {args.json_out}")
+
+    if args.prune and orphans:
+        for path in orphans:
+            path.unlink()
+        print(f"✂️  Eliminadas {len(orphans)} imágenes de {web_dir} ({orphan_bytes / (1024 * 1024):.2f} MB)")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
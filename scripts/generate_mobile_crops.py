@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Genera recortes verticales (móvil) de las imágenes de escena con punto focal.
+
+Las escenas son renders cuadrados compuestos en horizontal, pero en móvil
+se juega en vertical y el CSS recorta la imagen completa. Este script:
+- Calcula un mapa de energía (gradiente) de cada escena con NumPy
+- Elige la ventana vertical (por defecto 4:5) con más energía y el punto
+  focal (centroide de energía)
+- Exporta el recorte en WebP a varios anchos de móvil en img/mobile/, bajo la
+  misma carpeta que la escena (scenarios/, scenes/...) para que no choquen
+  escenas con el mismo nombre
+- Escribe web/data/scene_crops.json con el punto focal y los recortes, que
+  app.js usa en pantallas estrechas
+
+Uso:
+    python scripts/generate_mobile_crops.py
+    python scripts/generate_mobile_crops.py --aspect 3:4 --widths 480 720
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+
+# Lado mayor del mapa de energía: suficiente para localizar el sujeto y barato
+ENERGY_SIZE = 256
+
+
+def load_json(path):
+    """Carga un archivo JSON."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def collect_scene_images(web_dir):
+    """Retorna las rutas (relativas a web/) de las imágenes de escena de story.json."""
+    story = load_json(web_dir / 'data' / 'story.json')
+    images = set()
+    for scene_id, scene in story.get('scenes', {}).items():
+        if scene.get('image', '') is None:
+            continue
+        images.add(scene.get('image') or f"img/scenarios/{scene_id}.png")
+    return sorted(images)
+
+
+def crop_subdir(ref):
+    """Carpeta de la imagen relativa a img/ (p. ej. 'scenarios'), donde van sus recortes."""
+    parent = Path(ref).parent
+    return parent.relative_to('img') if parent.parts[:1] == ('img',) else parent
+
+
+def energy_map(img):
+    """Energía de gradiente |dx| + |dy| de una versión reducida en grises."""
+    small = img.convert('L')
+    small.thumbnail((ENERGY_SIZE, ENERGY_SIZE), Image.Resampling.BILINEAR)
+    pixels = np.asarray(small, dtype=np.float32)
+    gy, gx = np.gradient(pixels)
+    return np.abs(gx) + np.abs(gy)
+
+
+def focal_point(energy):
+    """Centroide de energía normalizado (0-1) en x e y."""
+    total = energy.sum()
+    if total == 0:
+        return 0.5, 0.5
+    h, w = energy.shape
+    fx = (energy.sum(axis=0) * (np.arange(w) + 0.5)).sum() / total / w
+    fy = (energy.sum(axis=1) * (np.arange(h) + 0.5)).sum() / total / h
+    return float(fx), float(fy)
+
+
+def best_window(energy, win_w, win_h):
+    """
+    Posición (x, y) de la ventana win_w×win_h con mayor energía total.
+
+    Usa una imagen integral para evaluar todas las posiciones en O(píxeles).
+    """
+    integral = np.pad(energy.cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+    sums = (
+        integral[win_h:, win_w:] - integral[:-win_h, win_w:]
+        - integral[win_h:, :-win_w] + integral[:-win_h, :-win_w]
+    )
+    y, x = np.unravel_index(np.argmax(sums), sums.shape)
+    return int(x), int(y)
+
+
+def portrait_crop_box(img_size, energy, aspect):
+    """
+    Caja de recorte (left, top, right, bottom) en píxeles originales.
+
+    La ventana tiene la proporción `aspect` (ancho/alto) y el mayor tamaño
+    posible dentro de la imagen; se coloca donde hay más energía.
+    """
+    width, height = img_size
+    crop_w = min(width, round(height * aspect))
+    crop_h = min(height, round(crop_w / aspect))
+
+    scale = energy.shape[1] / width
+    win_w = max(1, min(energy.shape[1], round(crop_w * scale)))
+    win_h = max(1, min(energy.shape[0], round(crop_h * scale)))
+    x, y = best_window(energy, win_w, win_h)
+
+    left = min(width - crop_w, round(x / scale))
+    top = min(height - crop_h, round(y / scale))
+    return left, top, left + crop_w, top + crop_h
+
+
+def generate_crops(image_path, output_dir, web_dir, aspect, widths, quality=80):
+    """
+    Calcula el punto focal de una escena y exporta sus recortes verticales.
+
+    Returns:
+        Entrada del manifest: focal, caja de recorte y {ancho: ruta}
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with Image.open(image_path) as img:
+        img = img.convert('RGB')
+        energy = energy_map(img)
+        fx, fy = focal_point(energy)
+        box = portrait_crop_box(img.size, energy, aspect)
+        crop = img.crop(box)
+
+        crops = {}
+        for width in sorted(widths):
+            if width > crop.width:
+                continue
+            resized = crop.resize((width, round(width * crop.height / crop.width)), Image.Resampling.LANCZOS)
+            crop_path = output_dir / f"{image_path.stem}_{width}.webp"
+            resized.save(crop_path, 'WEBP', quality=quality, method=6)
+            crops[str(width)] = crop_path.relative_to(web_dir).as_posix()
+
+    return {
+        'focal': [round(fx, 4), round(fy, 4)],
+        'box': list(box),
+        'crops': crops,
+    }
+
+
+def parse_aspect(value):
+    """Convierte '4:5' en 0.8 (ancho/alto)."""
+    w, h = value.split(':')
+    return int(w) / int(h)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Genera recortes verticales de las escenas según su punto focal",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s
+  %(prog)s --aspect 3:4 --widths 480 720
+  %(prog)s --web-dir _output
+        """
+    )
+
+    parser.add_argument(
+        "--web-dir",
+        default="web",
+        help="Directorio publicado (default: web)"
+    )
+
+    parser.add_argument(
+        "--aspect",
+        default="4:5",
+        help="Proporción ancho:alto del recorte vertical (default: 4:5)"
+    )
+
+    parser.add_argument(
+        "--widths",
+        type=int,
+        nargs='+',
+        default=[480, 720],
+        help="Anchos de móvil a exportar (default: 480 720)"
+    )
+
+    parser.add_argument(
+        "--quality",
+        type=int,
+        default=80,
+        help="Calidad WebP 1-100 (default: 80)"
+    )
+
+    args = parser.parse_args()
+
+    web_dir = Path(args.web_dir)
+    aspect = parse_aspect(args.aspect)
+    output_dir = web_dir / 'img' / 'mobile'
+    manifest_file = web_dir / 'data' / 'scene_crops.json'
+
+    print("=" * 60)
+    print("📱 RECORTES MÓVILES DE ESCENAS - OPERACIÓN PORTAL 27")
+    print("=" * 60)
+    print()
+
+    manifest = {}
+    for ref in collect_scene_images(web_dir):
+        image_path = web_dir / ref
+        if not image_path.exists():
+            continue
+        try:
+            manifest[ref] = generate_crops(
+                image_path, output_dir / crop_subdir(ref), web_dir, aspect, args.widths, args.quality
+            )
+            fx, fy = manifest[ref]['focal']
+            print(f"  ✅ {ref} → foco ({fx:.2f}, {fy:.2f}), {len(manifest[ref]['crops'])} recortes")
+        except Exception as e:
+            print(f"  ❌ {ref}: {str(e)}")
+
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump({'meta': {'version': 1, 'aspect': args.aspect}, 'images': manifest}, f, indent=2)
+        f.write('\n')
+
+    print()
+    print("=" * 60)
+    print(f"✅ {len(manifest)} escenas procesadas")
+    print(f"📄 Manifest: {manifest_file}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
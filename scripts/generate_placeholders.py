@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Genera placeholders de baja calidad (LQIP) y colores dominantes para las imágenes del juego.
+
+Para cada escena de story.json, cada avatar/cuerpo entero de agents.json y
+cada póster de img/posters calcula:
+- Una miniatura borrosa de ~20px en WebP como data URI (unos cientos de bytes)
+- El color dominante en hexadecimal
+
+El resultado se escribe en web/data/placeholders.json, indexado por la misma
+ruta que usa el cliente, para que app.js pinte algo al instante y haga
+fade-in de la imagen real cuando llega.
+
+Uso:
+    python scripts/generate_placeholders.py
+    python scripts/generate_placeholders.py --size 16
+"""
+
+import argparse
+import base64
+import io
+import json
+from pathlib import Path
+
+from PIL import Image, ImageFilter
+
+
+def load_json(path):
+    """Carga un archivo JSON."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def collect_images(web_dir):
+    """
+    Retorna {ruta_cliente: tipo} de escenas, agentes y pósters.
+
+    Las rutas son las que usa app.js: scene.image o img/scenarios/{id}.png,
+    agent.avatar, agent.fullbody o img/agents/{id}_fullbody.png.
+    """
+    images = {}
+
+    story = load_json(web_dir / 'data' / 'story.json')
+    for scene_id, scene in story.get('scenes', {}).items():
+        if scene.get('image', '') is None:
+            continue
+        images[scene.get('image') or f"img/scenarios/{scene_id}.png"] = 'scene'
+
+    agents = load_json(web_dir / 'data' / 'agents.json')
+    for agent_id, agent in agents.get('agents', agents).items():
+        if agent.get('avatar'):
+            images[agent['avatar']] = 'avatar'
+        images[agent.get('fullbody') or f"img/agents/{agent_id}_fullbody.png"] = 'fullbody'
+
+    for poster in sorted((web_dir / 'img' / 'posters').glob('*')):
+        if poster.suffix.lower() in {'.png', '.jpg', '.jpeg', '.webp'}:
+            images[poster.relative_to(web_dir).as_posix()] = 'poster'
+
+    return images
+
+
+def dominant_color(img):
+    """Color dominante (#rrggbb) ignorando píxeles transparentes."""
+    small = img.convert('RGBA')
+    small.thumbnail((64, 64))
+    alpha = small.getchannel('A')
+    rgb = small.convert('RGB')
+    if alpha.getextrema()[0] < 255:
+        # Solo votan los píxeles opacos: se cuantiza una tira 1×N con ellos
+        raw = rgb.tobytes()
+        opaque = b''.join(raw[i * 3:i * 3 + 3] for i, a in enumerate(alpha.tobytes()) if a >= 128)
+        if not opaque:
+            return '#000000'
+        rgb = Image.frombytes('RGB', (len(opaque) // 3, 1), opaque)
+
+    quantized = rgb.quantize(colors=8, method=Image.Quantize.MEDIANCUT)
+    palette = quantized.getpalette()
+    _, index = max(quantized.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def blurred_placeholder(img, size=20, quality=50):
+    """Miniatura borrosa de `size` px en el lado mayor como data URI WebP."""
+    thumb = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    thumb.thumbnail((size, size), Image.Resampling.LANCZOS)
+    thumb = thumb.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    thumb.save(buffer, 'WEBP', quality=quality, method=6)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def build_placeholder(image_path, size=20):
+    """Calcula placeholder, color dominante y dimensiones de una imagen."""
+    with Image.open(image_path) as img:
+        width, height = img.size
+        img.draft('RGB', (size * 8, size * 8))
+        return {
+            'placeholder': blurred_placeholder(img, size),
+            'color': dominant_color(img),
+            'width': width,
+            'height': height,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Genera placeholders borrosos y colores dominantes para escenas, agentes y pósters",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s
+  %(prog)s --web-dir _output
+  %(prog)s --size 16
+        """
+    )
+
+    parser.add_argument(
+        "--web-dir",
+        default="web",
+        help="Directorio publicado (default: web)"
+    )
+
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=20,
+        help="Lado mayor de la miniatura en píxeles (default: 20)"
+    )
+
+    args = parser.parse_args()
+
+    web_dir = Path(args.web_dir)
+    output_file = web_dir / 'data' / 'placeholders.json'
+
+    print("=" * 60)
+    print("🌫️  GENERADOR DE PLACEHOLDERS - OPERACIÓN PORTAL 27")
+    print("=" * 60)
+    print()
+
+    images = collect_images(web_dir)
+    placeholders = {}
+    missing = 0
+
+    for ref, kind in sorted(images.items()):
+        image_path = web_dir / ref
+        if not image_path.exists():
+            missing += 1
+            continue
+        try:
+            placeholders[ref] = build_placeholder(image_path, args.size)
+            print(f"  ✅ [{kind:8}] {ref} {placeholders[ref]['color']} "
+                  f"({len(placeholders[ref]['placeholder'])} B)")
+        except Exception as e:
+            print(f"  ❌ {ref}: {str(e)}")
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({'meta': {'version': 1, 'size': args.size}, 'images': placeholders}, f, indent=2)
+        f.write('\n')
+
+    total_kb = output_file.stat().st_size / 1024
+    print()
+    print("=" * 60)
+    print(f"✅ {len(placeholders)} placeholders generados ({total_kb:.1f} KB)")
+    if missing:
+        print(f"⚠️  {missing} imágenes referenciadas no existen")
+    print(f"📄 Sidecar: {output_file}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,31 @@ Script para generar códigos QR para cada agente.
 Genera un código QR para cada agente con la URL:
 https://cumpleona.pages.dev/?agent={agent_id}
 
+Con --short-codes usa en su lugar un código corto y estable por agente
+(web/data/agent_codes.json) y la URL en mayúsculas
+HTTPS://CUMPLEONA.PAGES.DEV/A/{CODIGO}, que cabe entera en modo
+alfanumérico del QR y baja de versión con la misma corrección de errores.
+web/_redirects lleva /A/{CODIGO} a /?agent={CODIGO} y getCurrentAgentId()
+en app.js resuelve el código al agente.
+
+Los QR se generan en paralelo por lotes y solo se regeneran los que han
+cambiado: qr_manifest.json guarda un hash de URL, estilo, formato y
+parámetros de cada agente. Con --format svg se escribe SVG vectorial (unos
+pocos KB, escala sin pérdida para imprimir).
+
 Uso:
     python scripts/generate_qr_codes.py
     python scripts/generate_qr_codes.py --base-url https://tu-dominio.com
+    python scripts/generate_qr_codes.py --format svg --workers 4
+    python scripts/generate_qr_codes.py --force
+    python scripts/generate_qr_codes.py --short-codes
 """
 
+import hashlib
 import json
 import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import qrcode
 from qrcode.image.styledpil import StyledPilImage
@@ -19,13 +37,166 @@ from qrcode.image.styles.moduledrawers import RoundedModuleDrawer
 from qrcode.image.styles.colormasks import SolidFillColorMask
 
 
+# Parámetros del QR; forman parte del hash del manifest
+QR_PARAMS = {
+    'error_correction': 'H',  # Alta corrección de errores
+    'box_size': 10,
+    'border': 4,
+}
+
+STYLE_COLORS = {
+    'simple': '#000',
+    'styled': '#e50914',  # Rojo Stranger Things
+}
+
+MANIFEST_NAME = "qr_manifest.json"
+
+# Códigos cortos: solo caracteres del modo alfanumérico del QR
+CODE_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+CODE_LENGTH = 3
+QR_ALPHANUMERIC = set(CODE_ALPHABET + " $%*+-./:")
+QR_MODE_NAMES = {1: 'numérico', 2: 'alfanumérico', 4: 'bytes'}
+
+
 def load_agents(agents_file):
     """Carga los agentes desde el archivo JSON."""
     with open(agents_file, 'r', encoding='utf-8') as f:
         return json.load(f)
 
 
-def generate_qr_code(agent_id, agent_data, base_url, output_dir, style='simple'):
+def load_manifest(output_dir):
+    """Carga el manifest {agent_id: {hash, file, url}} o un dict vacío."""
+    manifest_file = Path(output_dir) / MANIFEST_NAME
+    if not manifest_file.exists():
+        return {}
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        return json.load(f).get('codes', {})
+
+
+def save_manifest(output_dir, codes):
+    """Guarda el manifest de QR generados."""
+    with open(Path(output_dir) / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump({'meta': {'version': 1}, 'codes': codes}, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write('\n')
+
+
+def load_agent_codes(codes_file):
+    """Carga {código: agent_id} de agent_codes.json o un dict vacío."""
+    codes_file = Path(codes_file)
+    if not codes_file.exists():
+        return {}
+    with open(codes_file, 'r', encoding='utf-8') as f:
+        return json.load(f).get('codes', {})
+
+
+def save_agent_codes(codes_file, codes):
+    """Guarda {código: agent_id} en agent_codes.json."""
+    with open(codes_file, 'w', encoding='utf-8') as f:
+        json.dump({'meta': {'version': 1, 'length': CODE_LENGTH}, 'codes': codes},
+                  f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write('\n')
+
+
+def assign_agent_codes(agent_ids, existing):
+    """
+    Asigna un código corto a cada agente sin cambiar los ya emitidos.
+
+    Los códigos nuevos se derivan del SHA-256 del id (base 36); si colisionan
+    se vuelve a derivar con un contador, de modo que el resultado no depende
+    del orden de agents.json.
+
+    Args:
+        agent_ids: Ids de agentes que necesitan código
+        existing: Dict {código: agent_id} ya publicado (impreso en QR)
+
+    Returns:
+        Dict {código: agent_id} con los existentes y los nuevos
+    """
+    codes = dict(existing)
+    assigned = set(codes.values())
+    for agent_id in sorted(agent_ids):
+        if agent_id in assigned:
+            continue
+        attempt = 0
+        while True:
+            value = int(hashlib.sha256(f"{agent_id}#{attempt}".encode('utf-8')).hexdigest(), 16)
+            code = ''
+            for _ in range(CODE_LENGTH):
+                value, digit = divmod(value, len(CODE_ALPHABET))
+                code += CODE_ALPHABET[digit]
+            if code not in codes:
+                break
+            attempt += 1
+        codes[code] = agent_id
+        assigned.add(agent_id)
+    return codes
+
+
+def agent_url(agent_id, base_url, code=None):
+    """URL del QR: ?agent={id} o, con código corto, {BASE}/A/{CODIGO} en mayúsculas."""
+    if code:
+        return f"{base_url.rstrip('/').upper()}/A/{code}"
+    return f"{base_url}/?agent={agent_id}"
+
+
+def qr_hash(url, style, fmt):
+    """Hash de todo lo que determina el contenido de un QR."""
+    key = {'url': url, 'style': style, 'format': fmt, **QR_PARAMS}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def build_qr(url):
+    """Construye la matriz QR de una URL con los parámetros del proyecto."""
+    qr = qrcode.QRCode(
+        version=1,  # Tamaño automático
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
+        box_size=QR_PARAMS['box_size'],
+        border=QR_PARAMS['border'],
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+    return qr
+
+
+def render_svg(qr, color):
+    """
+    Dibuja la matriz QR como un SVG mínimo.
+
+    Cada tramo horizontal de módulos oscuros es un segmento de un único
+    <path> con trazo de 1 módulo; dentro de una fila los saltos son
+    relativos ('m dx 0') para ahorrar bytes. Coordenadas en módulos
+    (el viewBox incluye el borde).
+    """
+    matrix = qr.get_matrix()
+    size = len(matrix)
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        end = None
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            move = f"M{start} {y}.5" if end is None else f"m{start - end} 0"
+            path.append(f"{move}h{x - start}")
+            end = x
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path stroke="{color}" d="{"".join(path)}"/></svg>\n'
+    )
+
+
+def describe_qr(qr):
+    """Versión, módulos por lado (sin borde) y modos de codificación de un QR."""
+    modes = sorted({QR_MODE_NAMES.get(data.mode, str(data.mode)) for data in qr.data_list})
+    return {'version': qr.version, 'modules': 17 + 4 * qr.version, 'mode': '+'.join(modes)}
+
+
+def generate_qr_code(agent_id, agent_data, base_url, output_dir, style='simple', fmt='png', code=None):
     """
     Genera un código QR para un agente.
 
@@ -35,20 +206,22 @@ def generate_qr_code(agent_id, agent_data, base_url, output_dir, style='simple')
         base_url: URL base del sitio
         output_dir: Directorio donde guardar los QR
         style: 'simple' o 'styled' (con esquinas redondeadas)
+        fmt: 'png' o 'svg' (en SVG 'styled' solo cambia el color)
+        code: Código corto del agente; si se indica, el QR usa la URL alfanumérica
+
+    Returns:
+        Tuple (ruta, url, nombre, {version, modules, mode})
     """
     # Crear URL
-    url = f"{base_url}/?agent={agent_id}"
+    url = agent_url(agent_id, base_url, code)
+    agent_name = agent_data.get('name', agent_id)
 
-    # Configurar QR code
-    qr = qrcode.QRCode(
-        version=1,  # Tamaño automático
-        error_correction=qrcode.constants.ERROR_CORRECT_H,  # Alta corrección de errores
-        box_size=10,
-        border=4,
-    )
+    qr = build_qr(url)
 
-    qr.add_data(url)
-    qr.make(fit=True)
+    if fmt == 'svg':
+        filepath = output_dir / f"qr_{agent_id}.svg"
+        filepath.write_text(render_svg(qr, STYLE_COLORS[style]), encoding='utf-8')
+        return filepath, url, agent_name, describe_qr(qr)
 
     # Generar imagen
     if style == 'styled':
@@ -66,13 +239,24 @@ def generate_qr_code(agent_id, agent_data, base_url, output_dir, style='simple')
         img = qr.make_image(fill_color="black", back_color="white")
 
     # Guardar imagen
-    agent_name = agent_data.get('name', agent_id)
     filename = f"qr_{agent_id}.png"
     filepath = output_dir / filename
 
     img.save(filepath)
 
-    return filepath, url, agent_name
+    return filepath, url, agent_name, describe_qr(qr)
+
+
+def _generate_job(job):
+    """Genera un QR en un proceso del pool; los errores se devuelven en vez de lanzarse."""
+    agent_id, agent_data, base_url, output_dir, style, fmt, code = job
+    try:
+        filepath, url, agent_name, info = generate_qr_code(
+            agent_id, agent_data, base_url, output_dir, style, fmt, code
+        )
+        return agent_id, filepath, url, agent_name, info, None
+    except Exception as e:
+        return agent_id, None, None, None, None, str(e)
 
 
 def main():
@@ -84,6 +268,8 @@ Ejemplos:
   %(prog)s
   %(prog)s --base-url https://mi-dominio.com
   %(prog)s --output-dir qr_codes --style styled
+  %(prog)s --format svg --workers 4
+  %(prog)s --short-codes
         """
     )
 
@@ -112,6 +298,45 @@ Ejemplos:
         help="Estilo del QR: simple (blanco/negro) o styled (con color y esquinas redondeadas)"
     )
 
+    parser.add_argument(
+        "--format",
+        choices=['png', 'svg'],
+        default='png',
+        help="Formato de salida: png (raster) o svg (vectorial, para imprimir)"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Procesos en paralelo (default: número de CPUs)"
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="QR por lote enviado a cada proceso (default: 8)"
+    )
+
+    parser.add_argument(
+        "--short-codes",
+        action="store_true",
+        help="Usar códigos cortos estables y URL alfanumérica en mayúsculas (QR de menor versión)"
+    )
+
+    parser.add_argument(
+        "--codes-file",
+        default="web/data/agent_codes.json",
+        help="Archivo de códigos cortos {código: agente} (default: web/data/agent_codes.json)"
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerar todos los QR aunque no hayan cambiado"
+    )
+
     args = parser.parse_args()
 
     # Cargar agentes
@@ -133,33 +358,80 @@ Ejemplos:
     print(f"📁 Agentes encontrados: {len(agents)}")
     print(f"🌐 URL base: {args.base_url}")
     print(f"💾 Directorio de salida: {output_dir}")
-    print(f"🎨 Estilo: {args.style}")
+    print(f"🎨 Estilo: {args.style} ({args.format})")
+
+    # Códigos cortos: los ya emitidos no cambian nunca (pueden estar impresos)
+    agent_codes = {}
+    if args.short_codes:
+        if not set(args.base_url.upper()) <= QR_ALPHANUMERIC:
+            print(f"⚠️  La URL base tiene caracteres fuera del modo alfanumérico: {args.base_url}")
+        codes = assign_agent_codes(agents.keys(), load_agent_codes(args.codes_file))
+        save_agent_codes(args.codes_file, codes)
+        agent_codes = {agent_id: code for code, agent_id in codes.items()}
+        print(f"🔤 Códigos cortos: {args.codes_file}")
     print()
 
-    # Generar QR codes
+    # Separar los QR que no han cambiado (mismo hash y fichero presente)
+    manifest = {} if args.force else load_manifest(output_dir)
     generated = []
+    jobs = []
+    hashes = {}
 
     for agent_id, agent_data in agents.items():
-        try:
-            filepath, url, agent_name = generate_qr_code(
-                agent_id, agent_data, args.base_url, output_dir, args.style
-            )
+        code = agent_codes.get(agent_id)
+        url = agent_url(agent_id, args.base_url, code)
+        hashes[agent_id] = qr_hash(url, args.style, args.format)
+        entry = manifest.get(agent_id)
+        if entry and entry['hash'] == hashes[agent_id] and (output_dir / entry['file']).exists():
             generated.append({
                 'id': agent_id,
-                'name': agent_name,
+                'name': agent_data.get('name', agent_id),
                 'url': url,
-                'file': filepath
+                'file': output_dir / entry['file'],
+                'info': entry.get('info')
             })
-            print(f"  ✅ {agent_name:20} → {filepath.name}")
-        except Exception as e:
-            print(f"  ❌ {agent_id}: {str(e)}")
+            continue
+        jobs.append((agent_id, agent_data, args.base_url, output_dir, args.style, args.format, code))
+
+    skipped = len(generated)
+
+    # Generar QR codes en paralelo por lotes
+    if jobs:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            for agent_id, filepath, url, agent_name, info, error in executor.map(
+                _generate_job, jobs, chunksize=max(1, args.batch_size)
+            ):
+                if error:
+                    print(f"  ❌ {agent_id}: {error}")
+                    manifest.pop(agent_id, None)
+                    continue
+                generated.append({
+                    'id': agent_id,
+                    'name': agent_name,
+                    'url': url,
+                    'file': filepath,
+                    'info': info
+                })
+                manifest[agent_id] = {'hash': hashes[agent_id], 'file': filepath.name, 'url': url, 'info': info}
+                print(f"  ✅ {agent_name:20} → {filepath.name} ({filepath.stat().st_size} bytes)")
+
+    save_manifest(output_dir, {agent_id: manifest[agent_id] for agent_id in agents if agent_id in manifest})
 
     print()
     print("=" * 60)
-    print(f"✅ Generados {len(generated)} códigos QR")
+    print(f"✅ Generados {len(generated) - skipped} códigos QR ({skipped} sin cambios)")
     print("=" * 60)
     print()
 
+    # Versión y tamaño de cada QR (menos módulos = más fácil de escanear con poca luz)
+    print("📐 Versión QR por agente (corrección H):")
+    for qr in sorted(generated, key=lambda x: x['id']):
+        info = qr.get('info')
+        if info:
+            print(f"   {qr['id']:15} v{info['version']:<2} {info['modules']}×{info['modules']} módulos "
+                  f"({info['mode']}) {qr['url']}")
+    print()
+
     # Crear archivo index con todos los códigos
     create_index_html(generated, output_dir, args.base_url)
 
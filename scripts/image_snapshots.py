@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Almacén de snapshots de imágenes direccionado por contenido.
+
+Sustituye a las carpetas *_backup del optimizador: cada fichero se guarda una
+sola vez en objects/ con su SHA-256 como nombre, y cada ejecución registra un
+manifest en snapshots/ con {ruta: hash}. Los ficheros que no cambian entre
+ejecuciones no ocupan ni un byte más, y cualquier estado anterior de web/img
+se puede restaurar copiando solo los ficheros que difieren.
+
+Los objetos se copian (no se enlazan): el optimizador y los generadores
+sobrescriben las imágenes in-place y un hardlink compartiría esos cambios.
+
+Uso:
+    python scripts/image_snapshots.py snapshot web/img
+    python scripts/image_snapshots.py list
+    python scripts/image_snapshots.py restore 20261019-101500-web-img
+    python scripts/image_snapshots.py restore 20261019-101500-web-img --target /tmp/img_antes
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+
+DEFAULT_STORE = ".image_snapshots"
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp'}
+
+
+def sha256_file(path):
+    """Calcula el SHA-256 de un fichero leyendo por bloques."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_path(store_dir, digest):
+    """Ruta del objeto de un hash: objects/ab/abcdef…"""
+    return Path(store_dir) / 'objects' / digest[:2] / digest
+
+
+def list_snapshots(store_dir=DEFAULT_STORE):
+    """Retorna los manifests de snapshot ordenados del más antiguo al más reciente."""
+    snapshots_dir = Path(store_dir) / 'snapshots'
+    if not snapshots_dir.exists():
+        return []
+    return sorted(snapshots_dir.glob('*.json'))
+
+
+def load_manifest(store_dir, snapshot_id):
+    """Carga el manifest de un snapshot por id (nombre sin .json) o ruta."""
+    path = Path(snapshot_id)
+    if not path.exists():
+        path = Path(store_dir) / 'snapshots' / f"{snapshot_id}.json"
+    if not path.exists():
+        raise FileNotFoundError(f"No existe el snapshot: {snapshot_id}")
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _known_hashes(store_dir):
+    """
+    Cache {(ruta_absoluta, tamaño, mtime_ns): sha256} de los snapshots previos.
+
+    Evita recalcular el hash de ficheros que no han cambiado desde el último snapshot.
+    """
+    known = {}
+    for manifest_path in list_snapshots(store_dir)[-5:]:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        root = Path(manifest['root'])
+        for rel, entry in manifest['files'].items():
+            known[(str(root / rel), entry['size'], entry['mtime_ns'])] = entry['sha256']
+    return known
+
+
+def snapshot_directory(root, store_dir=DEFAULT_STORE, label=None, recursive=True, files=None):
+    """
+    Registra el estado actual de las imágenes de un directorio.
+
+    Args:
+        root: Directorio a registrar
+        store_dir: Directorio del almacén
+        label: Texto libre para identificar la ejecución (p. ej. 'optimize_images')
+        recursive: Si True, incluye subcarpetas
+        files: Si se indica, solo registra estos ficheros (dentro de root)
+
+    Returns:
+        Tuple (id_del_snapshot, bytes_nuevos_en_el_almacén)
+    """
+    root = Path(root).resolve()
+    store_dir = Path(store_dir)
+    if files is None:
+        pattern = root.rglob('*') if recursive else root.iterdir()
+        files = [p for p in pattern if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS]
+    files = sorted(Path(f).resolve() for f in files)
+
+    known = _known_hashes(store_dir)
+    entries = {}
+    new_bytes = 0
+
+    for path in files:
+        stat = path.stat()
+        digest = known.get((str(path), stat.st_size, stat.st_mtime_ns)) or sha256_file(path)
+        target = object_path(store_dir, digest)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix('.tmp')
+            shutil.copy2(path, tmp)
+            tmp.replace(target)
+            new_bytes += stat.st_size
+        entries[path.relative_to(root).as_posix()] = {
+            'sha256': digest,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+        }
+
+    created = datetime.now()
+    name = root.relative_to(Path.cwd()).as_posix() if root.is_relative_to(Path.cwd()) else root.name
+    slug = re.sub(r'[^\w-]+', '-', name).strip('-') or 'root'
+    snapshot_id = f"{created:%Y%m%d-%H%M%S}-{slug}"
+    snapshots_dir = store_dir / 'snapshots'
+    snapshots_dir.mkdir(parents=True, exist_ok=True)
+    # Dos snapshots en el mismo segundo (varias carpetas seguidas) no deben pisarse
+    suffix = 1
+    while (snapshots_dir / f"{snapshot_id}.json").exists():
+        suffix += 1
+        snapshot_id = f"{created:%Y%m%d-%H%M%S}-{slug}-{suffix}"
+
+    manifest = {
+        'id': snapshot_id,
+        'created': created.isoformat(timespec='seconds'),
+        'label': label,
+        'root': str(root),
+        'files': entries,
+    }
+    with open(snapshots_dir / f"{snapshot_id}.json", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    return snapshot_id, new_bytes
+
+
+def restore_snapshot(snapshot_id, store_dir=DEFAULT_STORE, target=None, dry_run=False):
+    """
+    Restaura los ficheros de un snapshot.
+
+    Solo se copian los ficheros cuyo contenido difiere del registrado; los
+    ficheros creados después del snapshot no se tocan.
+
+    Returns:
+        Tuple (restaurados, sin_cambios)
+    """
+    manifest = load_manifest(store_dir, snapshot_id)
+    target_root = Path(target) if target else Path(manifest['root'])
+    restored = unchanged = 0
+
+    for rel, entry in manifest['files'].items():
+        dest = target_root / rel
+        if dest.exists() and dest.stat().st_size == entry['size'] and sha256_file(dest) == entry['sha256']:
+            unchanged += 1
+            continue
+        source = object_path(store_dir, entry['sha256'])
+        if not source.exists():
+            raise FileNotFoundError(f"Falta el objeto {entry['sha256'][:12]} de {rel}")
+        if not dry_run:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, dest)
+        restored += 1
+
+    return restored, unchanged
+
+
+def store_usage(store_dir=DEFAULT_STORE):
+    """Retorna (número de objetos, bytes ocupados) del almacén."""
+    objects = [p for p in (Path(store_dir) / 'objects').rglob('*') if p.is_file()]
+    return len(objects), sum(p.stat().st_size for p in objects)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Snapshots de imágenes direccionados por contenido",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s snapshot web/img
+  %(prog)s list
+  %(prog)s restore 20261019-101500-web-img
+  %(prog)s restore 20261019-101500-web-img --target /tmp/img_antes --dry-run
+        """
+    )
+    parser.add_argument(
+        "--store",
+        default=DEFAULT_STORE,
+        help=f"Directorio del almacén (default: {DEFAULT_STORE})"
+    )
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="Registrar el estado actual de un directorio")
+    snapshot_parser.add_argument("directory", help="Directorio a registrar")
+    snapshot_parser.add_argument("--label", default="manual", help="Etiqueta del snapshot")
+
+    subparsers.add_parser("list", help="Listar snapshots")
+
+    restore_parser = subparsers.add_parser("restore", help="Restaurar un snapshot")
+    restore_parser.add_argument("snapshot_id", help="Id del snapshot (ver 'list')")
+    restore_parser.add_argument("--target", default=None, help="Restaurar en otro directorio")
+    restore_parser.add_argument("--dry-run", action="store_true", help="Mostrar qué se restauraría")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "snapshot":
+            snapshot_id, new_bytes = snapshot_directory(args.directory, args.store, args.label)
+            print(f"📸 Snapshot creado: {snapshot_id}")
+            print(f"   Bytes nuevos en el almacén: {new_bytes / (1024 * 1024):.2f} MB")
+
+        elif args.command == "list":
+            snapshots = list_snapshots(args.store)
+            if not snapshots:
+                print("⚠️  No hay snapshots")
+                return
+            for path in snapshots:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                size = sum(e['size'] for e in manifest['files'].values()) / (1024 * 1024)
+                print(f"  {manifest['id']:45} {len(manifest['files']):4} ficheros "
+                      f"{size:8.2f} MB  [{manifest.get('label') or '-'}]")
+            count, used = store_usage(args.store)
+            print(f"\n💾 Almacén: {count} objetos, {used / (1024 * 1024):.2f} MB")
+
+        elif args.command == "restore":
+            restored, unchanged = restore_snapshot(args.snapshot_id, args.store, args.target, args.dry_run)
+            verb = "Se restaurarían" if args.dry_run else "Restaurados"
+            print(f"♻️  {verb}: {restored} ficheros ({unchanged} ya estaban igual)")
+
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    main()
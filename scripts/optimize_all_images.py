@@ -1,13 +1,140 @@
 """
 Script para optimizar todas las imágenes en web/img recursivamente.
+
+Cada imagen se clasifica según dónde se muestra (agents.json, story.json,
+puzzles.json, pósters y QR) y se optimiza con el perfil de tamaño (y paleta
+o búsqueda sin pérdida) de su hueco en pantalla. Las imágenes sin clasificar
+usan el perfil 'default' (1920x1080, el comportamiento anterior).
+
+El formato de cada fichero no cambia: los JSON y app.js enlazan cada imagen
+por su nombre con extensión, y las variantes WebP para móvil de las escenas
+las genera generate_mobile_crops.py.
+
+Uso:
+  python scripts/optimize_all_images.py
+  python scripts/optimize_all_images.py --dry-run
+  python scripts/optimize_all_images.py --uniform
 """
 
-import sys
+import argparse
+import json
+from collections import defaultdict
 from pathlib import Path
+from image_snapshots import DEFAULT_STORE, snapshot_directory
 from optimize_images import process_directory
 
 
-def process_recursive(base_dir, quality=85, max_width=1920, max_height=1080):
+# Perfiles por uso. Los tamaños son el hueco CSS más grande en el que se pinta
+# la imagen multiplicado por ~2 para pantallas de alta densidad.
+ASSET_PROFILES = {
+    'avatar': {
+        'description': 'Avatares (selector 80px, modal 70px, botón 42px)',
+        'max_width': 256, 'max_height': 256,
+        'palette': True, 'dither': False, 'lossless_search': False,
+    },
+    'fullbody': {
+        'description': 'Cuerpo entero (landing 200x280px, modal 240px, cartas impresas)',
+        'max_width': 768, 'max_height': 1080,
+        'palette': True, 'dither': False, 'lossless_search': False,
+    },
+    'scenario': {
+        'description': 'Escenas de story.json (marco de hasta 1000px)',
+        'max_width': 1280, 'max_height': 1280,
+        'palette': False, 'dither': False, 'lossless_search': False,
+    },
+    'jigsaw': {
+        'description': 'Imágenes de puzzles jigsaw (rejilla de hasta 640px)',
+        'max_width': 1280, 'max_height': 1280,
+        'palette': True, 'dither': True, 'lossless_search': False,
+    },
+    'poster': {
+        'description': 'Pósters (carta 63x88mm a ~300 ppp)',
+        'max_width': 1040, 'max_height': 1456,
+        'palette': True, 'dither': True, 'lossless_search': False,
+    },
+    'qr': {
+        'description': 'Códigos QR (sin redimensionar, solo sin pérdida)',
+        'max_width': 100000, 'max_height': 100000,
+        'palette': False, 'dither': False, 'lossless_search': True,
+    },
+    'default': {
+        'description': 'Sin referencias conocidas',
+        'max_width': 1920, 'max_height': 1080,
+        'palette': False, 'dither': False, 'lossless_search': False,
+    },
+}
+
+
+def _load_json(path):
+    """Carga un JSON o retorna un dict vacío si no existe."""
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _img_path(web_dir, ref):
+    """Convierte una ruta de los JSON (relativa a web/ o a web/img/) en Path."""
+    ref = ref.lstrip('/')
+    if not ref.startswith('img/'):
+        ref = f"img/{ref}"
+    return (web_dir / ref).resolve()
+
+
+def classify_assets(web_dir):
+    """
+    Clasifica las imágenes de web/ según dónde se muestran.
+
+    Fuentes:
+    - agents.json: 'avatar' y 'fullbody' (también img/agents/{id}_fullbody.png)
+    - story.json: 'image' de cada escena o img/scenarios/{id}.png por defecto
+    - puzzles.json: imágenes de puzzles jigsaw y img/puzzles/jigsaw/ona_{id}.png
+    - img/posters/ e img/qr*/
+
+    Returns:
+        Dict {ruta_absoluta: nombre_de_perfil}
+    """
+    web_dir = Path(web_dir)
+    img_dir = web_dir / 'img'
+    classes = {}
+
+    def assign(path, profile):
+        # La primera clasificación gana (el orden refleja la prioridad)
+        classes.setdefault(path, profile)
+
+    for qr_dir in sorted(img_dir.glob('qr*')):
+        for path in qr_dir.iterdir():
+            assign(path.resolve(), 'qr')
+
+    agents = _load_json(web_dir / 'data' / 'agents.json')
+    agents = agents.get('agents', agents)
+    for agent_id, agent in agents.items():
+        if agent.get('avatar'):
+            assign(_img_path(web_dir, agent['avatar']), 'avatar')
+        assign(_img_path(web_dir, agent.get('fullbody') or f"img/agents/{agent_id}_fullbody.png"), 'fullbody')
+        assign(_img_path(web_dir, f"img/puzzles/jigsaw/ona_{agent_id}.png"), 'jigsaw')
+
+    puzzles = _load_json(web_dir / 'data' / 'puzzles.json').get('puzzles', {})
+    for puzzle in puzzles.values():
+        image = (puzzle.get('data') or {}).get('image')
+        if puzzle.get('type') == 'jigsaw' and image:
+            assign(_img_path(web_dir, image), 'jigsaw')
+
+    scenes = _load_json(web_dir / 'data' / 'story.json').get('scenes', {})
+    for scene_id, scene in scenes.items():
+        if scene.get('image', '') is None:
+            continue
+        assign(_img_path(web_dir, scene.get('image') or f"img/scenarios/{scene_id}.png"), 'scenario')
+
+    for path in (img_dir / 'posters').glob('*'):
+        assign(path.resolve(), 'poster')
+    for path in (img_dir / 'puzzles' / 'jigsaw').glob('*'):
+        assign(path.resolve(), 'jigsaw')
+
+    return classes
+
+
+def process_recursive(base_dir, quality=85, max_width=1920, max_height=1080, use_profiles=True, dry_run=False):
     """Procesa todas las subcarpetas recursivamente."""
     base_path = Path(base_dir)
 
@@ -38,10 +165,26 @@ def process_recursive(base_dir, quality=85, max_width=1920, max_height=1080):
         print(f"   - {rel_path}")
     print()
 
+    # Snapshot global antes de sobrescribir nada
+    snapshot_id = None
+    if not dry_run:
+        snapshot_id, new_bytes = snapshot_directory(base_path, DEFAULT_STORE, label="optimize_all_images")
+        print(f"📸 Snapshot {snapshot_id} ({new_bytes / (1024 * 1024):.2f} MB nuevos en {DEFAULT_STORE})")
+        print()
+
+    # Clasificar imágenes por uso (web/img → web/)
+    classes = classify_assets(base_path.parent) if use_profiles else {}
+    if use_profiles:
+        print("🏷️  Perfiles por uso:")
+        for name, profile in ASSET_PROFILES.items():
+            print(f"   - {name:9} {profile['max_width']}x{profile['max_height']}px · {profile['description']}")
+        print()
+
     # Procesar cada directorio
     total_original = 0
     total_new = 0
     total_images = 0
+    profile_counts = defaultdict(int)
 
     for i, dir_path in enumerate(directories_with_images, 1):
         rel_path = dir_path.relative_to(base_path.parent)
@@ -56,16 +199,36 @@ def process_recursive(base_dir, quality=85, max_width=1920, max_height=1080):
         # Calcular tamaños antes
         size_before = sum(f.stat().st_size for f in images_before) / (1024 * 1024)
 
-        # Procesar directorio
-        process_directory(
-            input_dir=str(dir_path),
-            output_dir=None,  # Sobrescribir in-place
-            max_width=max_width,
-            max_height=max_height,
-            quality=quality,
-            backup=False,  # Ya hicimos backup global
-            dry_run=False
-        )
+        # Agrupar las imágenes del directorio por perfil
+        groups = defaultdict(list)
+        for img_file in images_before:
+            groups[classes.get(img_file.resolve(), 'default')].append(img_file)
+
+        for profile_name, files in sorted(groups.items()):
+            if use_profiles:
+                profile = ASSET_PROFILES[profile_name]
+                print(f"\n🏷️  Perfil '{profile_name}' ({len(files)} imágenes)")
+                settings = {
+                    'max_width': profile['max_width'],
+                    'max_height': profile['max_height'],
+                    'palette': profile['palette'],
+                    'dither': profile['dither'],
+                    'lossless_search': profile['lossless_search'],
+                }
+            else:
+                settings = {'max_width': max_width, 'max_height': max_height}
+            profile_counts[profile_name] += len(files)
+
+            # Procesar directorio
+            process_directory(
+                input_dir=str(dir_path),
+                output_dir=None,  # Sobrescribir in-place
+                quality=quality,
+                backup=False,  # Ya hicimos snapshot global
+                dry_run=dry_run,
+                only_files=files,
+                **settings
+            )
 
         # Calcular tamaños después
         images_after = list(dir_path.glob('*'))
@@ -85,6 +248,9 @@ def process_recursive(base_dir, quality=85, max_width=1920, max_height=1080):
     print("=" * 60)
     print(f"📁 Carpetas procesadas: {len(directories_with_images)}")
     print(f"🖼️  Imágenes procesadas: {total_images}")
+    if use_profiles:
+        for profile_name, count in sorted(profile_counts.items()):
+            print(f"   - {profile_name}: {count}")
     print(f"📦 Tamaño original total: {total_original:.2f} MB")
     print(f"📦 Tamaño optimizado total: {total_new:.2f} MB")
     total_savings = ((total_original - total_new) / total_original * 100) if total_original > 0 else 0
@@ -92,17 +258,55 @@ def process_recursive(base_dir, quality=85, max_width=1920, max_height=1080):
     print("=" * 60)
     print()
     print("✅ ¡Optimización completada!")
-    print(f"💡 Las imágenes originales están en: img_originals_backup/")
+    if snapshot_id:
+        print(f"💡 Restaurar originales con: python scripts/image_snapshots.py restore {snapshot_id}")
 
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(
+        description="Optimiza recursivamente web/img con perfiles según el uso de cada imagen."
+    )
+
+    parser.add_argument(
+        "--base-dir",
+        default="web/img",
+        help="Directorio de imágenes (default: web/img)"
+    )
+
+    parser.add_argument(
+        "--quality",
+        type=int,
+        default=85,
+        help="Calidad JPEG 1-100 (default: 85)"
+    )
+
+    parser.add_argument(
+        "--uniform",
+        action="store_true",
+        help="Ignorar los perfiles y aplicar el límite 1920x1080 a todo"
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Mostrar qué se haría sin modificar archivos"
+    )
+
+    args = parser.parse_args()
+
     print("🖼️  Optimizador de imágenes recursivo")
     print("=" * 60)
     print()
 
     process_recursive(
-        base_dir="web/img",
-        quality=85,
+        base_dir=args.base_dir,
+        quality=args.quality,
         max_width=1920,
-        max_height=1080
+        max_height=1080,
+        use_profiles=not args.uniform,
+        dry_run=args.dry_run
     )
+
+
+if __name__ == "__main__":
+    main()
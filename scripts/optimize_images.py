@@ -5,18 +5,31 @@ Este script procesa imágenes PNG y JPEG, optimizándolas para uso web:
 - Redimensiona imágenes grandes manteniendo la proporción
 - Reduce la calidad JPEG
 - Optimiza PNGs
+- Cuantiza PNGs a paleta (≤256 colores) si el error medido es aceptable
+- Busca la recompresión PNG sin pérdida más pequeña (modos, paleta exacta, zlib)
+- Decodifica imágenes grandes cerca del tamaño final para acotar la memoria
 - Genera un reporte de ahorro de espacio
 
 Uso:
   python scripts/optimize_images.py --input web/img/scenarios --quality 85 --max-width 1920
   python scripts/optimize_images.py --input web/img/scenarios --quality 80 --backup
+  python scripts/optimize_images.py --input web/img/agents --palette --dither
+  python scripts/optimize_images.py --input web/img/qr --lossless-search
+  python scripts/optimize_images.py --input reference/agents/ona --output /tmp/ona --low-memory
 """
 
 import argparse
-import shutil
+import io
 from pathlib import Path
-from PIL import Image
+from PIL import Image, ImageChops, ImageStat
+from image_snapshots import DEFAULT_STORE, snapshot_directory
 import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 
 def get_file_size_mb(path):
@@ -24,7 +37,226 @@ def get_file_size_mb(path):
     return os.path.getsize(path) / (1024 * 1024)
 
 
-def optimize_image(input_path, output_path, max_width=1920, max_height=1080, quality=85, convert_to_jpeg=False):
+def reset_peak_rss():
+    """
+    Reinicia el pico de memoria residente del proceso (solo Linux).
+
+    Returns:
+        True si el contador se pudo reiniciar y el pico es por imagen
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def get_peak_rss_mb():
+    """Retorna el pico de memoria residente (RSS) del proceso en MB."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en bytes en macOS y en KB en Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure_error(original, candidate):
+    """
+    Calcula el error RMS (escala 0-255) entre dos imágenes del mismo tamaño.
+
+    Ambas se comparan en el modo de la original, incluido el canal alpha.
+    """
+    mode = original.mode if original.mode in ('RGB', 'RGBA', 'L', 'LA') else 'RGBA'
+    a = original.convert(mode)
+    b = candidate.convert(mode)
+    rms = ImageStat.Stat(ImageChops.difference(a, b)).rms
+    return (sum(band ** 2 for band in rms) / len(rms)) ** 0.5
+
+
+def quantize_palette(img, colors=256, dither=False, max_error=4.0):
+    """
+    Reduce una imagen a paleta adaptativa (modo 'P') si el resultado es fiel.
+
+    Las imágenes con transparencia se cuantizan con FASTOCTREE, que conserva
+    el canal alpha en la paleta; las opacas usan MEDIANCUT. El dithering se
+    aplica remapeando sobre la paleta ya calculada, porque quantize() ignora
+    dither= si no recibe palette=; Pillow solo remapea desde RGB/L, así que
+    las imágenes con transparencia se cuantizan sin dithering.
+
+    Args:
+        img: Imagen PIL de entrada
+        colors: Número máximo de colores de la paleta (2-256)
+        dither: Si True, aplica difusión de error Floyd-Steinberg
+        max_error: Error RMS máximo aceptado (escala 0-255)
+
+    Returns:
+        Tuple con (imagen_cuantizada o None, error_medido)
+    """
+    colors = max(2, min(256, colors))
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+    if has_alpha:
+        source = img.convert('RGBA')
+        quantized = source.quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+    else:
+        source = img.convert('RGB')
+        quantized = source.quantize(colors=colors, method=Image.Quantize.MEDIANCUT)
+        if dither:
+            quantized = source.quantize(palette=quantized, dither=Image.Dither.FLOYDSTEINBERG)
+
+    error = measure_error(source, quantized)
+    if error > max_error:
+        return None, error
+    return quantized, error
+
+
+# Combinaciones (compress_level, estrategia zlib, optimize) probadas en la búsqueda
+# sin pérdida. Estrategias zlib: 0 = por defecto, 1 = Z_FILTERED, 3 = Z_RLE.
+PNG_ZLIB_STRATEGIES = [
+    (9, 0, True),
+    (9, 0, False),
+    (9, 1, False),
+    (9, 3, False),
+    (6, 0, False),
+]
+
+
+def exact_palette(img):
+    """
+    Convierte a modo 'P' sin pérdida si la imagen tiene ≤256 colores exactos.
+
+    Returns:
+        Imagen en modo 'P' (con tRNS si hay transparencia) o None
+    """
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    source = img.convert('RGBA' if has_alpha else 'RGB')
+    colors = source.getcolors(256)
+    if colors is None:
+        return None
+
+    palette_colors = [color for _, color in colors]
+    index = {bytes(color): i for i, color in enumerate(palette_colors)}
+
+    raw = source.tobytes()
+    step = len(source.getbands())
+    indices = bytes(index[raw[i:i + step]] for i in range(0, len(raw), step))
+
+    paletted = Image.frombytes('P', source.size, indices)
+    paletted.putpalette([channel for color in palette_colors for channel in color[:3]])
+    if has_alpha:
+        paletted.info['transparency'] = bytes(color[3] for color in palette_colors)
+    return paletted
+
+
+def lossless_candidates(img):
+    """
+    Genera las representaciones sin pérdida de una imagen que merece la pena probar.
+
+    Incluye la imagen tal cual, RGBA→RGB si el alpha es totalmente opaco,
+    RGB→L si todos los píxeles son grises y paleta exacta si hay ≤256 colores.
+    """
+    candidates = [img]
+    current = img
+
+    if current.mode in ('RGBA', 'LA') and current.getchannel('A').getextrema() == (255, 255):
+        current = current.convert('RGB' if current.mode == 'RGBA' else 'L')
+        candidates.append(current)
+
+    if current.mode == 'RGB':
+        r, g, b = current.split()
+        if ImageChops.difference(r, g).getbbox() is None and ImageChops.difference(r, b).getbbox() is None:
+            current = current.convert('L')
+            candidates.append(current)
+
+    if current.mode != 'P':
+        paletted = exact_palette(current)
+        if paletted is not None:
+            candidates.append(paletted)
+
+    return candidates
+
+
+def is_pixel_identical(reference, candidate):
+    """Comprueba que dos imágenes decodifican a exactamente los mismos píxeles RGBA."""
+    if reference.size != candidate.size:
+        return False
+    return ImageChops.difference(reference.convert('RGBA'), candidate.convert('RGBA')).getbbox() is None
+
+
+def save_png_smallest(img, output_path, original_data=None):
+    """
+    Guarda un PNG probando varias estrategias sin pérdida y conserva la más pequeña.
+
+    Cada candidato se guarda sin chunks auxiliares (texto, ICC, EXIF) y se
+    vuelve a decodificar para verificar que los píxeles son idénticos a la
+    imagen de entrada. Si se pasan los bytes del PNG original, compiten como
+    un candidato más: si ninguna estrategia los mejora no se reescribe el
+    fichero (o se copia tal cual si la salida es otra ruta).
+
+    Args:
+        img: Imagen PIL a guardar
+        output_path: Ruta del PNG de salida
+        original_data: Bytes del PNG de entrada (opcional)
+
+    Returns:
+        Descripción de la estrategia ganadora (str)
+    """
+    best_data = None
+    best_label = None
+
+    if original_data is not None:
+        with Image.open(io.BytesIO(original_data)) as decoded:
+            if is_pixel_identical(img, decoded):
+                best_data = original_data
+                best_label = "original"
+
+    for candidate in lossless_candidates(img):
+        save_kwargs = {}
+        if candidate.mode == 'P':
+            if 'transparency' in candidate.info:
+                save_kwargs['transparency'] = candidate.info['transparency']
+            used = len(candidate.getcolors(256) or [])
+            if used and used <= 16:
+                save_kwargs['bits'] = 1 if used <= 2 else 2 if used <= 4 else 4
+
+        for level, strategy, optimize in PNG_ZLIB_STRATEGIES:
+            buffer = io.BytesIO()
+            candidate.save(buffer, 'PNG', compress_level=level, compress_type=strategy,
+                           optimize=optimize, icc_profile=None, **save_kwargs)
+            data = buffer.getvalue()
+            if best_data is not None and len(data) >= len(best_data):
+                continue
+
+            buffer.seek(0)
+            with Image.open(buffer) as decoded:
+                if not is_pixel_identical(img, decoded):
+                    continue
+
+            best_data = data
+            best_label = f"{candidate.mode}, zlib {level}/{strategy}"
+
+    if best_data is None:
+        raise RuntimeError("Ninguna estrategia PNG conserva los píxeles originales")
+
+    if best_data is original_data and output_path.exists() and output_path.read_bytes() == original_data:
+        return best_label
+
+    with open(output_path, 'wb') as f:
+        f.write(best_data)
+    return best_label
+
+
+def optimize_image(input_path, output_path, max_width=1920, max_height=1080, quality=85, convert_to_jpeg=False,
+                   palette=False, palette_colors=256, dither=False, palette_max_error=4.0,
+                   lossless_search=False, low_memory=False):
     """
     Optimiza una imagen individual.
 
@@ -35,6 +267,13 @@ def optimize_image(input_path, output_path, max_width=1920, max_height=1080, qua
         max_height: Alto máximo en píxeles
         quality: Calidad para JPEG (1-100)
         convert_to_jpeg: Si True, convierte PNGs a JPEG
+        palette: Si True, intenta cuantizar los PNG a paleta adaptativa
+        palette_colors: Número máximo de colores de la paleta
+        dither: Si True, aplica dithering al cuantizar
+        palette_max_error: Error RMS máximo para aceptar la paleta
+        lossless_search: Si True, prueba varias estrategias PNG sin pérdida y guarda la menor
+        low_memory: Si True, decodifica cerca del tamaño final (escalado DCT en JPEG,
+            reducción entera previa al remuestreo) y libera el original cuanto antes
 
     Returns:
         Tuple con (tamaño_original_mb, tamaño_nuevo_mb, ahorro_porcentaje)
@@ -42,6 +281,7 @@ def optimize_image(input_path, output_path, max_width=1920, max_height=1080, qua
     try:
         with Image.open(input_path) as img:
             original_size = get_file_size_mb(input_path)
+            source = img
 
             # Obtener dimensiones originales
             width, height = img.size
@@ -51,7 +291,14 @@ def optimize_image(input_path, output_path, max_width=1920, max_height=1080, qua
                 ratio = min(max_width / width, max_height / height)
                 new_width = int(width * ratio)
                 new_height = int(height * ratio)
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                if low_memory:
+                    # JPEG: el decodificador escala a 1/2, 1/4 o 1/8 sin pasar por la resolución nativa
+                    img.draft(img.mode if img.mode in ('RGB', 'L') else None, (new_width, new_height))
+                    # reducing_gap aplica Image.reduce() por un factor entero antes del LANCZOS
+                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                    source.close()
+                else:
+                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
 
             # Convertir a JPEG si se solicita
             if convert_to_jpeg and input_path.suffix.lower() == '.png':
@@ -68,7 +315,15 @@ def optimize_image(input_path, output_path, max_width=1920, max_height=1080, qua
             if output_path.suffix.lower() in ['.jpg', '.jpeg']:
                 img.save(output_path, 'JPEG', quality=quality, optimize=True)
             elif output_path.suffix.lower() == '.png':
-                img.save(output_path, 'PNG', optimize=True)
+                if palette:
+                    quantized, _ = quantize_palette(img, palette_colors, dither, palette_max_error)
+                    if quantized is not None:
+                        img = quantized
+                if lossless_search:
+                    original_data = input_path.read_bytes() if input_path.suffix.lower() == '.png' else None
+                    save_png_smallest(img, output_path, original_data)
+                else:
+                    img.save(output_path, 'PNG', optimize=True)
             else:
                 img.save(output_path, optimize=True)
 
@@ -81,7 +336,9 @@ def optimize_image(input_path, output_path, max_width=1920, max_height=1080, qua
         raise RuntimeError(f"Error al optimizar {input_path.name}: {str(e)}") from e
 
 
-def process_directory(input_dir, output_dir=None, max_width=1920, max_height=1080, quality=85, backup=False, dry_run=False, convert_to_jpeg=False):
+def process_directory(input_dir, output_dir=None, max_width=1920, max_height=1080, quality=85, backup=False, dry_run=False, convert_to_jpeg=False,
+                      palette=False, palette_colors=256, dither=False, palette_max_error=4.0,
+                      lossless_search=False, low_memory=False, only_files=None):
     """
     Procesa todas las imágenes en un directorio.
 
@@ -91,9 +348,16 @@ def process_directory(input_dir, output_dir=None, max_width=1920, max_height=108
         max_width: Ancho máximo en píxeles
         max_height: Alto máximo en píxeles
         quality: Calidad para JPEG (1-100)
-        backup: Si True, crea backup antes de sobrescribir
+        backup: Si True, registra un snapshot (ver image_snapshots.py) antes de sobrescribir
         dry_run: Si True, solo muestra qué haría sin modificar archivos
         convert_to_jpeg: Si True, convierte PNGs a JPEG
+        palette: Si True, intenta cuantizar los PNG a paleta adaptativa
+        palette_colors: Número máximo de colores de la paleta
+        dither: Si True, aplica dithering al cuantizar
+        palette_max_error: Error RMS máximo para aceptar la paleta
+        lossless_search: Si True, busca la recompresión PNG sin pérdida más pequeña
+        low_memory: Si True, decodifica cerca del tamaño final y reporta el pico de RSS por imagen
+        only_files: Si se indica, solo procesa estos ficheros del directorio
     """
     input_path = Path(input_dir)
 
@@ -108,12 +372,6 @@ def process_directory(input_dir, output_dir=None, max_width=1920, max_height=108
     if not dry_run and not in_place:
         output_path.mkdir(parents=True, exist_ok=True)
 
-    # Crear backup si se solicita
-    backup_dir = None
-    if backup and in_place and not dry_run:
-        backup_dir = input_path.parent / f"{input_path.name}_backup"
-        backup_dir.mkdir(parents=True, exist_ok=True)
-        print(f"📦 Creando backup en: {backup_dir}")
 
     # Buscar todas las imágenes
     image_extensions = {'.png', '.jpg', '.jpeg', '.webp'}
@@ -121,14 +379,31 @@ def process_directory(input_dir, output_dir=None, max_width=1920, max_height=108
         f for f in input_path.iterdir()
         if f.is_file() and f.suffix.lower() in image_extensions
     ]
+    if only_files is not None:
+        selected = {Path(f).name for f in only_files}
+        image_files = [f for f in image_files if f.name in selected]
 
     if not image_files:
         print(f"⚠️  No se encontraron imágenes en {input_path}")
         return
 
+    # Registrar snapshot antes de sobrescribir (solo ocupan espacio los ficheros nuevos)
+    snapshot_id = None
+    if backup and in_place and not dry_run:
+        snapshot_id, new_bytes = snapshot_directory(
+            input_path, DEFAULT_STORE, label="optimize_images", recursive=False, files=image_files
+        )
+        print(f"📸 Snapshot {snapshot_id} ({new_bytes / (1024 * 1024):.2f} MB nuevos en {DEFAULT_STORE})")
+
     print(f"\n🖼️  Encontradas {len(image_files)} imágenes")
     print(f"📐 Dimensiones máximas: {max_width}x{max_height}px")
     print(f"🎚️  Calidad JPEG: {quality}")
+    if palette:
+        print(f"🎨 Paleta: ≤{palette_colors} colores, dithering {'sí' if dither else 'no'}, error máx. {palette_max_error}")
+    if lossless_search:
+        print(f"🔬 Búsqueda PNG sin pérdida: {len(PNG_ZLIB_STRATEGIES)} configuraciones zlib por candidato")
+    if low_memory:
+        print(f"🧠 Modo baja memoria: decodificación reducida y pico de RSS por imagen")
     if dry_run:
         print(f"🔍 Modo DRY RUN - No se modificarán archivos")
     print()
@@ -137,13 +412,10 @@ def process_directory(input_dir, output_dir=None, max_width=1920, max_height=108
     total_new = 0
     successful = 0
     failed = 0
+    max_peak_rss = 0.0
 
     for img_file in image_files:
         try:
-            # Crear backup si es necesario
-            if backup_dir and not dry_run:
-                shutil.copy2(img_file, backup_dir / img_file.name)
-
             # Determinar ruta de salida
             out_file = output_path / img_file.name if not in_place else img_file
 
@@ -171,12 +443,20 @@ def process_directory(input_dir, output_dir=None, max_width=1920, max_height=108
                     total_original += original_size
             else:
                 # Optimizar imagen
+                per_image_peak = low_memory and reset_peak_rss()
                 original_size, new_size, savings = optimize_image(
-                    img_file, out_file, max_width, max_height, quality, convert_to_jpeg
+                    img_file, out_file, max_width, max_height, quality, convert_to_jpeg,
+                    palette, palette_colors, dither, palette_max_error,
+                    lossless_search, low_memory
                 )
 
                 print(f"  ✅ {img_file.name}")
                 print(f"     {original_size:.2f} MB → {new_size:.2f} MB (ahorro: {savings:.1f}%)")
+                if low_memory:
+                    peak_rss = get_peak_rss_mb()
+                    max_peak_rss = max(max_peak_rss, peak_rss)
+                    scope = "imagen" if per_image_peak else "proceso"
+                    print(f"     Pico RSS ({scope}): {peak_rss:.0f} MB")
 
                 total_original += original_size
                 total_new += new_size
@@ -203,9 +483,11 @@ def process_directory(input_dir, output_dir=None, max_width=1920, max_height=108
         print(f"   Tamaño nuevo: {total_new:.2f} MB")
         total_savings = ((total_original - total_new) / total_original * 100) if total_original > 0 else 0
         print(f"   Ahorro total: {total_original - total_new:.2f} MB ({total_savings:.1f}%)")
+        if low_memory:
+            print(f"   Pico RSS máximo: {max_peak_rss:.0f} MB")
 
-        if backup_dir:
-            print(f"\n💾 Backup guardado en: {backup_dir}")
+        if snapshot_id:
+            print(f"\n💾 Restaurar con: python scripts/image_snapshots.py restore {snapshot_id}")
     print("=" * 60)
 
 
@@ -259,7 +541,7 @@ Ejemplos de uso:
     parser.add_argument(
         "--backup",
         action="store_true",
-        help="Crear backup antes de sobrescribir (solo si no se usa --output)"
+        help="Registrar un snapshot restaurable antes de sobrescribir (solo si no se usa --output)"
     )
 
     parser.add_argument(
@@ -274,6 +556,44 @@ Ejemplos de uso:
         help="Convertir imágenes PNG a JPEG (reduce mucho el tamaño)"
     )
 
+    parser.add_argument(
+        "--palette",
+        action="store_true",
+        help="Cuantizar PNGs a paleta adaptativa si el error es aceptable"
+    )
+
+    parser.add_argument(
+        "--palette-colors",
+        type=int,
+        default=256,
+        help="Número máximo de colores de la paleta 2-256 (default: 256)"
+    )
+
+    parser.add_argument(
+        "--dither",
+        action="store_true",
+        help="Aplicar dithering Floyd-Steinberg al cuantizar"
+    )
+
+    parser.add_argument(
+        "--palette-max-error",
+        type=float,
+        default=4.0,
+        help="Error RMS máximo (0-255) para aceptar la paleta (default: 4.0)"
+    )
+
+    parser.add_argument(
+        "--lossless-search",
+        action="store_true",
+        help="Probar varias estrategias PNG sin pérdida y guardar la más pequeña"
+    )
+
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        help="Decodificar cerca del tamaño final (JPEG draft, reduce) y reportar pico de RSS"
+    )
+
     args = parser.parse_args()
 
     # Validar calidad
@@ -290,7 +610,13 @@ Ejemplos de uso:
             quality=args.quality,
             backup=args.backup,
             dry_run=args.dry_run,
-            convert_to_jpeg=args.convert_to_jpeg
+            convert_to_jpeg=args.convert_to_jpeg,
+            palette=args.palette,
+            palette_colors=args.palette_colors,
+            dither=args.dither,
+            palette_max_error=args.palette_max_error,
+            lossless_search=args.lossless_search,
+            low_memory=args.low_memory
         )
     except Exception as e:
         print(f"❌ Error: {str(e)}")
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Trocea en build las imágenes de los puzzles jigsaw en una imagen por pieza.
+
+El renderer de jigsaw pintaba cada pieza con la imagen completa como
+background-image escalada, obligando al navegador a decodificar y escalar
+la imagen entera en cada pieza. Este script:
+- Lee las rejillas (rows/cols) de los jigsaw que abren las escenas de
+  web/data/story.json, sobre los datos de web/data/puzzles.json (igual que
+  hace app.js al combinar ambas)
+- Corta cada imagen jigsaw (img/puzzles/jigsaw/ona_{agente}.png y la imagen
+  por defecto del puzzle) en piezas WebP del tamaño al que se muestran, solo
+  en las rejillas con las que se puede mostrar esa imagen
+- Guarda las piezas en img/puzzles/tiles/{ruta de la imagen}/{filas}x{columnas}/,
+  con la ruta relativa a img/ para que no choquen imágenes del mismo nombre
+- Escribe web/data/jigsaw_tiles.json, que puzzles.js usa en lugar de la
+  imagen completa cuando hay piezas para esa imagen y rejilla
+
+Uso:
+    python scripts/slice_jigsaw.py
+    python scripts/slice_jigsaw.py --force
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from PIL import Image
+
+
+# Ancho máximo de la rejilla en CSS (.puzzle-jigsaw-grid) y densidad objetivo
+GRID_MAX_WIDTH = 640
+PIXEL_RATIO = 2
+
+
+def load_json(path):
+    """Carga un archivo JSON."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def collect_grids(puzzles_file, story_file):
+    """
+    Retorna las rejillas (rows, cols) de los jigsaw y {imagen por defecto: rejillas}.
+
+    Solo cuentan los puzzles que abre alguna escena, con los datos de
+    story.json sobre los de puzzles.json como en renderScene(); sin
+    story.json se usan todos los jigsaw de puzzles.json.
+    """
+    puzzles = load_json(puzzles_file).get('puzzles', {})
+    if not Path(story_file).exists():
+        configs = [puzzle for puzzle in puzzles.values() if puzzle.get('type') == 'jigsaw']
+        return _grids_by_image(configs)
+
+    configs = []
+    for scene in load_json(story_file).get('scenes', {}).values():
+        puzzle = scene.get('puzzle')
+        if not puzzle:
+            continue
+        fallback = puzzles.get(puzzle.get('id'), {})
+        merged = {**fallback, **puzzle, 'data': {**fallback.get('data', {}), **puzzle.get('data', {})}}
+        if merged.get('type') == 'jigsaw':
+            configs.append(merged)
+    return _grids_by_image(configs)
+
+
+def _grids_by_image(configs):
+    grids = set()
+    default_images = {}
+    for config in configs:
+        data = config.get('data', {})
+        grid = (int(data.get('rows', 3)), int(data.get('cols', 3)))
+        grids.add(grid)
+        if data.get('image'):
+            image = data['image'].lstrip('/')
+            default_images.setdefault(image if image.startswith('img/') else f"img/{image}", set()).add(grid)
+    return grids, default_images
+
+
+def tiles_subdir(image):
+    """Carpeta de piezas de una imagen: su ruta relativa a img/ con la extensión como sufijo."""
+    path = Path(image)
+    if path.parts[0] == 'img':
+        path = Path(*path.parts[1:])
+    return path.with_name(f"{path.stem}_{path.suffix.lstrip('.').lower()}")
+
+
+def tile_boxes(width, height, rows, cols):
+    """Cajas (left, top, right, bottom) de cada pieza en orden de lectura, sin huecos."""
+    return [
+        (c * width // cols, r * height // rows, (c + 1) * width // cols, (r + 1) * height // rows)
+        for r in range(rows)
+        for c in range(cols)
+    ]
+
+
+def slice_image(image_path, rows, cols, output_dir, web_dir, quality=85):
+    """
+    Corta una imagen en rows×cols piezas WebP a su tamaño de visualización.
+
+    Returns:
+        Dict con tileWidth, tileHeight y la lista de rutas (relativas a web/) de las piezas
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    target_width = round(GRID_MAX_WIDTH * PIXEL_RATIO / cols)
+
+    with Image.open(image_path) as img:
+        img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        tiles = []
+        tile_size = None
+        for index, box in enumerate(tile_boxes(img.width, img.height, rows, cols)):
+            tile = img.crop(box)
+            if tile.width > target_width:
+                ratio = target_width / tile.width
+                tile = tile.resize((target_width, round(tile.height * ratio)), Image.Resampling.LANCZOS)
+            tile_size = tile_size or tile.size
+            tile_path = output_dir / f"{index}.webp"
+            tile.save(tile_path, 'WEBP', quality=quality, method=6)
+            tiles.append(tile_path.relative_to(web_dir).as_posix())
+
+    return {'tileWidth': tile_size[0], 'tileHeight': tile_size[1], 'tiles': tiles}
+
+
+def is_up_to_date(entry, image_path, web_dir, output_dir):
+    """True si todas las piezas existen en output_dir y son más recientes que la imagen original."""
+    if not entry:
+        return False
+    source_mtime = image_path.stat().st_mtime
+    for tile in entry.get('tiles', []):
+        tile_path = web_dir / tile
+        if tile_path.parent != output_dir or not tile_path.exists() or tile_path.stat().st_mtime < source_mtime:
+            return False
+    return bool(entry.get('tiles'))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Trocea las imágenes jigsaw en piezas y genera el manifest para puzzles.js",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  %(prog)s
+  %(prog)s --force
+  %(prog)s --quality 80
+        """
+    )
+
+    parser.add_argument(
+        "--web-dir",
+        default="web",
+        help="Directorio publicado (default: web)"
+    )
+
+    parser.add_argument(
+        "--quality",
+        type=int,
+        default=85,
+        help="Calidad WebP de las piezas 1-100 (default: 85)"
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerar todas las piezas aunque estén actualizadas"
+    )
+
+    args = parser.parse_args()
+
+    web_dir = Path(args.web_dir)
+    puzzles_file = web_dir / 'data' / 'puzzles.json'
+    manifest_file = web_dir / 'data' / 'jigsaw_tiles.json'
+    tiles_dir = web_dir / 'img' / 'puzzles' / 'tiles'
+
+    if not puzzles_file.exists():
+        print(f"❌ Error: No se encuentra el archivo {puzzles_file}")
+        return 1
+
+    grids, default_images = collect_grids(puzzles_file, web_dir / 'data' / 'story.json')
+    # puzzles.js cambia la imagen de cualquier jigsaw por la del agente: esas
+    # necesitan todas las rejillas; la imagen por defecto, solo las de sus puzzles
+    plan = {}
+    for path in (web_dir / 'img' / 'puzzles' / 'jigsaw').glob('*.png'):
+        plan[path.relative_to(web_dir).as_posix()] = set(grids)
+    for image, image_grids in default_images.items():
+        if (web_dir / image).exists():
+            plan.setdefault(image, set()).update(image_grids)
+    images = sorted(plan)
+    total = sum(len(image_grids) for image_grids in plan.values())
+
+    previous = load_json(manifest_file).get('images', {}) if manifest_file.exists() else {}
+
+    print("=" * 60)
+    print("🧩 TROCEADO DE PUZZLES JIGSAW - OPERACIÓN PORTAL 27")
+    print("=" * 60)
+    print()
+    print(f"📐 Rejillas: {', '.join(f'{r}x{c}' for r, c in sorted(grids))}")
+    print(f"🖼️  Imágenes: {len(images)}")
+    print()
+
+    manifest = {}
+    generated = 0
+    for image in images:
+        image_path = web_dir / image
+        manifest[image] = {}
+        for rows, cols in sorted(plan[image]):
+            key = f"{rows}x{cols}"
+            entry = previous.get(image, {}).get(key)
+            output_dir = tiles_dir / tiles_subdir(image) / key
+            if args.force or not is_up_to_date(entry, image_path, web_dir, output_dir):
+                entry = slice_image(image_path, rows, cols, output_dir, web_dir, args.quality)
+                generated += 1
+                size_kb = sum((web_dir / tile).stat().st_size for tile in entry['tiles']) / 1024
+                print(f"  ✅ {image} [{key}] → {len(entry['tiles'])} piezas "
+                      f"{entry['tileWidth']}x{entry['tileHeight']}px ({size_kb:.0f} KB)")
+            manifest[image][key] = entry
+
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump({'meta': {'version': 1}, 'images': manifest}, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+    print()
+    print("=" * 60)
+    print(f"✅ {generated} rejillas generadas, {total - generated} sin cambios")
+    print(f"📄 Manifest: {manifest_file}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
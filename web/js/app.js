@@ -40,6 +40,10 @@ const agentModalMessageEl = document.getElementById("agentModalMessage");
 let scenes = {};
 let agents = {};
 let puzzles = {};
+let placeholders = {};
+let avatarAtlas = null;
+let sceneCrops = {};
+let agentCodes = {};
 let currentAgent = null;
 let typewriterTimers = [];
 let startSceneId = "intro";
@@ -303,6 +307,26 @@ async function loadJson(path) {
   return response.json();
 }
 
+// Pinta el placeholder borroso y el color dominante (data/placeholders.json,
+// generado por scripts/generate_placeholders.py) hasta que llega la imagen real.
+function setImageWithPlaceholder(imgEl, src, holderEl = imgEl, placeholderKey = src) {
+  const info = placeholders[placeholderKey];
+  imgEl.classList.remove("is-loaded");
+  holderEl.style.backgroundColor = info ? info.color : "";
+  holderEl.style.backgroundImage = info ? `url(${info.placeholder})` : "";
+  holderEl.style.backgroundSize = info ? "cover" : "";
+  imgEl.onload = () => {
+    imgEl.classList.add("is-loaded");
+    if (holderEl === imgEl) {
+      // Las imágenes con transparencia no deben dejar ver el placeholder
+      holderEl.style.backgroundImage = "";
+      holderEl.style.backgroundColor = "";
+    }
+  };
+  imgEl.onerror = () => imgEl.classList.add("is-loaded");
+  imgEl.src = src;
+}
+
 function formatDatetime(raw) {
   if (!raw) return "—";
   const [datePart, timePart] = raw.split(" ");
@@ -340,10 +364,9 @@ function typewriter(el, text, speed = 22) {
 }
 
 function getCurrentAgent() {
-  const params = new URLSearchParams(window.location.search);
-  const idFromUrl = params.get("agent");
-  if (idFromUrl && agents[idFromUrl]) {
-    return agents[idFromUrl];
+  const agentId = getCurrentAgentId();
+  if (agentId) {
+    return agents[agentId];
   }
   // Si no hay agente en la URL, retornar null para mostrar pantalla de acceso restringido
   return null;
@@ -355,6 +378,11 @@ function getCurrentAgentId() {
   if (idFromUrl && agents[idFromUrl]) {
     return idFromUrl;
   }
+  // Código corto de los QR alfanuméricos (/A/X7K → ?agent=X7K)
+  const idFromCode = idFromUrl && agentCodes[idFromUrl.toUpperCase()];
+  if (idFromCode && agents[idFromCode]) {
+    return idFromCode;
+  }
   // Si no hay agente en la URL, retornar null
   return null;
 }
@@ -410,10 +438,11 @@ function renderAgent(agent) {
     }
   }
 
-  if (agent.avatar) {
-    agentModalAvatarEl.src = agent.avatar;
-  } else {
-    agentModalAvatarEl.src = "";
+  // El avatar del modal sale del mismo atlas que el selector; sin atlas, el PNG suelto
+  if (!applyAvatarSprite(agentModalAvatarEl, getCurrentAgentId())) {
+    agentModalAvatarEl.style.backgroundImage = agent.avatar ? `url(${agent.avatar})` : "";
+    agentModalAvatarEl.style.backgroundSize = "cover";
+    agentModalAvatarEl.style.backgroundPosition = "center";
   }
 
   const agentModalFullbodyEl = document.getElementById("agentModalFullbody");
@@ -479,11 +508,20 @@ function renderScene(id) {
   const imgSrc =
     scene.image === null ? null : scene.image || `img/scenarios/${id}.png`;
   if (imgSrc) {
-    sceneImageEl.src = imgSrc;
+    const cropSrc = pickSceneCrop(imgSrc);
+    // El foco está en coordenadas de la imagen completa; el recorte ya va centrado en él
+    const focal = cropSrc ? null : sceneCrops[imgSrc]?.focal;
+    sceneImageEl.style.objectPosition = focal ? `${focal[0] * 100}% ${focal[1] * 100}%` : "";
+    setImageWithPlaceholder(sceneImageEl, cropSrc || imgSrc, sceneImageEl.parentElement, imgSrc);
     sceneImageEl.style.visibility = "visible";
   } else {
     sceneImageEl.src = "";
     sceneImageEl.style.visibility = "hidden";
+    // Sin imagen no debe quedar el placeholder de la escena anterior
+    const holderEl = sceneImageEl.parentElement;
+    holderEl.style.backgroundImage = "";
+    holderEl.style.backgroundColor = "";
+    holderEl.style.backgroundSize = "";
   }
 
   pendingPuzzle = null;
@@ -558,17 +596,32 @@ function showRestrictedAccessScreen() {
 
 async function init() {
   try {
-    const [agentsData, storyData, puzzlesData] = await Promise.all([
+    const [agentsData, storyData, puzzlesData, placeholdersData, avatarAtlasData, sceneCropsData, agentCodesData] = await Promise.all([
       loadJson("data/agents.json"),
       loadJson("data/story.json"),
-      loadJson("data/puzzles.json")
+      loadJson("data/puzzles.json"),
+      loadJson("data/placeholders.json").catch(() => null),
+      loadJson("data/avatar_atlas.json").catch(() => null),
+      loadJson("data/scene_crops.json").catch(() => null),
+      loadJson("data/agent_codes.json").catch(() => null)
     ]);
     agents = agentsData.agents || agentsData || {};
+    placeholders = placeholdersData?.images || {};
+    avatarAtlas = avatarAtlasData;
+    sceneCrops = sceneCropsData?.images || {};
+    agentCodes = agentCodesData?.codes || {};
     scenes = storyData.scenes || {};
     puzzles = puzzlesData.puzzles || {};
     startSceneId = storyData.meta?.start || "intro";
     const urlScene = new URLSearchParams(window.location.search).get("scene");
     initialSceneId = urlScene && scenes[urlScene] ? urlScene : startSceneId;
+    // Sustituir el código corto por el id para el resto de lecturas de ?agent=
+    const resolvedAgentId = getCurrentAgentId();
+    const params = new URLSearchParams(window.location.search);
+    if (resolvedAgentId && params.get("agent") !== resolvedAgentId) {
+      params.set("agent", resolvedAgentId);
+      window.history.replaceState({}, "", `${window.location.pathname}?${params.toString()}`);
+    }
     currentAgent = getCurrentAgent();
 
     // Si no hay agente, mostrar pantalla de acceso restringido
@@ -586,7 +639,7 @@ async function init() {
     // Configurar imagen del agente en la landing
     if (currentAgent) {
       const agentId = getCurrentAgentId();
-      landingAgentImageEl.src = `img/agents/${agentId}_fullbody.png`;
+      setImageWithPlaceholder(landingAgentImageEl, `img/agents/${agentId}_fullbody.png`);
       landingAgentImageEl.alt = currentAgent.name;
     }
 
@@ -715,10 +768,12 @@ function openAgentSelector() {
       card.classList.add("is-current");
     }
 
-    const avatar = document.createElement("img");
+    const avatar = createAvatarSprite(agentId, agent.name) || document.createElement("img");
     avatar.className = "agent-card__avatar";
-    avatar.src = agent.avatar || "";
-    avatar.alt = agent.name;
+    if (avatar.tagName === "IMG") {
+      avatar.src = agent.avatar || "";
+      avatar.alt = agent.name;
+    }
 
     const name = document.createElement("div");
     name.className = "agent-card__name";
@@ -743,6 +798,43 @@ function openAgentSelector() {
   agentSelectorModalEl.setAttribute("aria-hidden", "false");
 }
 
+// Recorte vertical de la escena (data/scene_crops.json, generado por
+// scripts/generate_mobile_crops.py) para pantallas estrechas en vertical.
+function pickSceneCrop(src) {
+  const entry = sceneCrops[src];
+  if (!entry || !window.matchMedia("(max-width: 800px) and (orientation: portrait)").matches) {
+    return null;
+  }
+  const needed = window.innerWidth * (window.devicePixelRatio || 1);
+  const widths = Object.keys(entry.crops).map(Number).sort((a, b) => a - b);
+  if (!widths.length) return null;
+  const width = widths.find(w => w >= needed) || widths[widths.length - 1];
+  return entry.crops[width];
+}
+
+// Avatar recortado del atlas (data/avatar_atlas.json, generado por
+// scripts/build_avatar_atlas.py): una sola imagen para el selector y el modal.
+function applyAvatarSprite(el, agentId) {
+  const entry = avatarAtlas?.avatars?.[agentId];
+  const atlas = entry && avatarAtlas.atlases[entry.atlas];
+  if (!atlas) return false;
+  const posX = atlas.width > entry.w ? (entry.x / (atlas.width - entry.w)) * 100 : 0;
+  const posY = atlas.height > entry.h ? (entry.y / (atlas.height - entry.h)) * 100 : 0;
+  el.style.backgroundImage = `url(${atlas.image})`;
+  el.style.backgroundRepeat = "no-repeat";
+  el.style.backgroundSize = `${(atlas.width / entry.w) * 100}% ${(atlas.height / entry.h) * 100}%`;
+  el.style.backgroundPosition = `${posX}% ${posY}%`;
+  return true;
+}
+
+function createAvatarSprite(agentId, label) {
+  const el = document.createElement("div");
+  if (!applyAvatarSprite(el, agentId)) return null;
+  el.setAttribute("role", "img");
+  el.setAttribute("aria-label", label);
+  return el;
+}
+
 function closeAgentSelector() {
   agentSelectorModalEl.classList.remove("is-open");
   agentSelectorModalEl.setAttribute("aria-hidden", "true");
@@ -1,5 +1,15 @@
 export function createPuzzleManager(dom) {
   let current = null;
+  let jigsawTiles = {};
+
+  // Piezas jigsaw pre-troceadas en build (scripts/slice_jigsaw.py); si no hay
+  // manifest se usa la imagen completa como background de cada pieza.
+  fetch("data/jigsaw_tiles.json")
+    .then(res => (res.ok ? res.json() : null))
+    .then(manifest => {
+      jigsawTiles = manifest?.images || {};
+    })
+    .catch(() => {});
 
   const closeModal = () => {
     dom.modal.classList.remove("is-open");
@@ -286,6 +296,7 @@ export function createPuzzleManager(dom) {
       return;
     }
 
+    const tiles = jigsawTiles[image.replace(/^\//, "")]?.[`${rows}x${cols}`]?.tiles || null;
     const total = rows * cols;
     const positions = Array.from({ length: total }, (_, i) => i);
     const shuffled = [...positions].sort(() => Math.random() - 0.5);
@@ -305,13 +316,17 @@ export function createPuzzleManager(dom) {
         const tile = document.createElement("div");
         tile.className = "puzzle-jigsaw-tile";
         if (firstSelected === idx) tile.classList.add("selected");
-        const x = pos % cols;
-        const y = Math.floor(pos / cols);
-        const bgX = (x / (cols - 1)) * 100;
-        const bgY = (y / (rows - 1)) * 100;
-        tile.style.backgroundImage = `url(${image})`;
-        tile.style.backgroundPosition = `${bgX}% ${bgY}%`;
-        tile.style.backgroundSize = `${cols * 100}% ${rows * 100}%`;
+        if (tiles) {
+          tile.style.backgroundImage = `url(${tiles[pos]})`;
+        } else {
+          const x = pos % cols;
+          const y = Math.floor(pos / cols);
+          const bgX = (x / (cols - 1)) * 100;
+          const bgY = (y / (rows - 1)) * 100;
+          tile.style.backgroundImage = `url(${image})`;
+          tile.style.backgroundPosition = `${bgX}% ${bgY}%`;
+          tile.style.backgroundSize = `${cols * 100}% ${rows * 100}%`;
+        }
         tile.addEventListener("click", () => {
           if (firstSelected === null) {
             firstSelected = idx;